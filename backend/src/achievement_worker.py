@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Achievement Worker
+Process queued achievement evaluations outside the web server.
+Run the web server with ACHIEVEMENT_WORKERS=0 when using this.
+
+Usage:
+    python achievement_worker.py                  # Run workers until stopped
+    python achievement_worker.py --workers 4      # Run more worker threads
+    python achievement_worker.py --drain          # Process the queue once and exit
+    python achievement_worker.py --retry-failed   # Requeue failed jobs, then drain
+"""
+
+import sys
+import os
+import argparse
+import threading
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.user import db
+from src.models.achievement import AchievementJob
+from src.services.achievement_job_service import AchievementJobService
+from src.main import app
+
+def retry_failed():
+    """Move failed jobs back to pending with a fresh attempt count"""
+    with app.app_context():
+        count = AchievementJob.query.filter_by(status='failed').update(
+            {'status': 'pending', 'attempts': 0, 'error': None}, synchronize_session=False
+        )
+        db.session.commit()
+        print(f"🔁 Requeued {count} failed jobs")
+
+def drain():
+    """Process every queued job, then exit"""
+    print("⚙️  Draining achievement job queue...")
+    started = time.time()
+    processed = AchievementJobService.run_worker(app, stop_when_idle=True)
+    print(f"✅ Processed {processed} jobs in {time.time() - started:.1f}s")
+
+def run(workers):
+    """Run worker threads until interrupted"""
+    print(f"⚙️  Starting {workers} achievement workers (Ctrl+C to stop)...")
+    threads = [
+        threading.Thread(target=AchievementJobService.run_worker, args=(app,), daemon=True)
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        print("👋 Stopping achievement workers")
+
+def main():
+    parser = argparse.ArgumentParser(description='Process queued achievement evaluations')
+    parser.add_argument('--workers', type=int, default=2, help='Number of worker threads')
+    parser.add_argument('--drain', action='store_true', help='Process the queue once and exit')
+    parser.add_argument('--retry-failed', action='store_true', help='Requeue failed jobs before processing')
+
+    args = parser.parse_args()
+
+    if args.retry_failed:
+        retry_failed()
+        drain()
+    elif args.drain:
+        drain()
+    else:
+        run(args.workers)
+
+if __name__ == "__main__":
+    main()
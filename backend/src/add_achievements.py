@@ -6,6 +6,8 @@ Run this script to add achievements to your database easily.
 Usage:
     python add_achievements.py                    # Add basic achievements
     python add_achievements.py --all              # Add all achievements
+    python add_achievements.py --advanced         # Add achievements using the criteria language
+    python add_achievements.py --file custom.json # Add achievements from a JSON list
     python add_achievements.py --test             # Test achievement checking
     python add_achievements.py --clear            # Clear all achievements
 """
@@ -13,13 +15,15 @@ Usage:
 import sys
 import os
 import argparse
+import json
 
 # Add the backend directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.models.user import db
-from src.models.achievement import Achievement, UserAchievement, AchievementNotification
+from src.models.achievement import Achievement, UserAchievement, AchievementNotification, UserPoints
 from src.services.achievement_service import AchievementService
+from src.services.achievement_criteria import AchievementCriteria
 from src.main import app
 
 def create_basic_achievements():
@@ -169,10 +173,80 @@ def create_fun_achievements():
     
     return fun_achievements
 
+def create_advanced_achievements():
+    """Achievements written in the criteria language (see AchievementCriteria)"""
+    advanced_achievements = [
+        {
+            'name': 'Tribal Architect',
+            'description': 'Build a deck with 5 different creature types',
+            'category': 'deck',
+            'icon': 'users',
+            'rarity': 'rare',
+            'criteria': {
+                'type': 'decks',
+                'count': {'max': {'where': {'type': 'Creature'}, 'count': {'distinct': 'subtype'}}},
+                'target': 5
+            },
+            'points': 30
+        },
+        {
+            'name': 'Format Purist',
+            'description': 'Build a deck that is legal in its format',
+            'category': 'deck',
+            'icon': 'check-circle',
+            'rarity': 'uncommon',
+            'criteria': {'type': 'decks', 'where': {'legal_in': True}, 'target': 1},
+            'points': 20
+        },
+        {
+            'name': 'Shiny Hoarder',
+            'description': 'Own 10 foil cards',
+            'category': 'collection',
+            'icon': 'sparkles',
+            'rarity': 'uncommon',
+            'criteria': {'type': 'cards', 'where': {'foil': True}, 'count': 'copies', 'target': 10},
+            'points': 15
+        },
+        {
+            'name': 'Globetrotter',
+            'description': 'Collect cards from 25 different sets',
+            'category': 'discovery',
+            'icon': 'map',
+            'rarity': 'rare',
+            'criteria': {'type': 'cards', 'count': {'distinct': 'set'}, 'target': 25},
+            'points': 30
+        },
+        {
+            'name': 'Sky Striker',
+            'description': 'Collect 15 different flying creatures costing 3 or less',
+            'category': 'discovery',
+            'icon': 'feather',
+            'rarity': 'uncommon',
+            'criteria': {
+                'type': 'cards',
+                'where': {'all': [{'type': 'Creature'}, {'keyword': 'Flying'}, {'cmc': {'lte': 3}}]},
+                'count': {'distinct': 'name'},
+                'target': 15
+            },
+            'points': 20
+        }
+    ]
+    
+    return advanced_achievements
+
+def load_achievements_file(path):
+    """Achievement definitions from a JSON file containing a list of achievement objects"""
+    with open(path, encoding='utf-8') as f:
+        achievements = json.load(f)
+    if not isinstance(achievements, list):
+        raise SystemExit(f"❌ {path} must contain a JSON list of achievements")
+    return achievements
+
 def add_achievements(achievements):
     """Add achievements to the database"""
     added_count = 0
     skipped_count = 0
+    invalid_count = 0
     
     for achievement_data in achievements:
         # Check if achievement already exists
@@ -182,16 +256,28 @@ def add_achievements(achievements):
             skipped_count += 1
             continue
         
+        # Reject criteria the evaluator can't compile
+        try:
+            AchievementCriteria.validate(achievement_data.get('criteria'))
+        except ValueError as e:
+            print(f"❌ Skipping {achievement_data['name']}: invalid criteria ({e})")
+            invalid_count += 1
+            continue
+        
         # Create new achievement
         achievement = Achievement(**achievement_data)
         db.session.add(achievement)
         print(f"✅ Added achievement: {achievement_data['name']}")
         added_count += 1
     
-    # Commit all changes
+    # Commit all changes (running servers recompile their achievement queries)
+    if added_count:
+        AchievementService.bump_catalog_version()
     db.session.commit()
     
     print(f"\n🎉 Summary: Added {added_count} achievements, skipped {skipped_count} existing ones")
+    if invalid_count:
+        print(f"❌ Rejected {invalid_count} achievements with invalid criteria")
     return added_count
 
 def clear_achievements():
@@ -200,6 +286,8 @@ def clear_achievements():
     Achievement.query.delete()
     UserAchievement.query.delete()
     AchievementNotification.query.delete()
+    UserPoints.query.delete()
+    AchievementService.bump_catalog_version()
     db.session.commit()
     print(f"🧹 Cleared {count} achievements and all related data")
 
@@ -250,6 +338,8 @@ def main():
     parser.add_argument('--mtg', action='store_true', help='Add MTG-specific achievements')
     parser.add_argument('--fun', action='store_true', help='Add fun achievements')
     parser.add_argument('--all', action='store_true', help='Add all achievements')
+    parser.add_argument('--advanced', action='store_true', help='Add achievements using the criteria language')
+    parser.add_argument('--file', help='Add achievements from a JSON file')
     parser.add_argument('--test', action='store_true', help='Test achievement checking')
     parser.add_argument('--clear', action='store_true', help='Clear all achievements')
     
@@ -260,6 +350,10 @@ def main():
             clear_achievements()
         elif args.test:
             test_achievements()
+        elif args.file:
+            add_achievements(load_achievements_file(args.file))
+        elif args.advanced:
+            add_achievements(create_advanced_achievements())
         elif args.basic or args.all:
             achievements = create_basic_achievements()
             add_achievements(achievements)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Achievement Backfill
+Recompute achievement progress for every user, e.g. after adding achievements
+with add_achievements.py. Users are sharded across worker processes and each
+chunk is committed on its own; progress is saved to a state file so an
+interrupted run picks up where it stopped.
+
+Usage:
+    python backfill_achievements.py                                # All active achievements
+    python backfill_achievements.py --achievement "Dragon Tamer"   # Only some achievements (repeatable)
+    python backfill_achievements.py --workers 8 --chunk-size 200
+    python backfill_achievements.py --max-users-per-second 50      # Throttle load on the database
+    python backfill_achievements.py --restart                      # Ignore saved progress
+    python backfill_achievements.py --rebuild-leaderboard          # Recompute points totals and ranks
+"""
+
+import sys
+import os
+import argparse
+import json
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.user import db, User
+from src.models.achievement import Achievement
+from src.services.achievement_service import AchievementService
+from src.services.leaderboard_service import LeaderboardService
+from src.main import app
+
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(__file__), 'database', 'backfill_state.json')
+
+def init_worker():
+    """Give each worker process its own connections instead of the parent's"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def backfill_chunk(user_ids, achievement_ids):
+    """Worker: evaluate one chunk of users and commit it"""
+    started = time.time()
+    with app.app_context():
+        try:
+            completed = AchievementService.backfill_users(user_ids, achievement_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            db.session.remove()
+    return len(user_ids), completed, time.time() - started
+
+def resolve_achievements(selectors):
+    """Achievement ids for the given names/ids, or None for every active achievement"""
+    if not selectors:
+        return None
+    achievement_ids = set()
+    for selector in selectors:
+        query = Achievement.query.filter_by(id=int(selector)) if selector.isdigit() else \
+            Achievement.query.filter_by(name=selector)
+        achievement = query.first()
+        if not achievement:
+            raise SystemExit(f"❌ Unknown achievement: {selector}")
+        achievement_ids.add(achievement.id)
+    return achievement_ids
+
+def load_state(path, achievement_ids, restart):
+    """Saved progress for this achievement set, as finished [first, last] user id ranges"""
+    key = sorted(achievement_ids) if achievement_ids is not None else 'all'
+    if restart or not os.path.exists(path):
+        return {'achievements': key, 'finished_ranges': []}
+    with open(path) as f:
+        state = json.load(f)
+    if state.get('achievements') != key:
+        raise SystemExit(f"❌ {path} belongs to a different achievement set; use --restart to discard it")
+    return state
+
+def save_state(path, state):
+    """Write the state file atomically"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def backfill(achievement_ids, workers, chunk_size, max_users_per_second, state_path, restart):
+    """Evaluate every user in parallel chunks, resuming from the state file"""
+    state = load_state(state_path, achievement_ids, restart)
+    finished = state['finished_ranges']
+
+    ranges = sorted(finished)
+    starts = [first for first, _ in ranges]
+
+    def already_done(user_id):
+        i = bisect_right(starts, user_id) - 1
+        return i >= 0 and ranges[i][1] >= user_id
+
+    all_user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+    user_ids = [user_id for user_id in all_user_ids if not already_done(user_id)]
+    pending = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+    total_users = len(user_ids)
+    db.session.remove()
+
+    label = 'all active achievements' if achievement_ids is None else f'{len(achievement_ids)} achievements'
+    print(f"🏆 Backfilling {label} for {total_users} users "
+          f"({len(all_user_ids) - total_users} already done in a previous run)")
+    if not pending:
+        print("✅ Nothing to do")
+        return
+
+    started = time.time()
+    done_users = 0
+    failed_chunks = 0
+    completed = 0
+    in_flight = {}
+    queue = list(reversed(pending))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        while queue or in_flight:
+            # Keep at most one chunk per worker queued, and stay under the rate limit
+            while queue and len(in_flight) < workers:
+                if max_users_per_second:
+                    ahead = (done_users + sum(len(c) for c in in_flight.values())) / max_users_per_second
+                    delay = ahead - (time.time() - started)
+                    if delay > 0:
+                        if in_flight:
+                            break
+                        time.sleep(delay)
+                chunk = queue.pop()
+                in_flight[executor.submit(backfill_chunk, chunk, achievement_ids)] = chunk
+
+            finished_futures, _ = wait(in_flight, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in finished_futures:
+                chunk = in_flight.pop(future)
+                try:
+                    users, chunk_completed, elapsed = future.result()
+                except Exception as e:
+                    print(f"⚠️  Chunk starting at user {chunk[0]} failed: {e} (will retry on next run)")
+                    failed_chunks += 1
+                    continue
+
+                done_users += users
+                completed += chunk_completed
+                finished.append([chunk[0], chunk[-1]])
+                save_state(state_path, state)
+
+                rate = done_users / max(time.time() - started, 1e-6)
+                eta = (total_users - done_users) / rate if rate else 0
+                print(f"  {done_users}/{total_users} users, {completed} achievements completed, "
+                      f"{rate:.1f} users/s, ETA {eta:.0f}s (chunk of {users} in {elapsed:.1f}s)")
+
+    elapsed = time.time() - started
+    print(f"✅ Backfilled {done_users} users in {elapsed:.1f}s "
+          f"({done_users / max(elapsed, 1e-6):.1f} users/s), {completed} achievements newly completed")
+    if failed_chunks:
+        print(f"⚠️  {failed_chunks} chunks failed; rerun to retry them")
+    elif os.path.exists(state_path):
+        os.remove(state_path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute achievement progress for all users')
+    parser.add_argument('--achievement', action='append', metavar='NAME_OR_ID',
+                        help='Only backfill this achievement (repeatable); default is all active achievements')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Worker processes')
+    parser.add_argument('--chunk-size', type=int, default=100, help='Users per committed chunk')
+    parser.add_argument('--max-users-per-second', type=float, default=0, help='Throttle (0 for unlimited)')
+    parser.add_argument('--state-file', default=DEFAULT_STATE_FILE, help='Where resume progress is kept')
+    parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start over')
+    parser.add_argument('--rebuild-leaderboard', action='store_true',
+                        help='Only recompute achievement points totals and ranks (e.g. after editing points)')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.rebuild_leaderboard:
+            ranked = LeaderboardService.rebuild()
+            print(f"✅ Rebuilt leaderboard for {ranked} users")
+            return
+        achievement_ids = resolve_achievements(args.achievement)
+        backfill(achievement_ids, max(args.workers, 1), max(args.chunk_size, 1),
+                 args.max_users_per_second, args.state_file, args.restart)
+
+if __name__ == "__main__":
+    main()
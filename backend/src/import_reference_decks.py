@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Reference Decklist Importer
+Import decklist text files into the reference library used by
+"what can I build" matching. Re-importing a file replaces its list.
+
+Usage:
+    python import_reference_decks.py decks/                        # Every .txt file in a directory tree
+    python import_reference_decks.py burn.txt affinity.txt --format modern
+    python import_reference_decks.py decks/modern --format modern
+"""
+
+import sys
+import os
+import argparse
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.models.user import db
+from src.services.reference_deck_service import ReferenceDeckService
+from src.main import app
+
+COMMIT_EVERY = 100
+
+def find_decklists(paths):
+    """Expand files and directories into decklist .txt files"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in sorted(files):
+                    if file_name.lower().endswith('.txt'):
+                        yield os.path.join(root, file_name)
+        else:
+            yield path
+
+def import_decklists(paths, format_name=None):
+    """Import every decklist file, committing in chunks"""
+    print("📥 Importing reference decklists...")
+    started = time.time()
+
+    imported = 0
+    skipped = 0
+    for path in find_decklists(paths):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+
+        name = os.path.splitext(os.path.basename(path))[0].replace('_', ' ').strip()
+        deck, errors = ReferenceDeckService.import_decklist(name, text, format_name, os.path.abspath(path))
+
+        if deck is None:
+            print(f"⚠️  No cards found in {path}")
+            skipped += 1
+            continue
+        for error in errors:
+            print(f"⚠️  {path}:{error['line']}: {error['error']}")
+
+        imported += 1
+        if imported % COMMIT_EVERY == 0:
+            db.session.commit()
+            print(f"  {imported} decklists imported...")
+
+    db.session.commit()
+    print(f"✅ Imported {imported} decklists ({skipped} skipped) in {time.time() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Import reference decklists for collection matching')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='Decklist .txt files or directories of them')
+    parser.add_argument('--format', help='Format of the imported decklists (e.g. modern)')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        import_decklists(args.paths, args.format.lower() if args.format else None)
+
+if __name__ == "__main__":
+    main()
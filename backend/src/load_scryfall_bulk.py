@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Scryfall Bulk Data Loader
+Load data for cached cards from a local Scryfall bulk data file
+(https://scryfall.com/docs/api/bulk-data - "Default Cards" is recommended).
+
+Usage:
+    python load_scryfall_bulk.py --prices default-cards.json                 # Today's price snapshot
+    python load_scryfall_bulk.py --prices default-cards.json --date 2025-07-01
+    python load_scryfall_bulk.py --legalities default-cards.json             # Refresh format legality
+    python load_scryfall_bulk.py --sets sets.json                            # Set catalog (/sets dump or bulk file)
+"""
+
+import sys
+import os
+import argparse
+import time
+from datetime import date
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.scryfall_bulk_service import ScryfallBulkService
+from src.main import app
+
+def load_prices(path, snapshot_date):
+    """Load a price snapshot from a bulk file"""
+    print(f"💰 Loading prices for {snapshot_date} from {path}...")
+    started = time.time()
+
+    loaded = ScryfallBulkService.load_prices(path, snapshot_date)
+
+    print(f"✅ Stored {loaded} card prices in {time.time() - started:.1f}s")
+
+def load_legalities(path):
+    """Refresh format legality bitmasks from a bulk file"""
+    print(f"⚖️  Loading format legalities from {path}...")
+    started = time.time()
+
+    loaded = ScryfallBulkService.load_legalities(path)
+
+    print(f"✅ Stored legalities for {loaded} cards in {time.time() - started:.1f}s")
+
+def load_sets(path):
+    """Replace the set catalog"""
+    print(f"📚 Loading set catalog from {path}...")
+    started = time.time()
+
+    loaded = ScryfallBulkService.load_sets(path)
+
+    print(f"✅ Stored {loaded} sets in {time.time() - started:.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load Scryfall bulk data for cached cards')
+    parser.add_argument('--prices', metavar='FILE', help='Bulk card file to load a price snapshot from')
+    parser.add_argument('--date', help='Snapshot date (YYYY-MM-DD), defaults to today')
+    parser.add_argument('--legalities', metavar='FILE', help='Bulk card file to load format legalities from')
+    parser.add_argument('--sets', metavar='FILE', help='Scryfall sets dump or bulk card file to load the set catalog from')
+
+    args = parser.parse_args()
+
+    if not (args.prices or args.legalities or args.sets):
+        parser.print_help()
+        return
+
+    with app.app_context():
+        if args.sets:
+            load_sets(args.sets)
+        if args.legalities:
+            load_legalities(args.legalities)
+        if args.prices:
+            snapshot_date = date.fromisoformat(args.date) if args.date else date.today()
+            load_prices(args.prices, snapshot_date)
+
+if __name__ == "__main__":
+    main()
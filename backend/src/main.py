@@ -1,5 +1,16 @@
 import os
 import sys
+
+# Serve with gevent so each idle notification stream is a greenlet, not an OS
+# thread. Patching has to happen before anything else imports threading, socket
+# or time; WSGI_SERVER=threaded keeps the Werkzeug development server.
+USE_GEVENT = __name__ == '__main__' and os.environ.get('WSGI_SERVER', 'gevent') == 'gevent'
+if USE_GEVENT:
+    from gevent import monkey
+    monkey.patch_all()
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file (for local development)
@@ -10,8 +21,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
 from src.models.user import db, User
-from src.models.card import Card, CollectionCard, Deck, DeckCard
+from src.models.card import Card, CardKeyword, CardSet, CollectionCard, Deck, DeckCard
 from src.routes.user import user_bp
 from src.routes.cards import cards_bp
 from src.routes.decks import decks_bp
@@ -22,6 +35,13 @@ from src.models.achievement import Achievement, UserAchievement, AchievementNoti
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
 
+# Achievement evaluation: 'async' queues it for background workers, 'sync' runs it in the request
+app.config['ACHIEVEMENT_EVALUATION'] = os.environ.get('ACHIEVEMENT_EVALUATION', 'async')
+# In-process worker threads; set to 0 when running achievement_worker.py separately
+app.config['ACHIEVEMENT_WORKERS'] = int(os.environ.get('ACHIEVEMENT_WORKERS', 2))
+# Viewed achievement notifications older than this are removed by prune_notifications.py
+app.config['NOTIFICATION_RETENTION_DAYS'] = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 30))
+
 # Enable CORS for all routes with specific configuration
 CORS(app, origins=[
     "http://localhost:5173", 
@@ -82,13 +102,75 @@ def create_default_users():
         print(f"Error creating default users: {e}")
         db.session.rollback()
 
+def create_missing_columns():
+    """Add nullable columns added to existing tables (db.create_all only creates new tables)"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            try:
+                with db.engine.begin() as connection:
+                    connection.exec_driver_sql(
+                        f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                        f'{column.type.compile(dialect=db.engine.dialect)}'
+                    )
+            except Exception as e:
+                print(f"Error adding column {table.name}.{column.name}: {e}")
+
+def create_missing_indexes():
+    """Create indexes added to existing tables (db.create_all only indexes new tables)"""
+    # IF NOT EXISTS rather than checkfirst: reflection can't see expression indexes
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+            except Exception as e:
+                print(f"Error creating index {index.name}: {e}")
+
+def sync_card_indexes():
+    """Populate derived card index tables for cards cached before they existed"""
+    try:
+        from src.services.card_cache_service import CardCacheService
+        indexed = CardCacheService.backfill_keyword_index()
+        if indexed:
+            print(f"Indexed {indexed} card keywords")
+        subtypes = CardCacheService.backfill_subtype_index()
+        if subtypes:
+            print(f"Indexed {subtypes} card subtypes")
+        parsed = CardCacheService.backfill_mana_costs()
+        if parsed:
+            print(f"Parsed mana costs for {parsed} cards")
+    except Exception as e:
+        print(f"Error syncing card indexes: {e}")
+        db.session.rollback()
+
+def sync_leaderboard():
+    """Build achievement points totals for users who completed achievements before they were tracked"""
+    try:
+        from src.services.leaderboard_service import LeaderboardService
+        ranked = LeaderboardService.backfill_points()
+        if ranked:
+            print(f"Ranked {ranked} users on the achievement leaderboard")
+    except Exception as e:
+        print(f"Error syncing leaderboard: {e}")
+        db.session.rollback()
+
 def initialize_database():
     """Initialize database with better error handling"""
     try:
         print("Initializing database...")
         db.create_all()
+        create_missing_columns()
+        create_missing_indexes()
         print("Database tables created successfully")
         create_default_users()
+        sync_card_indexes()
+        sync_leaderboard()
         print("Database initialization complete")
     except Exception as e:
         print(f"Database initialization failed: {e}")
@@ -156,4 +238,14 @@ if __name__ == '__main__':
     # Use PORT environment variable for Railway deployment
     port = int(os.environ.get('PORT', 5001))
     print(f"Starting server on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    # Fork the simulation workers before any other thread exists
+    from src.services.deck_simulation_service import DeckSimulationService
+    DeckSimulationService.start_pool()
+    # Pick up jobs queued before a restart without waiting for the next mutation
+    from src.services.achievement_job_service import AchievementJobService
+    AchievementJobService.start_workers(app)
+    if USE_GEVENT:
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(('0.0.0.0', port), app).serve_forever()
+    else:
+        app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
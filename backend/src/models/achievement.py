@@ -67,10 +67,74 @@ class AchievementNotification(db.Model):
     # Relationships
     achievement = db.relationship('Achievement')
     
+    # Inbox pages are keyset scans of one user's (un)viewed rows, newest first
+    __table_args__ = (
+        db.Index('idx_achievement_notifications_inbox', 'user_id', 'is_viewed', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'achievement': self.achievement.to_dict(),
             'is_viewed': self.is_viewed,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+class AchievementCatalog(db.Model):
+    """Single-row version counter for the achievement catalog, bumped whenever achievements change"""
+    __tablename__ = 'achievement_catalog'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class AchievementJob(db.Model):
+    """Queued achievement evaluation for a user; pending jobs of one user are merged"""
+    __tablename__ = 'achievement_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    trigger_type = db.Column(db.String(50), nullable=False)
+    events = db.Column(db.JSON, nullable=False)  # Mutation deltas, see AchievementService.apply_events
+    status = db.Column(db.String(20), default='pending', nullable=False)  # 'pending', 'running', 'failed'
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Workers look up pending jobs in order and per user
+    __table_args__ = (
+        db.Index('idx_achievement_jobs_status_user', 'status', 'user_id'),
+    )
+
+class UserPoints(db.Model):
+    """Per-user achievement points total, kept current as achievements complete.
+
+    rank is precomputed from points by LeaderboardService.refresh_ranks, so
+    leaderboard reads are index lookups on (rank, user_id) instead of a SUM over
+    every user's achievements.
+    """
+    __tablename__ = 'user_points'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    points = db.Column(db.Integer, default=0, nullable=False)
+    achievements_completed = db.Column(db.Integer, default=0, nullable=False)
+    rank = db.Column(db.Integer)  # 1 = most points; ties share a rank. Null until first ranked
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('idx_user_points_rank', 'rank', 'user_id'),
+        db.Index('idx_user_points_points', 'points'),
+    )
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'username': self.user.username if self.user else None,
+            'points': self.points,
+            'achievements_completed': self.achievements_completed,
+            'rank': self.rank
+        }
@@ -1,5 +1,6 @@
 from src.models.user import db
 from datetime import datetime
+import re
 import uuid
 
 class Card(db.Model):
@@ -24,6 +25,13 @@ class Card(db.Model):
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Set completion groups a user's collection by set_code; decklist import
+    # resolves names case-insensitively
+    __table_args__ = (
+        db.Index('idx_cards_cache_set', 'set_code', 'scryfall_id'),
+        db.Index('idx_cards_cache_name_lower', db.func.lower(name)),
+    )
+    
     def __repr__(self):
         return f'<Card {self.name}>'
     
@@ -48,6 +56,225 @@ class Card(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class CardSet(db.Model):
+    """Cached Scryfall set catalog"""
+    __tablename__ = 'sets'
+    
+    code = db.Column(db.String(10), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    set_type = db.Column(db.String(30))
+    card_count = db.Column(db.Integer, default=0, nullable=False)
+    released_at = db.Column(db.Date)
+    icon_svg_uri = db.Column(db.String(500))
+    
+    def __repr__(self):
+        return f'<CardSet {self.code}>'
+    
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'name': self.name,
+            'set_type': self.set_type,
+            'card_count': self.card_count,
+            'released_at': self.released_at.isoformat() if self.released_at else None,
+            'icon_svg_uri': self.icon_svg_uri
+        }
+
+class CardKeyword(db.Model):
+    """Normalized keyword index for cached cards (one row per card/keyword pair)"""
+    __tablename__ = 'card_keywords'
+    
+    scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), primary_key=True)
+    keyword = db.Column(db.String(100), primary_key=True)
+    
+    # Keyword-first index so filters and GROUP BY keyword don't scan the whole table
+    __table_args__ = (
+        db.Index('idx_card_keywords_keyword', 'keyword', 'scryfall_id'),
+    )
+    
+    def __repr__(self):
+        return f'<CardKeyword {self.scryfall_id} {self.keyword}>'
+
+class CardSubtype(db.Model):
+    """Subtypes from each card's type line (one row per card/subtype pair)"""
+    __tablename__ = 'card_subtypes'
+    
+    scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), primary_key=True)
+    subtype = db.Column(db.String(100), primary_key=True)
+    
+    __table_args__ = (
+        db.Index('idx_card_subtypes_subtype', 'subtype', 'scryfall_id'),
+    )
+    
+    @staticmethod
+    def normalize(subtype):
+        """Normalize a subtype to Scryfall's casing ('dRAGON' -> 'Dragon')"""
+        return subtype.strip().capitalize()
+    
+    @staticmethod
+    def subtypes_from_type_line(type_line):
+        """Distinct subtypes of every face ('Creature — Human Wizard // ...')"""
+        subtypes = set()
+        for face in (type_line or '').split('//'):
+            if '—' in face:
+                subtypes.update(CardSubtype.normalize(s) for s in face.split('—', 1)[1].split())
+        return subtypes
+    
+    def __repr__(self):
+        return f'<CardSubtype {self.scryfall_id} {self.subtype}>'
+
+# Bit positions for CardLegality masks - append only, existing positions must never move
+LEGALITY_FORMATS = [
+    'standard', 'future', 'historic', 'timeless', 'gladiator', 'pioneer', 'explorer',
+    'modern', 'legacy', 'pauper', 'vintage', 'penny', 'commander', 'oathbreaker',
+    'standardbrawl', 'brawl', 'alchemy', 'paupercommander', 'duel', 'oldschool',
+    'premodern', 'predh'
+]
+
+def legality_bit(format_name):
+    """Bit for a format in the CardLegality masks"""
+    return 1 << LEGALITY_FORMATS.index(format_name)
+
+class CardLegality(db.Model):
+    """Per-format legality of a cached card as legal/banned/restricted bitmasks"""
+    __tablename__ = 'card_legalities'
+    
+    scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), primary_key=True)
+    legal_mask = db.Column(db.Integer, default=0, nullable=False)
+    banned_mask = db.Column(db.Integer, default=0, nullable=False)
+    restricted_mask = db.Column(db.Integer, default=0, nullable=False)
+    
+    @staticmethod
+    def masks_from_scryfall(legalities):
+        """Encode a Scryfall 'legalities' dict ({format: status}) into the three masks"""
+        masks = {'legal': 0, 'banned': 0, 'restricted': 0}
+        for format_name, status in (legalities or {}).items():
+            if format_name in LEGALITY_FORMATS and status in masks:
+                masks[status] |= legality_bit(format_name)
+        return {
+            'legal_mask': masks['legal'],
+            'banned_mask': masks['banned'],
+            'restricted_mask': masks['restricted']
+        }
+    
+    def __repr__(self):
+        return f'<CardLegality {self.scryfall_id}>'
+    
+    def to_dict(self):
+        legalities = {}
+        for format_name in LEGALITY_FORMATS:
+            bit = legality_bit(format_name)
+            if self.legal_mask & bit:
+                legalities[format_name] = 'legal'
+            elif self.banned_mask & bit:
+                legalities[format_name] = 'banned'
+            elif self.restricted_mask & bit:
+                legalities[format_name] = 'restricted'
+            else:
+                legalities[format_name] = 'not_legal'
+        return legalities
+
+# Colored mana symbols in the order of the CardManaCost pip columns
+MANA_COLORS = ['W', 'U', 'B', 'R', 'G']
+
+class CardManaCost(db.Model):
+    """Mana cost of a cached card parsed into pip counts, so devotion and pip stats are SQL sums.
+
+    Colored columns count devotion: a hybrid or phyrexian symbol counts for each of
+    its colors.
+    """
+    __tablename__ = 'card_mana_costs'
+    
+    scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), primary_key=True)
+    w = db.Column(db.SmallInteger, default=0, nullable=False)
+    u = db.Column(db.SmallInteger, default=0, nullable=False)
+    b = db.Column(db.SmallInteger, default=0, nullable=False)
+    r = db.Column(db.SmallInteger, default=0, nullable=False)
+    g = db.Column(db.SmallInteger, default=0, nullable=False)
+    c = db.Column(db.SmallInteger, default=0, nullable=False)  # {C} colorless-specific
+    generic = db.Column(db.SmallInteger, default=0, nullable=False)
+    hybrid = db.Column(db.SmallInteger, default=0, nullable=False)  # {W/U}, {2/W}
+    phyrexian = db.Column(db.SmallInteger, default=0, nullable=False)  # {W/P}, {W/U/P}
+    x = db.Column(db.SmallInteger, default=0, nullable=False)  # {X}, {Y}, {Z}
+    
+    @staticmethod
+    def counts_from_mana_cost(mana_cost):
+        """Parse a mana cost string ('{2}{W}{W}', '{W/U}{R/P}', split '{R} // {1}{W}') into column values"""
+        counts = {column: 0 for column in ('w', 'u', 'b', 'r', 'g', 'c', 'generic', 'hybrid', 'phyrexian', 'x')}
+        
+        for symbol in re.findall(r'\{([^}]+)\}', (mana_cost or '').upper()):
+            parts = symbol.split('/')
+            if len(parts) == 1:
+                if symbol.isdigit():
+                    counts['generic'] += int(symbol)
+                elif symbol in MANA_COLORS or symbol == 'C':
+                    counts[symbol.lower()] += 1
+                elif symbol in ('X', 'Y', 'Z'):
+                    counts['x'] += 1
+                continue
+            
+            if 'P' in parts:
+                counts['phyrexian'] += 1
+            if len([part for part in parts if part != 'P']) > 1:
+                counts['hybrid'] += 1
+            for part in parts:
+                if part in MANA_COLORS or part == 'C':
+                    counts[part.lower()] += 1
+        
+        return counts
+    
+    @staticmethod
+    def sum_columns(quantity):
+        """SUM(quantity * column) expressions for every pip column, for aggregate queries"""
+        return [
+            db.func.coalesce(db.func.sum(quantity * getattr(CardManaCost, column)), 0).label(column)
+            for column in ('w', 'u', 'b', 'r', 'g', 'c', 'generic', 'hybrid', 'phyrexian', 'x')
+        ]
+    
+    @staticmethod
+    def totals_to_dict(row):
+        """Shape a sum_columns() result row for API responses"""
+        devotion = {color: int(getattr(row, color.lower())) for color in MANA_COLORS}
+        return {
+            'devotion': devotion,
+            'colored_pips': sum(devotion.values()),
+            'colorless_pips': int(row.c),
+            'generic': int(row.generic),
+            'hybrid': int(row.hybrid),
+            'phyrexian': int(row.phyrexian),
+            'x': int(row.x)
+        }
+    
+    def __repr__(self):
+        return f'<CardManaCost {self.scryfall_id}>'
+
+class CardPrice(db.Model):
+    """Daily price snapshot per cached card, loaded from Scryfall bulk data (prices in cents)"""
+    __tablename__ = 'card_prices'
+    
+    scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), primary_key=True)
+    snapshot_date = db.Column(db.Date, primary_key=True)
+    usd_cents = db.Column(db.Integer)
+    usd_foil_cents = db.Column(db.Integer)
+    eur_cents = db.Column(db.Integer)
+    
+    # Date-first index for "latest snapshot" lookups and value-over-time range scans
+    __table_args__ = (
+        db.Index('idx_card_prices_snapshot', 'snapshot_date', 'scryfall_id'),
+    )
+    
+    def __repr__(self):
+        return f'<CardPrice {self.scryfall_id} {self.snapshot_date}>'
+    
+    def to_dict(self):
+        return {
+            'scryfall_id': self.scryfall_id,
+            'snapshot_date': self.snapshot_date.isoformat() if self.snapshot_date else None,
+            'usd': self.usd_cents / 100 if self.usd_cents is not None else None,
+            'usd_foil': self.usd_foil_cents / 100 if self.usd_foil_cents is not None else None,
+            'eur': self.eur_cents / 100 if self.eur_cents is not None else None
+        }
+
 class CollectionCard(db.Model):
     """User's card collection with printing variant support"""
     __tablename__ = 'collection_cards'
@@ -117,6 +344,36 @@ class Deck(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class DeckStats(db.Model):
+    """Cached per-deck statistics, refreshed whenever the deck's cards change"""
+    __tablename__ = 'deck_stats'
+    
+    deck_id = db.Column(db.String(36), db.ForeignKey('decks.id'), primary_key=True)
+    total_cards = db.Column(db.Integer, default=0, nullable=False)
+    mainboard_cards = db.Column(db.Integer, default=0, nullable=False)
+    sideboard_cards = db.Column(db.Integer, default=0, nullable=False)
+    mana_curve = db.Column(db.JSON)
+    color_distribution = db.Column(db.JSON)
+    type_breakdown = db.Column(db.JSON)
+    average_cmc = db.Column(db.Float)
+    mana_symbols = db.Column(db.JSON)  # Devotion and pip totals, see DeckStatsService.mana_symbols
+    updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DeckStats deck={self.deck_id}>'
+    
+    def to_dict(self):
+        return {
+            'total_cards': self.total_cards,
+            'mainboard_cards': self.mainboard_cards,
+            'sideboard_cards': self.sideboard_cards,
+            'mana_curve': self.mana_curve or {},
+            'color_distribution': self.color_distribution or {},
+            'type_breakdown': self.type_breakdown or {},
+            'average_cmc': self.average_cmc,
+            'mana_symbols': self.mana_symbols or {}
+        }
+
 class DeckCard(db.Model):
     """Cards in decks"""
     __tablename__ = 'deck_cards'
@@ -125,7 +382,7 @@ class DeckCard(db.Model):
     deck_id = db.Column(db.String(36), db.ForeignKey('decks.id'), nullable=False, index=True)
     scryfall_id = db.Column(db.String(36), db.ForeignKey('cards_cache.scryfall_id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, default=1, nullable=False)
-    card_type = db.Column(db.String(20), default='mainboard')  # 'mainboard' or 'sideboard'
+    card_type = db.Column(db.String(20), default='mainboard')  # 'mainboard', 'sideboard' or 'commander'
     added_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
     
     # Relationships
@@ -147,4 +404,42 @@ class DeckCard(db.Model):
             'card_type': self.card_type,
             'added_at': self.added_at.isoformat() if self.added_at else None,
             'card': self.card.to_dict() if self.card else None
-        }
\ No newline at end of file
+        }
+
+class ReferenceDeck(db.Model):
+    """Reference decklists (imported from files) that collections are matched against"""
+    __tablename__ = 'reference_decks'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = db.Column(db.String(255), nullable=False)
+    format = db.Column(db.String(50), index=True)
+    source = db.Column(db.String(500), unique=True)  # File the list was imported from
+    card_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ReferenceDeck {self.name}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'format': self.format,
+            'source': self.source,
+            'card_count': self.card_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ReferenceDeckCard(db.Model):
+    """Cards in reference decklists, keyed by card name so any printing matches"""
+    __tablename__ = 'reference_deck_cards'
+    
+    reference_deck_id = db.Column(db.String(36), db.ForeignKey('reference_decks.id'), primary_key=True)
+    card_name = db.Column(db.String(255), primary_key=True)
+    card_type = db.Column(db.String(20), primary_key=True, default='mainboard')
+    quantity = db.Column(db.Integer, default=1, nullable=False)
+    
+    def __repr__(self):
+        return f'<ReferenceDeckCard deck={self.reference_deck_id} card={self.card_name} qty={self.quantity}>'
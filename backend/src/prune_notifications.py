@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Achievement Notification Retention
+Delete viewed achievement notifications older than the retention period
+(NOTIFICATION_RETENTION_DAYS, 30 by default) in small committed batches, so
+the notifications table stays small. Run it periodically, e.g. from cron.
+Completed achievements themselves are kept in user_achievements.
+
+Usage:
+    python prune_notifications.py                            # Use NOTIFICATION_RETENTION_DAYS
+    python prune_notifications.py --days 7                   # Custom retention period
+    python prune_notifications.py --archive archive.jsonl    # Append pruned rows to a JSON lines file first
+    python prune_notifications.py --batch-size 5000
+"""
+
+import sys
+import os
+import argparse
+import json
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.notification_inbox_service import NotificationInboxService
+from src.main import app
+
+def archive_to(path):
+    """on_batch callback appending each pruned notification to a JSON lines file"""
+    def archive(notifications):
+        with open(path, 'a', encoding='utf-8') as f:
+            for notification in notifications:
+                f.write(json.dumps({
+                    'id': notification.id,
+                    'user_id': notification.user_id,
+                    'achievement_id': notification.achievement_id,
+                    'created_at': notification.created_at.isoformat()
+                }) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+    return archive
+
+def main():
+    parser = argparse.ArgumentParser(description='Prune old viewed achievement notifications')
+    parser.add_argument('--days', type=int, help='Retention period (default NOTIFICATION_RETENTION_DAYS)')
+    parser.add_argument('--batch-size', type=int, default=NotificationInboxService.PRUNE_BATCH_SIZE,
+                        help='Rows deleted per commit')
+    parser.add_argument('--archive', metavar='PATH', help='Append pruned rows to this JSON lines file')
+
+    args = parser.parse_args()
+    days = args.days if args.days is not None else app.config['NOTIFICATION_RETENTION_DAYS']
+
+    with app.app_context():
+        print(f"🧹 Pruning viewed notifications older than {days} days...")
+        started = time.time()
+        deleted = NotificationInboxService.prune(
+            days, max(args.batch_size, 1), archive_to(args.archive) if args.archive else None
+        )
+        archived = f", archived to {args.archive}" if args.archive and deleted else ""
+        print(f"✅ Deleted {deleted} notifications in {time.time() - started:.1f}s{archived}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from src.models.user import db
-from src.models.achievement import Achievement, UserAchievement, AchievementNotification
+from src.models.achievement import AchievementNotification
 from src.services.achievement_service import AchievementService
+from src.services.notification_broker import NotificationBroker
+from src.services.leaderboard_service import LeaderboardService
+from src.services.notification_inbox_service import NotificationInboxService
 
 achievements_bp = Blueprint('achievements', __name__)
 
@@ -11,59 +14,75 @@ def get_user_achievements():
     user_id = request.args.get('user_id', 1, type=int)
     
     try:
-        # Get all achievements with user progress
-        achievements = db.session.query(Achievement).outerjoin(
-            UserAchievement, 
-            (Achievement.id == UserAchievement.achievement_id) & 
-            (UserAchievement.user_id == user_id)
-        ).all()
-        
-        result = []
-        for achievement in achievements:
-            user_progress = UserAchievement.query.filter_by(
-                user_id=user_id, 
-                achievement_id=achievement.id
-            ).first()
-            
-            achievement_data = achievement.to_dict()
-            if user_progress:
-                achievement_data.update({
-                    'user_progress': user_progress.progress,
-                    'is_completed': user_progress.is_completed,
-                    'completed_at': user_progress.completed_at.isoformat() if user_progress.completed_at else None
-                })
-            else:
-                achievement_data.update({
-                    'user_progress': {'current': 0, 'target': achievement.criteria.get('target', 1), 'completed': False},
-                    'is_completed': False,
-                    'completed_at': None
-                })
-            
-            result.append(achievement_data)
+        result = AchievementService.list_for_user(user_id)
         
         return jsonify({'achievements': result})
         
     except Exception as e:
         return jsonify({'error': f'Failed to get achievements: {str(e)}'}), 500
 
+@achievements_bp.route('/achievements/leaderboard', methods=['GET'])
+def get_points_leaderboard():
+    """Achievement points leaderboard: top entries plus the user's rank and neighbors"""
+    user_id = request.args.get('user_id', 1, type=int)
+    limit = request.args.get('limit', 10, type=int)
+    around = request.args.get('around', 3, type=int)
+    
+    try:
+        return jsonify(LeaderboardService.get_leaderboard(user_id, limit, around))
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get leaderboard: {str(e)}'}), 500
+
 @achievements_bp.route('/achievements/notifications', methods=['GET'])
 def get_achievement_notifications():
-    """Get unviewed achievement notifications"""
+    """Get a page of achievement notifications, newest first.
+    
+    Unviewed only unless include_viewed=true; pass next_cursor back as cursor
+    for the following page.
+    """
     user_id = request.args.get('user_id', 1, type=int)
+    limit = request.args.get('limit', NotificationInboxService.DEFAULT_LIMIT, type=int)
+    cursor = request.args.get('cursor')
+    include_viewed = request.args.get('include_viewed', 'false').lower() == 'true'
     
     try:
-        notifications = AchievementNotification.query.filter_by(
-            user_id=user_id, 
-            is_viewed=False
-        ).order_by(AchievementNotification.created_at.desc()).all()
+        try:
+            notifications, next_cursor = NotificationInboxService.get_page(
+                user_id, limit, cursor, include_viewed
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
         
         return jsonify({
-            'notifications': [notif.to_dict() for notif in notifications]
+            'notifications': [notif.to_dict() for notif in notifications],
+            'next_cursor': next_cursor,
+            'unviewed_count': NotificationInboxService.unviewed_count(user_id)
         })
         
     except Exception as e:
         return jsonify({'error': f'Failed to get notifications: {str(e)}'}), 500
 
+@achievements_bp.route('/achievements/notifications/stream', methods=['GET'])
+def stream_achievement_notifications():
+    """Server-Sent Events stream of new achievement notifications.
+    
+    Resumes after the Last-Event-ID header (sent by EventSource on reconnect) or
+    the last_event_id query parameter; otherwise starts with the next notification.
+    """
+    user_id = request.args.get('user_id', 1, type=int)
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid last event id'}), 400
+    
+    return Response(
+        stream_with_context(NotificationBroker.stream(user_id, last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @achievements_bp.route('/achievements/notifications/<int:notification_id>/mark-viewed', methods=['PUT'])
 def mark_notification_viewed(notification_id):
     """Mark notification as viewed"""
@@ -81,6 +100,26 @@ def mark_notification_viewed(notification_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to mark notification: {str(e)}'}), 500
 
+@achievements_bp.route('/achievements/notifications/mark-viewed', methods=['PUT'])
+def mark_notifications_viewed():
+    """Mark all of a user's notifications up to up_to_id (or every one) as viewed"""
+    data = request.get_json() or {}
+    user_id = data.get('user_id', 1)
+    up_to_id = data.get('up_to_id')
+    
+    if up_to_id is not None and not isinstance(up_to_id, int):
+        return jsonify({'error': 'up_to_id must be a notification id'}), 400
+    
+    try:
+        marked = NotificationInboxService.mark_viewed(user_id, up_to_id)
+        db.session.commit()
+        
+        return jsonify({'message': f'Marked {marked} notifications as viewed', 'marked': marked})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to mark notifications: {str(e)}'}), 500
+
 @achievements_bp.route('/achievements/check', methods=['POST'])
 def trigger_achievement_check():
     """Manually trigger achievement check for user"""
@@ -1,10 +1,16 @@
 from flask import Blueprint, request, jsonify
 import requests
+import threading
 import time
+from collections import OrderedDict
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db
-from src.models.card import Card, CollectionCard
+from src.models.card import Card, CardKeyword, CardLegality, CardManaCost, CardPrice, CardSet, CollectionCard, LEGALITY_FORMATS, legality_bit
+from datetime import date
 from src.middleware.auth import require_auth
+from src.services.achievement_service import AchievementService
+from src.services.card_cache_service import CardCacheService
 
 cards_bp = Blueprint('cards', __name__)
 
@@ -78,38 +84,8 @@ def search_cards():
             existing_card = Card.query.filter_by(scryfall_id=scryfall_id_to_process).first()
             
             if not existing_card:
-                # Extract image URLs - prioritize art_crop, fallback to normal, then to None
-                image_uris = card_data.get('image_uris', {})
-                image_uri = None
-                
-                if image_uris:
-                    # Prefer art_crop for compact display
-                    image_uri = image_uris.get('art_crop')
-                    if not image_uri:
-                        # Fallback to normal if art_crop not available
-                        image_uri = image_uris.get('small')
-                    if not image_uri:
-                        # Final fallback to normal
-                        image_uri = image_uris.get('normal')
-                
-                # Create new card entry
-                card = Card(
-                    scryfall_id=scryfall_id_to_process,
-                    name=card_data['name'],
-                    mana_cost=card_data.get('mana_cost', ''),
-                    cmc=card_data.get('cmc', 0),
-                    type_line=card_data.get('type_line', ''),
-                    oracle_text=card_data.get('oracle_text', ''),
-                    colors=card_data.get('colors', []),
-                    keywords=card_data.get('keywords', []),
-                    image_uri=image_uri,  # Now stores art_crop URL
-                    power=card_data.get('power'),
-                    toughness=card_data.get('toughness'),
-                    rarity=card_data.get('rarity', ''),
-                    set_code=card_data.get('set', ''),
-                    set_name=card_data.get('set_name', '')
-                )
-                db.session.add(card)
+                # Create new card entry (plus its keyword index rows)
+                card = CardCacheService.cache_card(card_data)
                 final_cards.append(card.to_dict())
             else:
                 final_cards.append(existing_card.to_dict())
@@ -176,12 +152,16 @@ def add_to_collection():
         if existing_entry:
             # Update quantity
             existing_entry.quantity += quantity
+            newly_completed = AchievementService.record_collection_change(
+                user_id, scryfall_id, quantity, is_foil=existing_entry.is_foil, condition=existing_entry.condition
+            )
             db.session.commit()
-
             
             return jsonify({
                 'message': 'Card quantity updated',
                 'collection_card': existing_entry.to_dict(),
+                'newly_completed_achievements': len(newly_completed),
+                'achievements': [a.to_dict() for a in newly_completed]
             })
         else:
             # Add new entry with default printing details from the card data
@@ -202,13 +182,11 @@ def add_to_collection():
                 printing_details=printing_details if any(printing_details.values()) else None
             )
             db.session.add(collection_card)
-            db.session.commit()
-
-            # Trigger achievement check
-            from src.services.achievement_service import AchievementService
-            newly_completed = AchievementService.check_and_update_achievements(
-                user_id, 'collection_update'
+            # Update achievement counters for the new entry
+            newly_completed = AchievementService.record_collection_change(
+                user_id, scryfall_id, quantity, rows_delta=1, is_foil=is_foil, condition=condition
             )
+            db.session.commit()
             return jsonify({
                 'message': 'Card added to collection',
                 'collection_card': collection_card.to_dict(),
@@ -230,12 +208,16 @@ def search_collection():
     if request.current_user.id != user_id:
         return jsonify({"error": "Unauthorized"}), 403
     
-    query = request.args.get('q', '').strip()
-    colors = request.args.get('colors', '').split(',') if request.args.get('colors') else []
-    card_type = request.args.get('type', '').strip()
-    rarity = request.args.get('rarity', '').strip()
-    cmc_min = request.args.get('cmc_min', type=int)
-    cmc_max = request.args.get('cmc_max', type=int)
+    filters = {
+        'q': request.args.get('q', '').strip(),
+        'colors': request.args.get('colors', '').split(',') if request.args.get('colors') else [],
+        'type': request.args.get('type', '').strip(),
+        'rarity': request.args.get('rarity', '').strip(),
+        'cmc_min': request.args.get('cmc_min', type=int),
+        'cmc_max': request.args.get('cmc_max', type=int),
+        'keywords': [k for k in request.args.get('keywords', '').split(',') if k.strip()]
+    }
+    include_facets = request.args.get('facets', 'false').lower() == 'true'
     sort_by = request.args.get('sort_by', 'name')
     sort_order = request.args.get('sort_order', 'asc')
     page = request.args.get('page', 1, type=int)
@@ -243,50 +225,11 @@ def search_collection():
     
     try:
         # Build query
-        collection_query = db.session.query(CollectionCard).join(Card).filter(
-            CollectionCard.user_id == user_id
+        collection_query = apply_collection_filters(
+            db.session.query(CollectionCard).join(Card).filter(CollectionCard.user_id == user_id),
+            filters
         )
         
-        # Apply filters
-        if query:
-            collection_query = collection_query.filter(
-                db.or_(
-                    Card.name.ilike(f'%{query}%'),
-                    Card.type_line.ilike(f'%{query}%'),
-                    Card.oracle_text.ilike(f'%{query}%')
-                )
-            )
-        
-        if colors:
-            color_filters = []
-            for color in colors:
-                if color.strip():
-                    if color == 'Colorless':
-                        # For colorless cards: NULL colors or empty array using jsonb_array_length
-                        color_filters.append(db.or_(
-                            Card.colors.is_(None),
-                            text("jsonb_array_length(cards_cache.colors) = 0")
-                        ))
-                    else:
-                        # Use JSONB operator @> to check if the colors array contains the color
-                        # The @> operator checks if the left JSONB value contains the right JSONB value
-                        color_filters.append(Card.colors.op('@>')(f'["{color.strip().upper()}"]'))
-            if color_filters:
-                collection_query = collection_query.filter(db.or_(*color_filters))
-        
-        if card_type:
-            collection_query = collection_query.filter(Card.type_line.ilike(f'%{card_type}%'))
-        
-        if rarity:
-            collection_query = collection_query.filter(Card.rarity == rarity)
-        
-        # Apply CMC range filter
-        if cmc_min is not None:
-            collection_query = collection_query.filter(Card.cmc >= cmc_min)
-        if cmc_max is not None and cmc_max < 15:
-            # For cmc_max of 15, treat it as 15+ (no upper limit)
-            collection_query = collection_query.filter(Card.cmc <= cmc_max)
-        
         # Apply sorting
         if sort_by == 'name':
             order_column = Card.name
@@ -294,13 +237,21 @@ def search_collection():
             order_column = Card.cmc
         elif sort_by == 'quantity':
             order_column = CollectionCard.quantity
+        elif sort_by == 'value':
+            # Foil-aware unit price from the latest price snapshot
+            collection_query = collection_query.outerjoin(
+                CardPrice,
+                (CardPrice.scryfall_id == CollectionCard.scryfall_id) &
+                (CardPrice.snapshot_date == latest_price_snapshot())
+            )
+            order_column = unit_price_cents()
         else:
             order_column = Card.name
         
         if sort_order == 'desc':
-            collection_query = collection_query.order_by(order_column.desc())
+            collection_query = collection_query.order_by(order_column.desc().nullslast())
         else:
-            collection_query = collection_query.order_by(order_column.asc())
+            collection_query = collection_query.order_by(order_column.asc().nullslast())
         
         # Get total count before pagination
         total = collection_query.count()
@@ -309,17 +260,181 @@ def search_collection():
         offset = (page - 1) * per_page
         collection_cards = collection_query.offset(offset).limit(per_page).all()
         
-        return jsonify({
+        response = {
             'collection_cards': [cc.to_dict() for cc in collection_cards],
             'total': total,
             'page': page,
             'per_page': per_page,
             'pages': (total + per_page - 1) // per_page
-        })
+        }
+        
+        if include_facets:
+            response['facets'] = get_collection_facets(user_id, filters)
+        
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'error': f'Collection search failed: {str(e)}'}), 500
 
+
+def apply_collection_filters(collection_query, filters, exclude=None):
+    """Apply search filters to a CollectionCard/Card query, optionally skipping one facet"""
+    query = filters.get('q')
+    colors = filters.get('colors')
+    card_type = filters.get('type')
+    rarity = filters.get('rarity')
+    cmc_min = filters.get('cmc_min')
+    cmc_max = filters.get('cmc_max')
+    
+    # Apply filters
+    if query:
+        collection_query = collection_query.filter(
+            db.or_(
+                Card.name.ilike(f'%{query}%'),
+                Card.type_line.ilike(f'%{query}%'),
+                Card.oracle_text.ilike(f'%{query}%')
+            )
+        )
+    
+    if colors and exclude != 'colors':
+        color_filters = []
+        for color in colors:
+            if color.strip():
+                if color == 'Colorless':
+                    # For colorless cards: NULL colors or empty array using jsonb_array_length
+                    color_filters.append(db.or_(
+                        Card.colors.is_(None),
+                        text("jsonb_array_length(cards_cache.colors) = 0")
+                    ))
+                else:
+                    # Use JSONB operator @> to check if the colors array contains the color
+                    # The @> operator checks if the left JSONB value contains the right JSONB value
+                    color_filters.append(Card.colors.op('@>')(f'["{color.strip().upper()}"]'))
+        if color_filters:
+            collection_query = collection_query.filter(db.or_(*color_filters))
+    
+    if card_type and exclude != 'type':
+        collection_query = collection_query.filter(Card.type_line.ilike(f'%{card_type}%'))
+    
+    if rarity and exclude != 'rarity':
+        collection_query = collection_query.filter(Card.rarity == rarity)
+    
+    # Apply CMC range filter
+    if exclude != 'cmc':
+        if cmc_min is not None:
+            collection_query = collection_query.filter(Card.cmc >= cmc_min)
+        if cmc_max is not None and cmc_max < 15:
+            # For cmc_max of 15, treat it as 15+ (no upper limit)
+            collection_query = collection_query.filter(Card.cmc <= cmc_max)
+    
+    # Keyword filter - every requested keyword must be present (resolved via card_keywords index)
+    for keyword in filters.get('keywords') or []:
+        collection_query = collection_query.filter(
+            CollectionCard.scryfall_id.in_(
+                db.select(CardKeyword.scryfall_id).where(
+                    CardKeyword.keyword == CardCacheService.normalize_keyword(keyword)
+                )
+            )
+        )
+    
+    return collection_query
+
+
+# Facet aggregates keyed by (user, filters, collection fingerprint); only used without a text query
+FACET_CACHE_SIZE = 256
+_facet_cache = OrderedDict()
+_facet_cache_lock = threading.Lock()
+
+FACET_COLORS = ['W', 'U', 'B', 'R', 'G', 'Colorless']
+CMC_BUCKETS = ['0', '1', '2', '3', '4', '5', '6', '7+']
+
+
+def get_collection_facets(user_id, filters):
+    """Facet counts (collection entries) for colors, rarity, type category and cmc buckets.
+    
+    Each facet is computed with every filter applied except its own, so the counts
+    show what selecting another chip in that group would return.
+    """
+    cache_key = None
+    if not filters.get('q'):
+        fingerprint = db.session.query(
+            db.func.count(CollectionCard.id),
+            db.func.sum(CollectionCard.quantity),
+            db.func.max(CollectionCard.updated_at)
+        ).filter(CollectionCard.user_id == user_id).one()
+        
+        cache_key = (
+            user_id,
+            tuple(sorted(c.strip() for c in filters.get('colors') or [])),
+            filters.get('type'),
+            filters.get('rarity'),
+            filters.get('cmc_min'),
+            filters.get('cmc_max'),
+            tuple(sorted(CardCacheService.normalize_keyword(k) for k in filters.get('keywords') or [])),
+            tuple(str(value) for value in fingerprint)
+        )
+        with _facet_cache_lock:
+            cached = _facet_cache.get(cache_key)
+            if cached is not None:
+                _facet_cache.move_to_end(cache_key)
+                return cached
+    
+    def facet_query(*columns, exclude):
+        base = db.session.query(*columns, db.func.count(CollectionCard.id)).select_from(
+            CollectionCard
+        ).join(Card).filter(CollectionCard.user_id == user_id)
+        return apply_collection_filters(base, filters, exclude=exclude)
+    
+    # Colors: group by the stored color array, then explode the (few) distinct combinations
+    color_counts = {color: 0 for color in FACET_COLORS}
+    for colors, count in facet_query(Card.colors, exclude='colors').group_by(Card.colors).all():
+        if not colors:
+            color_counts['Colorless'] += count
+        for color in colors or []:
+            if color in color_counts:
+                color_counts[color] += count
+    
+    rarity_counts = {
+        rarity: count
+        for rarity, count in facet_query(Card.rarity, exclude='rarity').group_by(Card.rarity).all()
+        if rarity
+    }
+    
+    # Same precedence as analyze_card_types
+    type_line = db.func.lower(Card.type_line)
+    type_category = db.case(
+        (type_line.like('%creature%'), 'creatures'),
+        (type_line.like('%instant%'), 'instants'),
+        (type_line.like('%sorcery%'), 'sorceries'),
+        (type_line.like('%artifact%'), 'artifacts'),
+        (type_line.like('%enchantment%'), 'enchantments'),
+        (type_line.like('%planeswalker%'), 'planeswalkers'),
+        (type_line.like('%land%'), 'lands'),
+        else_='other'
+    ).label('type_category')
+    type_counts = dict(facet_query(type_category, exclude='type').group_by(type_category).all())
+    
+    cmc_bucket = db.case(
+        *[(db.func.coalesce(Card.cmc, 0) == int(bucket), bucket) for bucket in CMC_BUCKETS[:-1]],
+        else_=CMC_BUCKETS[-1]
+    ).label('cmc_bucket')
+    cmc_counts = dict(facet_query(cmc_bucket, exclude='cmc').group_by(cmc_bucket).all())
+    
+    facets = {
+        'colors': color_counts,
+        'rarity': rarity_counts,
+        'type': type_counts,
+        'cmc': {bucket: cmc_counts.get(bucket, 0) for bucket in CMC_BUCKETS}
+    }
+    
+    if cache_key is not None:
+        with _facet_cache_lock:
+            _facet_cache[cache_key] = facets
+            if len(_facet_cache) > FACET_CACHE_SIZE:
+                _facet_cache.popitem(last=False)
+    
+    return facets
+
 @cards_bp.route('/collection/index', methods=['GET'])
 @require_auth
 def get_collection_index():
@@ -378,14 +493,24 @@ def update_collection_card():
         if not collection_card:
             return jsonify({'error': 'Collection card not found'}), 404
         
+        old_quantity = collection_card.quantity
+        
         if new_quantity <= 0:
             # Remove card from collection
             db.session.delete(collection_card)
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, -old_quantity, rows_delta=-1,
+                is_foil=collection_card.is_foil, condition=collection_card.condition
+            )
             db.session.commit()
             return jsonify({'message': 'Card removed from collection'})
         else:
             # Update quantity
             collection_card.quantity = new_quantity
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, new_quantity - old_quantity,
+                is_foil=collection_card.is_foil, condition=collection_card.condition
+            )
             db.session.commit()
             return jsonify({
                 'message': 'Card quantity updated',
@@ -418,14 +543,24 @@ def update_card_quantity():
         if not collection_card:
             return jsonify({'error': 'Collection card not found'}), 404
         
+        old_quantity = collection_card.quantity
+        
         if new_quantity <= 0:
             # Remove card from collection
             db.session.delete(collection_card)
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, -old_quantity, rows_delta=-1,
+                is_foil=collection_card.is_foil, condition=collection_card.condition
+            )
             db.session.commit()
             return jsonify({'message': 'Card removed from collection'})
         else:
             # Update quantity
             collection_card.quantity = new_quantity
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, new_quantity - old_quantity,
+                is_foil=collection_card.is_foil, condition=collection_card.condition
+            )
             db.session.commit()
             return jsonify({
                 'message': 'Card quantity updated',
@@ -459,6 +594,10 @@ def remove_from_collection():
         
         # Remove card from collection
         db.session.delete(collection_card)
+        AchievementService.record_collection_change(
+            user_id, card_id, -collection_card.quantity, rows_delta=-1,
+            is_foil=collection_card.is_foil, condition=collection_card.condition
+        )
         db.session.commit()
         return jsonify({'message': 'Card removed from collection'})
         
@@ -553,14 +692,11 @@ def collection_stats():
         # === KEYWORDS ANALYSIS ===
         keyword_stats = analyze_keywords(user_id)
         
-        # === FORMAT LEGALITY (placeholder for now) ===
-        format_legality = {
-            'standard': 0,
-            'modern': 0,
-            'legacy': 0,
-            'extended': 0,
-            'other_formats': {}
-        }
+        # === FORMAT LEGALITY ===
+        format_legality = analyze_format_legality(user_id)
+        
+        # === MANA SYMBOLS ===
+        mana_symbols = analyze_mana_symbols(user_id)
         
         return jsonify({
             # Basic overview
@@ -578,13 +714,170 @@ def collection_stats():
             'tribal_analysis': tribal_stats,
             'set_distribution': set_distribution,
             'keyword_analysis': keyword_stats,
-            'format_legality': format_legality
+            'format_legality': format_legality,
+            'mana_symbols': mana_symbols
         })
         
     except Exception as e:
         return jsonify({'error': f'Failed to get stats: {str(e)}'}), 500
 
 
+def latest_price_snapshot():
+    """Scalar subquery for the most recent price snapshot date"""
+    return db.select(db.func.max(CardPrice.snapshot_date)).scalar_subquery()
+
+
+def unit_price_cents():
+    """Price of one copy of a collection entry, using the foil price for foils"""
+    return db.case(
+        (CollectionCard.is_foil, db.func.coalesce(CardPrice.usd_foil_cents, CardPrice.usd_cents)),
+        else_=db.func.coalesce(CardPrice.usd_cents, CardPrice.usd_foil_cents)
+    )
+
+
+@cards_bp.route('/collection/value', methods=['GET'])
+@require_auth
+def collection_value():
+    """Get collection value (USD) from the latest price snapshot"""
+    user_id = request.args.get('user_id', type=int)
+    
+    # Verify user can only access their own collection
+    if request.current_user.id != user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    try:
+        snapshot_date = db.session.query(db.func.max(CardPrice.snapshot_date)).scalar()
+        
+        # One aggregate over the collection joined to the snapshot on scryfall_id
+        unit_price = unit_price_cents()
+        total_cents, priced_cards, total_cards = db.session.query(
+            db.func.sum(CollectionCard.quantity * unit_price),
+            db.func.sum(db.case((unit_price.isnot(None), CollectionCard.quantity), else_=0)),
+            db.func.sum(CollectionCard.quantity)
+        ).select_from(CollectionCard).outerjoin(
+            CardPrice,
+            (CardPrice.scryfall_id == CollectionCard.scryfall_id) &
+            (CardPrice.snapshot_date == snapshot_date)
+        ).filter(
+            CollectionCard.user_id == user_id
+        ).one()
+        
+        return jsonify({
+            'currency': 'usd',
+            'snapshot_date': snapshot_date.isoformat() if snapshot_date else None,
+            'total_value': round((total_cents or 0) / 100, 2),
+            'priced_cards': priced_cards or 0,
+            'unpriced_cards': (total_cards or 0) - (priced_cards or 0)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get collection value: {str(e)}'}), 500
+
+
+@cards_bp.route('/collection/value/history', methods=['GET'])
+@require_auth
+def collection_value_history():
+    """Get the value of the current collection for each price snapshot in a date range"""
+    user_id = request.args.get('user_id', type=int)
+    
+    # Verify user can only access their own collection
+    if request.current_user.id != user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+    
+    try:
+        history_query = db.session.query(
+            CardPrice.snapshot_date,
+            db.func.sum(CollectionCard.quantity * unit_price_cents())
+        ).select_from(CollectionCard).join(
+            CardPrice, CardPrice.scryfall_id == CollectionCard.scryfall_id
+        ).filter(
+            CollectionCard.user_id == user_id
+        )
+        
+        if start:
+            history_query = history_query.filter(CardPrice.snapshot_date >= start)
+        if end:
+            history_query = history_query.filter(CardPrice.snapshot_date <= end)
+        
+        history = history_query.group_by(CardPrice.snapshot_date).order_by(CardPrice.snapshot_date).all()
+        
+        return jsonify({
+            'currency': 'usd',
+            'history': [
+                {
+                    'snapshot_date': snapshot_date.isoformat(),
+                    'total_value': round((total_cents or 0) / 100, 2)
+                }
+                for snapshot_date, total_cents in history
+            ]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get collection value history: {str(e)}'}), 500
+
+
+@cards_bp.route('/collection/sets/completion', methods=['GET'])
+@require_auth
+def set_completion():
+    """Get per-set completion (unique printings owned vs set size) for a user"""
+    user_id = request.args.get('user_id', type=int)
+    set_code = request.args.get('set_code', '').strip().lower()
+    
+    # Verify user can only access their own collection
+    if request.current_user.id != user_id:
+        return jsonify({"error": "Unauthorized"}), 403
+    
+    try:
+        # One grouped distinct count per set, joined to the cached set catalog
+        owned_query = db.session.query(
+            Card.set_code.label('set_code'),
+            db.func.count(db.distinct(CollectionCard.scryfall_id)).label('owned_unique'),
+            db.func.sum(CollectionCard.quantity).label('total_cards')
+        ).join(CollectionCard).filter(
+            CollectionCard.user_id == user_id,
+            Card.set_code.isnot(None)
+        )
+        if set_code:
+            owned_query = owned_query.filter(Card.set_code == set_code)
+        owned = owned_query.group_by(Card.set_code).subquery()
+        
+        rows = db.session.query(
+            owned.c.set_code,
+            owned.c.owned_unique,
+            owned.c.total_cards,
+            CardSet
+        ).outerjoin(CardSet, CardSet.code == owned.c.set_code).all()
+        
+        sets = []
+        for code, owned_unique, total_cards, card_set in rows:
+            card_count = card_set.card_count if card_set else None
+            sets.append({
+                'set_code': code,
+                'set_name': card_set.name if card_set else None,
+                'released_at': card_set.released_at.isoformat() if card_set and card_set.released_at else None,
+                'card_count': card_count,
+                'owned_unique': owned_unique,
+                'total_cards': total_cards,
+                'completion_percentage': round(min(owned_unique / card_count, 1) * 100, 1) if card_count else None
+            })
+        
+        sets.sort(key=lambda s: (s['completion_percentage'] or 0, s['owned_unique']), reverse=True)
+        
+        return jsonify({
+            'sets': sets,
+            'total_sets': len(sets)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get set completion: {str(e)}'}), 500
+
+
 def analyze_color_distribution(color_results):
     """Analyze color combinations including guilds, shards, and custom names"""
     
@@ -828,23 +1121,16 @@ def analyze_tribal_types(user_id):
 def analyze_keywords(user_id):
     """Analyze keywords and abilities"""
     
-    keywords_data = db.session.query(
-        Card.keywords,
-        db.func.sum(CollectionCard.quantity).label('count')
-    ).join(CollectionCard).filter(
-        CollectionCard.user_id == user_id,
-        Card.keywords.isnot(None)
-    ).group_by(Card.keywords).all()
-    
-    keyword_counts = {}
-    
-    for keywords_list, count in keywords_data:
-        if keywords_list:
-            for keyword in keywords_list:
-                keyword_counts[keyword] = keyword_counts.get(keyword, 0) + count
-    
-    # Sort by count and take top 20
-    top_keywords = sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:20]
+    # Single GROUP BY over the normalized keyword index, top 20 by count
+    keyword_count = db.func.sum(CollectionCard.quantity).label('count')
+    top_keywords = db.session.query(
+        CardKeyword.keyword,
+        keyword_count
+    ).join(
+        CollectionCard, CollectionCard.scryfall_id == CardKeyword.scryfall_id
+    ).filter(
+        CollectionCard.user_id == user_id
+    ).group_by(CardKeyword.keyword).order_by(keyword_count.desc(), CardKeyword.keyword).limit(20).all()
     
     return [
         {
@@ -854,6 +1140,56 @@ def analyze_keywords(user_id):
         for keyword, count in top_keywords
     ]
 
+def analyze_format_legality(user_id):
+    """Count playable (legal or restricted) and banned cards per format"""
+    
+    playable_mask = CardLegality.legal_mask.op('|')(CardLegality.restricted_mask)
+    
+    # One aggregate: a conditional sum per format bit over the user's collection
+    columns = [
+        db.func.sum(db.case(
+            (playable_mask.op('&')(legality_bit(format_name)) != 0, CollectionCard.quantity),
+            else_=0
+        ))
+        for format_name in LEGALITY_FORMATS
+    ]
+    columns.append(db.func.sum(db.case(
+        (CardLegality.banned_mask != 0, CollectionCard.quantity),
+        else_=0
+    )))
+    
+    counts = db.session.query(*columns).select_from(CollectionCard).join(
+        CardLegality, CardLegality.scryfall_id == CollectionCard.scryfall_id
+    ).filter(
+        CollectionCard.user_id == user_id
+    ).one()
+    
+    format_counts = {
+        format_name: count or 0
+        for format_name, count in zip(LEGALITY_FORMATS, counts)
+    }
+    
+    return {
+        'standard': format_counts.pop('standard'),
+        'modern': format_counts.pop('modern'),
+        'legacy': format_counts.pop('legacy'),
+        'banned': counts[-1] or 0,
+        'other_formats': format_counts
+    }
+
+def analyze_mana_symbols(user_id):
+    """Devotion and pip totals across the collection, summed from the parsed mana costs"""
+
+    totals = db.session.query(
+        *CardManaCost.sum_columns(CollectionCard.quantity)
+    ).select_from(CollectionCard).join(
+        CardManaCost, CardManaCost.scryfall_id == CollectionCard.scryfall_id
+    ).filter(
+        CollectionCard.user_id == user_id
+    ).one()
+
+    return CardManaCost.totals_to_dict(totals)
+
 @cards_bp.route('/collection/printings', methods=['POST'])
 def add_printing_variant():
     """Add a specific printing variant of a card"""
@@ -893,6 +1229,9 @@ def add_printing_variant():
         )
         
         db.session.add(collection_card)
+        AchievementService.record_collection_change(
+            user_id, scryfall_id, quantity, rows_delta=1, is_foil=is_foil, condition=condition
+        )
         db.session.commit()
         
         return jsonify({
@@ -920,6 +1259,9 @@ def add_printing_variant():
             if existing_details == new_details:
                 # Exact match found, update quantity
                 existing_card.quantity += quantity
+                AchievementService.record_collection_change(
+                    user_id, scryfall_id, quantity, is_foil=is_foil, condition=condition
+                )
                 db.session.commit()
                 
                 return jsonify({
@@ -947,6 +1289,9 @@ def update_printing_variant(printing_id):
         if not collection_card:
             return jsonify({'error': 'Printing variant not found'}), 404
         
+        old_quantity = collection_card.quantity
+        old_printing = {'is_foil': collection_card.is_foil, 'condition': collection_card.condition}
+        
         # Update fields if provided
         if 'quantity' in data:
             collection_card.quantity = data['quantity']
@@ -957,6 +1302,21 @@ def update_printing_variant(printing_id):
         if 'printing_details' in data:
             collection_card.printing_details = data['printing_details']
         
+        new_printing = {'is_foil': collection_card.is_foil, 'condition': collection_card.condition}
+        if new_printing != old_printing:
+            # Counted as the old variant leaving and the new one arriving
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, -old_quantity, rows_delta=-1, **old_printing
+            )
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, collection_card.quantity, rows_delta=1,
+                **new_printing
+            )
+        elif collection_card.quantity != old_quantity:
+            AchievementService.record_collection_change(
+                collection_card.user_id, collection_card.scryfall_id, collection_card.quantity - old_quantity,
+                **new_printing
+            )
         db.session.commit()
         return jsonify({
             'message': 'Printing variant updated',
@@ -976,6 +1336,10 @@ def delete_printing_variant(printing_id):
             return jsonify({'error': 'Printing variant not found'}), 404
         
         db.session.delete(collection_card)
+        AchievementService.record_collection_change(
+            collection_card.user_id, collection_card.scryfall_id, -collection_card.quantity, rows_delta=-1,
+            is_foil=collection_card.is_foil, condition=collection_card.condition
+        )
         db.session.commit()
         return jsonify({'message': 'Printing variant deleted'})
         
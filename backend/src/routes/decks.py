@@ -1,22 +1,103 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from collections import OrderedDict
+import requests
+import threading
 from src.models.user import db
-from src.models.card import Card, Deck, DeckCard, CollectionCard
+from src.models.card import Card, Deck, DeckCard, DeckStats, CollectionCard
+from src.services.achievement_service import AchievementService
+from src.services.deck_builder_service import DeckBuilderService
+from src.services.deck_stats_service import DeckStatsService
+from src.services.deck_simulation_service import DeckSimulationService
+from src.services.deck_snapshot_service import DeckSnapshotService
+from src.services.deck_validation_service import DeckValidationService
+from src.services.decklist_import_service import DecklistImportService
+from src.services.reference_deck_service import ReferenceDeckService
 
 decks_bp = Blueprint('decks', __name__)
 
+# Deck list summaries keyed by (user_id, deck version)
+SUMMARY_CACHE_SIZE = 256
+_summary_cache = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+COLOR_ORDER = 'WUBRG'
+
+def user_deck_version(user_id):
+    """Cheap version string for a user's decks; changes on create, delete and card edits"""
+    deck_count, last_modified = db.session.query(
+        db.func.count(Deck.id),
+        db.func.max(Deck.updated_at)
+    ).filter(Deck.user_id == user_id).one()
+    return f"{user_id}-{deck_count}-{last_modified.isoformat() if last_modified else 0}"
+
 @decks_bp.route('/decks', methods=['GET'])
 def get_user_decks():
-    """Get all decks for a user"""
+    """Get all decks for a user, optionally with card count/color/curve summaries"""
     user_id = request.args.get('user_id', 1, type=int)
+    include_summary = request.args.get('include_summary', 'false').lower() == 'true'
     
     try:
-        decks = Deck.query.filter_by(user_id=user_id).all()
-        return jsonify({
-            'decks': [deck.to_dict() for deck in decks]
-        })
+        if not include_summary:
+            decks = Deck.query.filter_by(user_id=user_id).all()
+            return jsonify({
+                'decks': [deck.to_dict() for deck in decks]
+            })
+        
+        version = user_deck_version(user_id)
+        if request.if_none_match.contains(version):
+            return '', 304
+        
+        cache_key = (user_id, version)
+        with _summary_cache_lock:
+            payload = _summary_cache.get(cache_key)
+            if payload is not None:
+                _summary_cache.move_to_end(cache_key)
+        
+        if payload is None:
+            payload = build_deck_summaries(user_id)
+            # Backfilling missing stats bumps updated_at, so re-read the version
+            version = user_deck_version(user_id)
+            with _summary_cache_lock:
+                _summary_cache[(user_id, version)] = payload
+                if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+                    _summary_cache.popitem(last=False)
+        
+        response = jsonify({'decks': payload, 'version': version})
+        response.set_etag(version)
+        return response
+        
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to get decks: {str(e)}'}), 500
 
+def build_deck_summaries(user_id):
+    """All of a user's decks with summaries, read from deck_stats in a single join"""
+    rows = db.session.query(Deck, DeckStats).outerjoin(
+        DeckStats, DeckStats.deck_id == Deck.id
+    ).filter(Deck.user_id == user_id).order_by(Deck.created_at).all()
+    
+    # Decks created before stats were cached get them once
+    missing = [deck.id for deck, stats in rows if stats is None]
+    if missing:
+        refreshed = {deck_id: DeckStatsService.refresh(deck_id) for deck_id in missing}
+        db.session.commit()
+        rows = [(deck, stats or refreshed[deck.id]) for deck, stats in rows]
+    
+    summaries = []
+    for deck, stats in rows:
+        deck_data = deck.to_dict()
+        colors = stats.color_distribution or {}
+        deck_data['summary'] = {
+            'mainboard_cards': stats.mainboard_cards,
+            'sideboard_cards': stats.sideboard_cards,
+            'color_identity': [color for color in COLOR_ORDER if colors.get(color)],
+            'average_cmc': stats.average_cmc,
+            'last_modified': deck.updated_at.isoformat() if deck.updated_at else None
+        }
+        summaries.append(deck_data)
+    
+    return summaries
+
 @decks_bp.route('/decks', methods=['POST'])
 def create_deck():
     """Create a new deck"""
@@ -38,13 +119,11 @@ def create_deck():
             format=format_type
         )
         db.session.add(deck)
+        db.session.flush()
+        DeckStatsService.refresh(deck.id)
+        # Update achievement counters for the new deck
+        newly_completed = AchievementService.record_deck_change(user_id, 1)
         db.session.commit()
-
-        # Trigger achievement check
-        from src.services.achievement_service import AchievementService
-        newly_completed = AchievementService.check_and_update_achievements(
-            user_id, 'deck_update'
-        )
         
         return jsonify({
             'message': 'Deck created successfully',
@@ -56,53 +135,327 @@ def create_deck():
         db.session.rollback()
         return jsonify({'error': f'Failed to create deck: {str(e)}'}), 500
 
+# Columns selected for deck card listings, in Card.to_dict() order
+DECK_CARD_COLUMNS = [
+    DeckCard.id, DeckCard.deck_id, DeckCard.scryfall_id, DeckCard.quantity, DeckCard.card_type, DeckCard.added_at,
+    Card.name, Card.mana_cost, Card.cmc, Card.type_line, Card.oracle_text, Card.colors, Card.keywords,
+    Card.image_uri, Card.local_image_url, Card.power, Card.toughness, Card.rarity, Card.set_code,
+    Card.set_name, Card.created_at, Card.updated_at
+]
+
+def deck_card_row_to_dict(row):
+    """Build the DeckCard.to_dict() shape from a DECK_CARD_COLUMNS row without loading ORM objects"""
+    return {
+        'id': row.id,
+        'deck_id': row.deck_id,
+        'scryfall_id': row.scryfall_id,
+        'quantity': row.quantity,
+        'card_type': row.card_type,
+        'added_at': row.added_at.isoformat() if row.added_at else None,
+        'card': {
+            'scryfall_id': row.scryfall_id,
+            'name': row.name,
+            'mana_cost': row.mana_cost,
+            'cmc': row.cmc,
+            'type_line': row.type_line,
+            'oracle_text': row.oracle_text,
+            'colors': row.colors,
+            'keywords': row.keywords,
+            'image_uri': row.image_uri,
+            'local_image_url': row.local_image_url,
+            'power': row.power,
+            'toughness': row.toughness,
+            'rarity': row.rarity,
+            'set_code': row.set_code,
+            'set_name': row.set_name,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None
+        }
+    }
+
+def snapshot_card_dict(row):
+    """deck_card_row_to_dict without row ids and timestamps, which change without the deck changing"""
+    card = deck_card_row_to_dict(row)
+    del card['id'], card['added_at']
+    del card['card']['created_at'], card['card']['updated_at']
+    return card
+
+@decks_bp.route('/decks/availability', methods=['GET'])
+def get_deck_availability():
+    """Compare all of a user's decks against their collection: missing cards per deck,
+    cards committed to more decks than owned copies, and a consolidated shopping list"""
+    user_id = request.args.get('user_id', 1, type=int)
+    include_basics = request.args.get('include_basics', 'false').lower() == 'true'
+    
+    try:
+        # Cards are matched by name so any owned printing counts
+        owned_query = db.session.query(
+            Card.name.label('name'),
+            db.func.sum(CollectionCard.quantity).label('owned')
+        ).join(CollectionCard).filter(CollectionCard.user_id == user_id)
+        
+        needed_query = db.session.query(
+            DeckCard.deck_id.label('deck_id'),
+            Card.name.label('name'),
+            db.func.sum(DeckCard.quantity).label('needed')
+        ).join(Card).join(Deck).filter(Deck.user_id == user_id)
+        
+        if not include_basics:
+            # Basic lands are treated as unlimited
+            owned_query = owned_query.filter(~Card.type_line.like('Basic Land%'))
+            needed_query = needed_query.filter(~Card.type_line.like('Basic Land%'))
+        
+        owned = owned_query.group_by(Card.name).subquery()
+        needed = needed_query.group_by(DeckCard.deck_id, Card.name).subquery()
+        owned_count = db.func.coalesce(owned.c.owned, 0)
+        
+        # Per-deck shortfall
+        missing_rows = db.session.query(
+            needed.c.deck_id,
+            Deck.name,
+            needed.c.name,
+            needed.c.needed,
+            owned_count
+        ).join(Deck, Deck.id == needed.c.deck_id).outerjoin(
+            owned, owned.c.name == needed.c.name
+        ).filter(
+            needed.c.needed > owned_count
+        ).order_by(Deck.name, needed.c.name).all()
+        
+        decks = {}
+        for deck_id, deck_name, card_name, needed_qty, owned_qty in missing_rows:
+            deck_entry = decks.setdefault(deck_id, {'deck_id': deck_id, 'deck_name': deck_name, 'missing': [], 'missing_cards': 0})
+            deck_entry['missing'].append({
+                'name': card_name,
+                'needed': needed_qty,
+                'owned': owned_qty,
+                'missing': needed_qty - owned_qty
+            })
+            deck_entry['missing_cards'] += needed_qty - owned_qty
+        
+        # Cross-deck demand per card: drives both the over-allocation report and the shopping list
+        demand_rows = db.session.query(
+            needed.c.name,
+            db.func.count(needed.c.deck_id),
+            db.func.max(needed.c.needed),
+            db.func.sum(needed.c.needed),
+            db.func.max(owned_count)
+        ).outerjoin(
+            owned, owned.c.name == needed.c.name
+        ).group_by(needed.c.name).having(
+            db.func.sum(needed.c.needed) > db.func.max(owned_count)
+        ).order_by(needed.c.name).all()
+        
+        over_allocated = []
+        shopping_list = []
+        for card_name, deck_count, max_needed, total_needed, owned_qty in demand_rows:
+            if deck_count > 1:
+                over_allocated.append({
+                    'name': card_name,
+                    'decks': deck_count,
+                    'total_needed': total_needed,
+                    'owned': owned_qty,
+                    'over_by': total_needed - owned_qty
+                })
+            shopping_list.append({
+                'name': card_name,
+                'owned': owned_qty,
+                # Enough to build any single deck / all decks at the same time
+                'buy_for_any_deck': max(max_needed - owned_qty, 0),
+                'buy_for_all_decks': total_needed - owned_qty
+            })
+        
+        return jsonify({
+            'decks': list(decks.values()),
+            'over_allocated': over_allocated,
+            'shopping_list': shopping_list
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to get deck availability: {str(e)}'}), 500
+
+@decks_bp.route('/decks/reference/matches', methods=['GET'])
+def get_reference_deck_matches():
+    """Rank reference decklists by how close the user's collection is to completing them"""
+    user_id = request.args.get('user_id', 1, type=int)
+    format_name = request.args.get('format')
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    
+    try:
+        matches = ReferenceDeckService.match(user_id, format_name, limit)
+        return jsonify({
+            'user_id': user_id,
+            'matches': matches
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to match reference decks: {str(e)}'}), 500
+
 @decks_bp.route('/decks/<deck_id>', methods=['GET'])
 def get_deck_details(deck_id):
     """Get deck details with cards"""
     try:
-        deck = Deck.query.filter_by(id=deck_id).first()
-        if not deck:
+        deck_with_stats = db.session.query(Deck, DeckStats).outerjoin(
+            DeckStats, DeckStats.deck_id == Deck.id
+        ).filter(Deck.id == deck_id).first()
+        if not deck_with_stats:
             return jsonify({'error': 'Deck not found'}), 404
         
-        # Get deck cards
-        deck_cards = db.session.query(DeckCard).join(Card).filter(
+        deck, stats = deck_with_stats
+        
+        # Decks created before stats (or their mana symbols) were cached get them on first view
+        if not stats or stats.mana_symbols is None:
+            stats = DeckStatsService.refresh(deck_id)
+            db.session.commit()
+        
+        # Get deck cards (one query, explicit columns)
+        deck_cards = db.session.query(*DECK_CARD_COLUMNS).join(Card).filter(
             DeckCard.deck_id == deck_id
         ).all()
         
-        # Calculate deck statistics
-        total_cards = sum(dc.quantity for dc in deck_cards)
-        mainboard_cards = sum(dc.quantity for dc in deck_cards if dc.card_type == 'mainboard')
-        sideboard_cards = sum(dc.quantity for dc in deck_cards if dc.card_type == 'sideboard')
-        
-        # Calculate mana curve
-        mana_curve = {}
-        color_distribution = {}
-        
-        for deck_card in deck_cards:
-            if deck_card.card_type == 'mainboard':
-                cmc = deck_card.card.cmc or 0
-                mana_curve[cmc] = mana_curve.get(cmc, 0) + deck_card.quantity
-                
-                # Count colors
-                colors = deck_card.card.colors or []
-                for color in colors:
-                    color_distribution[color] = color_distribution.get(color, 0) + deck_card.quantity
-        
         return jsonify({
             'deck': deck.to_dict(),
-            'cards': [dc.to_dict() for dc in deck_cards],
-            'statistics': {
-                'total_cards': total_cards,
-                'mainboard_cards': mainboard_cards,
-                'sideboard_cards': sideboard_cards,
-                'mana_curve': mana_curve,
-                'color_distribution': color_distribution
-            }
+            'cards': [deck_card_row_to_dict(row) for row in deck_cards],
+            'statistics': stats.to_dict()
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Failed to get deck: {str(e)}'}), 500
 
+@decks_bp.route('/decks/<deck_id>/publish', methods=['POST'])
+def publish_deck(deck_id):
+    """Publish the deck's current state as an immutable public snapshot"""
+    try:
+        deck_with_stats = db.session.query(Deck, DeckStats).outerjoin(
+            DeckStats, DeckStats.deck_id == Deck.id
+        ).filter(Deck.id == deck_id).first()
+        if not deck_with_stats:
+            return jsonify({'error': 'Deck not found'}), 404
+        
+        deck, stats = deck_with_stats
+        if not stats or stats.mana_symbols is None:
+            stats = DeckStatsService.refresh(deck_id)
+            db.session.commit()
+        
+        deck_cards = db.session.query(*DECK_CARD_COLUMNS).join(Card).filter(
+            DeckCard.deck_id == deck_id
+        ).order_by(DeckCard.card_type, Card.name, DeckCard.scryfall_id).all()
+        
+        # Everything a shared link shows, minus owner details, row ids and timestamps
+        # that would change the hash without changing the deck
+        deck_data = deck.to_dict()
+        snapshot_id = DeckSnapshotService.publish({
+            'deck': {key: deck_data[key] for key in ('id', 'name', 'description', 'format')},
+            'cards': [snapshot_card_dict(row) for row in deck_cards],
+            'statistics': stats.to_dict()
+        })
+        
+        return jsonify({
+            'message': 'Deck published',
+            'snapshot_id': snapshot_id,
+            'url': f'/api/decks/shared/{snapshot_id}'
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to publish deck: {str(e)}'}), 500
+
+@decks_bp.route('/decks/shared/<snapshot_id>', methods=['GET'])
+def get_shared_deck(snapshot_id):
+    """Serve a published deck snapshot; never touches the database"""
+    if request.if_none_match.contains(snapshot_id):
+        response = current_app.response_class(status=304)
+    else:
+        document = DeckSnapshotService.load(snapshot_id)
+        if document is None:
+            return jsonify({'error': 'Snapshot not found'}), 404
+        response = current_app.response_class(document, mimetype='application/json')
+    
+    # Snapshot ids are content hashes, so a response can be cached forever
+    response.set_etag(snapshot_id)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@decks_bp.route('/decks/<deck_id>/validate', methods=['GET'])
+def validate_deck(deck_id):
+    """Validate a deck against its format (or ?format=) construction rules"""
+    format_name = request.args.get('format')
+    
+    try:
+        deck = Deck.query.filter_by(id=deck_id).first()
+        if not deck:
+            return jsonify({'error': 'Deck not found'}), 404
+        
+        return jsonify(DeckValidationService.validate_deck(deck, format_name))
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to validate deck: {str(e)}'}), 500
+
+@decks_bp.route('/decks/<deck_id>/simulate', methods=['POST'])
+def simulate_deck(deck_id):
+    """Opening hand / mana probabilities for a deck's mainboard.
+
+    Queries are {"type": "lands_by_turn", "lands": 3, "turn": 3} or
+    {"type": "cast_on_curve", "scryfall_id": ..., "turn": optional}.
+    """
+    data = request.get_json() or {}
+
+    try:
+        deck = Deck.query.filter_by(id=deck_id).first()
+        if not deck:
+            return jsonify({'error': 'Deck not found'}), 404
+
+        cards, is_land, card_index = DeckSimulationService.load_deck(deck.id)
+        if len(is_land) < 7:
+            return jsonify({'error': 'Deck needs at least 7 mainboard cards to simulate'}), 400
+
+        try:
+            settings = {
+                'on_the_play': bool(data.get('on_the_play', True)),
+                'mulligan': data.get('mulligan', 'london'),
+                'min_lands_to_keep': int(data.get('min_lands_to_keep', 2)),
+                'max_lands_to_keep': int(data.get('max_lands_to_keep', 5)),
+                'max_mulligans': min(max(int(data.get('max_mulligans', 2)), 0), 6)
+            }
+            iterations = min(max(int(data.get('iterations', DeckSimulationService.DEFAULT_ITERATIONS)), 1),
+                             DeckSimulationService.MAX_ITERATIONS)
+            time_budget_ms = min(max(int(data.get('time_budget_ms', DeckSimulationService.DEFAULT_TIME_BUDGET_MS)), 100), 10000)
+            seed = int(data['seed']) if data.get('seed') is not None else None
+            if seed is not None and seed < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Land counts, max_mulligans, iterations and time_budget_ms must be integers, seed a non-negative integer'}), 400
+        if settings['mulligan'] not in ('london', 'none'):
+            return jsonify({'error': 'mulligan must be "london" or "none"'}), 400
+
+        raw_queries = data.get('queries') or [
+            {'type': 'lands_by_turn', 'lands': turn, 'turn': turn} for turn in range(1, 5)
+        ]
+        if not isinstance(raw_queries, list) or not all(isinstance(raw, dict) for raw in raw_queries):
+            return jsonify({'error': 'queries must be a list of objects'}), 400
+        try:
+            queries = DeckSimulationService.resolve_queries(raw_queries, cards)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        results, games_run = DeckSimulationService.simulate(
+            cards, is_land, card_index, queries, settings, iterations, time_budget_ms, seed
+        )
+
+        return jsonify({
+            'deck_id': deck.id,
+            'deck_size': len(is_land),
+            'lands': int(is_land.sum()),
+            'settings': settings,
+            'iterations_requested': iterations,
+            'iterations_run': games_run,
+            'results': results
+        })
+
+    except Exception as e:
+        return jsonify({'error': f'Failed to simulate deck: {str(e)}'}), 500
+
 @decks_bp.route('/decks/<deck_id>/cards', methods=['POST'])
 def add_card_to_deck(deck_id):
     """Add a card to a deck"""
@@ -113,7 +466,7 @@ def add_card_to_deck(deck_id):
     
     scryfall_id = data['scryfall_id']
     quantity = data.get('quantity', 1)
-    card_type = data.get('card_type', 'mainboard')  # 'mainboard' or 'sideboard'
+    card_type = data.get('card_type', 'mainboard')  # 'mainboard', 'sideboard' or 'commander'
     
     try:
         # Check if deck exists
@@ -136,6 +489,8 @@ def add_card_to_deck(deck_id):
         if existing_deck_card:
             # Update quantity
             existing_deck_card.quantity += quantity
+            DeckStatsService.refresh(deck_id)
+            AchievementService.record_deck_change(deck.user_id, 0)
             db.session.commit()
             return jsonify({
                 'message': 'Card quantity updated in deck',
@@ -150,6 +505,8 @@ def add_card_to_deck(deck_id):
                 card_type=card_type
             )
             db.session.add(deck_card)
+            DeckStatsService.refresh(deck_id)
+            AchievementService.record_deck_change(deck.user_id, 0)
             db.session.commit()
             return jsonify({
                 'message': 'Card added to deck',
@@ -160,6 +517,51 @@ def add_card_to_deck(deck_id):
         db.session.rollback()
         return jsonify({'error': f'Failed to add card to deck: {str(e)}'}), 500
 
+@decks_bp.route('/decks/<deck_id>/import', methods=['POST'])
+def import_decklist(deck_id):
+    """Import decklist text ("4x Name (SET) 123" lines, Deck/Sideboard sections) into a deck"""
+    data = request.get_json()
+
+    if not data or not (data.get('text') or '').strip():
+        return jsonify({'error': 'Decklist text is required'}), 400
+
+    replace = bool(data.get('replace', False))
+
+    try:
+        deck = Deck.query.filter_by(id=deck_id).first()
+        if not deck:
+            return jsonify({'error': 'Deck not found'}), 404
+
+        entries, parse_errors = DecklistImportService.parse(data['text'])
+        if not entries:
+            return jsonify({'error': 'No cards found in decklist', 'parse_errors': parse_errors}), 400
+
+        resolved, unresolved = DecklistImportService.resolve(entries)
+        result = DecklistImportService.upsert_deck_cards(deck.id, entries, resolved, replace)
+        DeckStatsService.refresh(deck.id)
+        AchievementService.record_deck_change(deck.user_id, 0)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Decklist imported',
+            'deck_id': deck.id,
+            'added': result['added'],
+            'updated': result['updated'],
+            'cards_imported': result['cards'],
+            'unresolved': [
+                {'line': e['line'], 'name': e['name'], 'quantity': e['quantity'], 'card_type': e['card_type']}
+                for e in unresolved
+            ],
+            'parse_errors': parse_errors
+        })
+
+    except requests.RequestException as e:
+        db.session.rollback()
+        return jsonify({'error': f'Card lookup failed: {str(e)}'}), 502
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to import decklist: {str(e)}'}), 500
+
 @decks_bp.route('/decks/<deck_id>/cards/<deck_card_id>', methods=['PUT'])
 def update_deck_card(deck_id, deck_card_id):
     """Update card quantity in deck"""
@@ -174,15 +576,20 @@ def update_deck_card(deck_id, deck_card_id):
         deck_card = DeckCard.query.filter_by(id=deck_card_id).first()
         if not deck_card:
             return jsonify({'error': 'Deck card not found'}), 404
+        user_id = deck_card.deck.user_id
         
         if new_quantity <= 0:
             # Remove card from deck
             db.session.delete(deck_card)
+            DeckStatsService.refresh(deck_card.deck_id)
+            AchievementService.record_deck_change(user_id, 0)
             db.session.commit()
             return jsonify({'message': 'Card removed from deck'})
         else:
             # Update quantity
             deck_card.quantity = new_quantity
+            DeckStatsService.refresh(deck_card.deck_id)
+            AchievementService.record_deck_change(user_id, 0)
             db.session.commit()
             return jsonify({
                 'message': 'Card quantity updated',
@@ -201,11 +608,13 @@ def delete_deck(deck_id):
         if not deck:
             return jsonify({'error': 'Deck not found'}), 404
         
-        # Delete all deck cards first
+        # Delete all deck cards and cached stats first
         DeckCard.query.filter_by(deck_id=deck_id).delete()
+        DeckStats.query.filter_by(deck_id=deck_id).delete()
         
         # Delete the deck
         db.session.delete(deck)
+        AchievementService.record_deck_change(deck.user_id, -1)
         db.session.commit()
         
         return jsonify({'message': 'Deck deleted successfully'})
@@ -221,6 +630,8 @@ def build_around_card(scryfall_id):
     
     user_id = data.get('user_id', 1)
     deck_name = data.get('deck_name', 'New Deck')
+    deck_size = data.get('deck_size', 60)  # Standard deck size
+    land_count = data.get('land_count', 24)
     
     try:
         # Get the focus card
@@ -229,11 +640,11 @@ def build_around_card(scryfall_id):
             return jsonify({'error': 'Card not found'}), 404
         
         # Check if user owns this card
-        collection_card = CollectionCard.query.filter_by(
+        owned_copies = db.session.query(db.func.sum(CollectionCard.quantity)).filter_by(
             user_id=user_id,
             scryfall_id=scryfall_id
-        ).first()
-        if not collection_card:
+        ).scalar()
+        if not owned_copies:
             return jsonify({'error': 'Card not in your collection'}), 404
         
         # Create new deck
@@ -246,63 +657,24 @@ def build_around_card(scryfall_id):
         db.session.add(deck)
         db.session.flush()  # Get the deck ID
         
-        # Add the focus card to the deck
-        deck_card = DeckCard(
-            deck_id=deck.id,
-            scryfall_id=scryfall_id,
-            quantity=min(4, collection_card.quantity),  # Max 4 copies
-            card_type='mainboard'
+        # Score the whole collection against the focus card and bulk insert the picks
+        cards_added = DeckBuilderService.build_around(
+            deck,
+            focus_card,
+            focus_copies=min(4, owned_copies),  # Max 4 copies
+            deck_size=deck_size,
+            land_count=land_count
         )
-        db.session.add(deck_card)
-        
-        # Find synergistic cards from user's collection
-        focus_colors = focus_card.colors or []
-        focus_types = focus_card.type_line.lower() if focus_card.type_line else ''
-        
-        # Get user's collection for synergy analysis
-        user_collection = db.session.query(CollectionCard).join(Card).filter(
-            CollectionCard.user_id == user_id,
-            CollectionCard.scryfall_id != scryfall_id
-        ).all()
-        
-        # Add synergistic cards (this is a simplified version)
-        cards_added = 1  # We already added the focus card
-        
-        for collection_card in user_collection:
-            if cards_added >= 60:  # Standard deck size
-                break
-                
-            card = collection_card.card
-            card_colors = card.colors or []
-            card_types = card.type_line.lower() if card.type_line else ''
-            
-            # Simple synergy check - same colors or complementary types
-            is_synergistic = (
-                # Same colors
-                any(color in focus_colors for color in card_colors) or
-                # Land cards (always useful)
-                'land' in card_types or
-                # Artifacts (colorless utility)
-                'artifact' in card_types
-            )
-            
-            if is_synergistic:
-                # Add card to deck
-                deck_card = DeckCard(
-                    deck_id=deck.id,
-                    scryfall_id=card.scryfall_id,
-                    quantity=min(4, collection_card.quantity),
-                    card_type='mainboard'
-                )
-                db.session.add(deck_card)
-                cards_added += min(4, collection_card.quantity)
+        DeckStatsService.refresh(deck.id)
         
+        newly_completed = AchievementService.record_deck_change(user_id, 1)
         db.session.commit()
         
         return jsonify({
             'message': 'Deck created successfully',
             'deck': deck.to_dict(),
-            'cards_added': cards_added
+            'cards_added': cards_added,
+            'newly_completed_achievements': len(newly_completed)
         }), 201
         
     except Exception as e:
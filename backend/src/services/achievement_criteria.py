@@ -0,0 +1,582 @@
+from src.models.user import db
+from src.models.card import (
+    Card, CardKeyword, CardLegality, CardSubtype, CollectionCard, Deck, DeckCard,
+    LEGALITY_FORMATS, legality_bit
+)
+from src.services.card_cache_service import CardCacheService
+from src.services.deck_validation_service import FORMAT_RULES
+import operator
+
+# Bounds that keep every compiled criteria a small, fixed-size query
+MAX_DEPTH = 6
+MAX_NODES = 40
+MAX_LIST_VALUES = 50
+
+COMPARISONS = {
+    'eq': operator.eq,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le
+}
+
+# Card fields usable in predicates; foil and condition only exist on collection rows
+CARD_FIELDS = {
+    'name', 'set', 'rarity', 'type', 'subtype', 'keyword', 'type_line', 'cmc', 'colors',
+    'banned', 'legal', 'foil', 'condition'
+}
+COLLECTION_FIELDS = {'foil', 'condition'}
+COLOR_GROUPS = {'mono', 'multicolor', 'colorless'}
+
+# Things a goal can count distinct values of
+DISTINCT_FIELDS = {'name', 'set', 'rarity', 'cmc', 'printing', 'subtype', 'keyword'}
+
+# Deck sections that make up the deck for deck predicates
+DECK_SECTIONS = ('mainboard', 'commander')
+
+class AchievementCriteria:
+    """Declarative achievement criteria, validated and compiled once per catalog version.
+
+    A criteria dict is a goal with a numeric target:
+
+        {"type": "cards", "where": <card predicate>, "count": <count>, "target": 10}
+            Counts the user's collection rows matching the predicate. count is
+            "entries" (default), "copies" or {"distinct": <field>}, where field is
+            one of name, set, rarity, cmc, printing, subtype or keyword.
+
+        {"type": "decks", "where": <deck predicate>, "count": "decks" | {"max": <aggregate>}, "target": 1}
+            Counts the user's decks matching the predicate, or takes the largest
+            value of a per-deck aggregate over matching decks.
+
+    Card predicates combine with {"all": [...]}, {"any": [...]} and {"not": ...}.
+    Leaves are single-field dicts:
+        {"name": "Lightning Bolt"}, {"set": ["dom", "war"]}, {"rarity": "mythic"}
+        {"type": "Creature"}, {"subtype": "Dragon"}, {"keyword": "Flying"}
+        {"cmc": 3} or {"cmc": {"gte": 2, "lte": 4}}
+        {"colors": ["R", "G"]} (has all of) or "mono" / "multicolor" / "colorless"
+        {"banned": "modern"} or {"banned": true} (any format), {"legal": "pioneer"}
+        {"foil": true}, {"condition": ["near_mint", "mint"]} (collection goals only)
+
+    Deck predicates use the same combinators, with leaves:
+        {"format": "commander"}, {"legal_in": "modern"} or {"legal_in": true} (its own format);
+        legal_in needs every card legal and at least the format's minimum deck size
+        {"contains": {<aggregate>, "gte": 5}}
+
+    An aggregate is {"where": <card predicate>, "count": <count>} over the deck's
+    mainboard and commander cards.
+
+    The older criteria types (collection_count, deck_count, card_criteria,
+    banned_cards, deck_criteria) are translated into this form.
+    """
+
+    @staticmethod
+    def normalize(criteria):
+        """Translate legacy criteria types into the criteria language"""
+        criteria = dict(criteria or {})
+        criteria_type = criteria.get('type')
+        target = criteria.get('target', 1)
+
+        if criteria_type == 'collection_count':
+            return {'type': 'cards', 'count': 'entries' if criteria.get('unique', False) else 'copies', 'target': target}
+
+        if criteria_type == 'deck_count':
+            return {'type': 'decks', 'target': target}
+
+        if criteria_type == 'card_criteria':
+            card_filter = criteria.get('filter', {})
+            conditions = [
+                {field: card_filter[field]} for field in ('rarity', 'colors', 'type_line') if field in card_filter
+            ]
+            normalized = {'type': 'cards', 'target': target}
+            if conditions:
+                normalized['where'] = {'all': conditions}
+            return normalized
+
+        if criteria_type == 'banned_cards':
+            return {'type': 'cards', 'where': {'banned': criteria.get('format') or True}, 'target': target}
+
+        if criteria_type == 'deck_criteria':
+            deck_filter = criteria.get('filter', {})
+            if deck_filter.get('type') == 'creature_types':
+                # Most distinct creature types in a single deck
+                return {
+                    'type': 'decks',
+                    'count': {'max': {'where': {'type': 'Creature'}, 'count': {'distinct': 'subtype'}}},
+                    'target': target
+                }
+            if deck_filter.get('type') == 'format_legal':
+                return {'type': 'decks', 'where': {'legal_in': deck_filter.get('format') or True}, 'target': target}
+
+        return criteria
+
+    @staticmethod
+    def validate(criteria):
+        """Normalized criteria, or ValueError describing the first problem"""
+        criteria = AchievementCriteria.normalize(criteria)
+        nodes = [0]
+
+        target = criteria.get('target', 1)
+        if not isinstance(target, int) or isinstance(target, bool) or target < 1:
+            raise ValueError('target must be a positive integer')
+
+        goal = criteria.get('type')
+        if goal == 'cards':
+            AchievementCriteria._validate_keys(criteria, {'type', 'where', 'count', 'target'}, 'criteria')
+            if 'where' in criteria:
+                AchievementCriteria._validate_card_predicate(criteria['where'], 'where', 1, nodes, collection=True)
+            AchievementCriteria._validate_count(criteria.get('count', 'entries'), 'count')
+        elif goal == 'decks':
+            AchievementCriteria._validate_keys(criteria, {'type', 'where', 'count', 'target'}, 'criteria')
+            if 'where' in criteria:
+                AchievementCriteria._validate_deck_predicate(criteria['where'], 'where', 1, nodes)
+            count = criteria.get('count', 'decks')
+            if count != 'decks':
+                if not isinstance(count, dict) or set(count) != {'max'}:
+                    raise ValueError('count: expected "decks" or {"max": <aggregate>}')
+                AchievementCriteria._validate_aggregate(count['max'], 'count.max', 2, nodes, comparisons=False)
+        else:
+            raise ValueError(f'type: unknown criteria type {goal!r}')
+
+        return criteria
+
+    @staticmethod
+    def _validate_keys(node, allowed, path):
+        unknown = set(node) - allowed
+        if unknown:
+            raise ValueError(f'{path}: unknown keys {sorted(unknown)}')
+
+    @staticmethod
+    def _validate_node(node, path, depth, nodes):
+        if depth > MAX_DEPTH:
+            raise ValueError(f'{path}: nested deeper than {MAX_DEPTH} levels')
+        nodes[0] += 1
+        if nodes[0] > MAX_NODES:
+            raise ValueError(f'criteria has more than {MAX_NODES} predicates')
+        if not isinstance(node, dict) or len(node) != 1:
+            raise ValueError(f'{path}: expected an object with exactly one key')
+        return next(iter(node.items()))
+
+    @staticmethod
+    def _validate_combinator(key, value, path, depth, nodes, validate_child):
+        """Validate all/any/not; returns False if key isn't a combinator"""
+        if key in ('all', 'any'):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f'{path}.{key}: expected a non-empty list')
+            for i, child in enumerate(value):
+                validate_child(child, f'{path}.{key}[{i}]', depth + 1, nodes)
+            return True
+        if key == 'not':
+            validate_child(value, f'{path}.not', depth + 1, nodes)
+            return True
+        return False
+
+    @staticmethod
+    def _validate_card_predicate(node, path, depth, nodes, collection):
+        key, value = AchievementCriteria._validate_node(node, path, depth, nodes)
+
+        def child(child_node, child_path, child_depth, child_nodes):
+            AchievementCriteria._validate_card_predicate(child_node, child_path, child_depth, child_nodes, collection)
+
+        if AchievementCriteria._validate_combinator(key, value, path, depth, nodes, child):
+            return
+        if key not in CARD_FIELDS:
+            raise ValueError(f'{path}: unknown card field {key!r}')
+        if key in COLLECTION_FIELDS and not collection:
+            raise ValueError(f'{path}: {key!r} only applies to collection cards')
+
+        field_path = f'{path}.{key}'
+        if key in ('name', 'set', 'rarity', 'type', 'subtype', 'keyword', 'condition'):
+            AchievementCriteria._validate_strings(value, field_path)
+        elif key == 'type_line':
+            if not isinstance(value, str) or not value:
+                raise ValueError(f'{field_path}: expected a string')
+        elif key == 'cmc':
+            if isinstance(value, dict):
+                AchievementCriteria._validate_comparisons(value, field_path)
+            elif not AchievementCriteria._is_number(value):
+                raise ValueError(f'{field_path}: expected a number or comparison')
+        elif key == 'colors':
+            if isinstance(value, list):
+                if not value or any(color not in ('W', 'U', 'B', 'R', 'G') for color in value):
+                    raise ValueError(f'{field_path}: expected color letters from WUBRG')
+            elif value not in COLOR_GROUPS:
+                raise ValueError(f'{field_path}: expected a color list or one of {sorted(COLOR_GROUPS)}')
+        elif key == 'banned':
+            if value is not True and value not in LEGALITY_FORMATS:
+                raise ValueError(f'{field_path}: expected a format name or true')
+        elif key == 'legal':
+            if value not in LEGALITY_FORMATS:
+                raise ValueError(f'{field_path}: expected a format name')
+        elif key == 'foil':
+            if not isinstance(value, bool):
+                raise ValueError(f'{field_path}: expected true or false')
+
+    @staticmethod
+    def _validate_deck_predicate(node, path, depth, nodes):
+        key, value = AchievementCriteria._validate_node(node, path, depth, nodes)
+
+        if AchievementCriteria._validate_combinator(key, value, path, depth, nodes,
+                                                    AchievementCriteria._validate_deck_predicate):
+            return
+
+        field_path = f'{path}.{key}'
+        if key == 'format':
+            AchievementCriteria._validate_strings(value, field_path)
+        elif key == 'legal_in':
+            if value is not True and value not in LEGALITY_FORMATS:
+                raise ValueError(f'{field_path}: expected a format name or true')
+        elif key == 'contains':
+            AchievementCriteria._validate_aggregate(value, field_path, depth + 1, nodes, comparisons=True)
+        else:
+            raise ValueError(f'{path}: unknown deck field {key!r}')
+
+    @staticmethod
+    def _validate_aggregate(node, path, depth, nodes, comparisons):
+        if not isinstance(node, dict):
+            raise ValueError(f'{path}: expected an object')
+        allowed = {'where', 'count'} | (set(COMPARISONS) if comparisons else set())
+        AchievementCriteria._validate_keys(node, allowed, path)
+        if 'where' in node:
+            AchievementCriteria._validate_card_predicate(node['where'], f'{path}.where', depth, nodes, collection=False)
+        AchievementCriteria._validate_count(node.get('count', 'copies'), f'{path}.count')
+        if comparisons:
+            bounds = {op: node[op] for op in COMPARISONS if op in node}
+            if not bounds:
+                raise ValueError(f'{path}: expected at least one of {sorted(COMPARISONS)}')
+            AchievementCriteria._validate_comparisons(bounds, path)
+
+    @staticmethod
+    def _validate_count(count, path):
+        if count in ('entries', 'copies'):
+            return
+        if isinstance(count, dict) and set(count) == {'distinct'} and count['distinct'] in DISTINCT_FIELDS:
+            return
+        raise ValueError(f'{path}: expected "entries", "copies" or {{"distinct": one of {sorted(DISTINCT_FIELDS)}}}')
+
+    @staticmethod
+    def _validate_comparisons(value, path):
+        if not value or set(value) - set(COMPARISONS):
+            raise ValueError(f'{path}: comparisons must use {sorted(COMPARISONS)}')
+        if not all(AchievementCriteria._is_number(bound) for bound in value.values()):
+            raise ValueError(f'{path}: comparison bounds must be numbers')
+
+    @staticmethod
+    def _validate_strings(value, path):
+        values = value if isinstance(value, list) else [value]
+        if not values or len(values) > MAX_LIST_VALUES or not all(isinstance(v, str) and v for v in values):
+            raise ValueError(f'{path}: expected a string or a list of up to {MAX_LIST_VALUES} strings')
+
+    @staticmethod
+    def _is_number(value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    # SQL compilation
+
+    @staticmethod
+    def compile_sql(criteria, user_id):
+        """SQL expression computing `current` for validated criteria.
+
+        Collection goals over plain card columns are conditional aggregates over the
+        evaluation query's rows (CollectionCard joined to Card and CardLegality);
+        everything else is a scalar subquery on its own aliases.
+        """
+        if criteria['type'] == 'decks':
+            return AchievementCriteria._compile_decks_goal(criteria, user_id)
+
+        count = criteria.get('count', 'entries')
+        tables = {'card': Card, 'collection': CollectionCard, 'legality': CardLegality}
+        condition = AchievementCriteria._card_condition(criteria['where'], tables) if 'where' in criteria else None
+
+        if isinstance(count, dict) and count['distinct'] in ('subtype', 'keyword'):
+            card, collection, legality = db.aliased(Card), db.aliased(CollectionCard), db.aliased(CardLegality)
+            tables = {'card': card, 'collection': collection, 'legality': legality}
+            values, join = AchievementCriteria._distinct_values(count['distinct'], card)
+            statement = db.select(db.func.count(db.distinct(values))).select_from(
+                db.join(collection, card, card.scryfall_id == collection.scryfall_id).outerjoin(
+                    legality, legality.scryfall_id == card.scryfall_id
+                ).join(*join)
+            ).where(collection.user_id == user_id)
+            if 'where' in criteria:
+                statement = statement.where(AchievementCriteria._card_condition(criteria['where'], tables))
+            return statement.scalar_subquery()
+
+        if count == 'entries':
+            if condition is None:
+                return db.func.count(CollectionCard.id)
+            return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+        if count == 'copies':
+            if condition is None:
+                return db.func.coalesce(db.func.sum(CollectionCard.quantity), 0)
+            return db.func.coalesce(db.func.sum(db.case((condition, CollectionCard.quantity), else_=0)), 0)
+
+        column = AchievementCriteria._distinct_column(count['distinct'], Card)
+        if condition is not None:
+            column = db.case((condition, column), else_=None)
+        return db.func.count(db.distinct(column))
+
+    @staticmethod
+    def _compile_decks_goal(criteria, user_id):
+        deck = db.aliased(Deck)
+        conditions = [deck.user_id == user_id]
+        if 'where' in criteria:
+            conditions.append(AchievementCriteria._deck_condition(criteria['where'], deck))
+
+        count = criteria.get('count', 'decks')
+        if count == 'decks':
+            return db.select(db.func.count(deck.id)).where(*conditions).scalar_subquery()
+
+        per_deck = db.select(
+            AchievementCriteria._deck_aggregate(count['max'], deck).label('value')
+        ).where(*conditions).subquery()
+        return db.select(db.func.coalesce(db.func.max(per_deck.c.value), 0)).scalar_subquery()
+
+    @staticmethod
+    def _deck_aggregate(aggregate, deck):
+        """Correlated scalar subquery: the aggregate over one deck's cards"""
+        deck_card, card, legality = db.aliased(DeckCard), db.aliased(Card), db.aliased(CardLegality)
+        tables = {'card': card, 'collection': None, 'legality': legality}
+        source = db.join(deck_card, card, card.scryfall_id == deck_card.scryfall_id).outerjoin(
+            legality, legality.scryfall_id == card.scryfall_id
+        )
+
+        count = aggregate.get('count', 'copies')
+        if count == 'entries':
+            value = db.func.count(deck_card.id)
+        elif count == 'copies':
+            value = db.func.coalesce(db.func.sum(deck_card.quantity), 0)
+        elif count['distinct'] in ('subtype', 'keyword'):
+            values, join = AchievementCriteria._distinct_values(count['distinct'], card)
+            value = db.func.count(db.distinct(values))
+            source = source.join(*join)
+        else:
+            value = db.func.count(db.distinct(AchievementCriteria._distinct_column(count['distinct'], card)))
+
+        statement = db.select(value).select_from(source).where(
+            deck_card.deck_id == deck.id,
+            deck_card.card_type.in_(DECK_SECTIONS)
+        )
+        if 'where' in aggregate:
+            statement = statement.where(AchievementCriteria._card_condition(aggregate['where'], tables))
+        return statement.scalar_subquery()
+
+    @staticmethod
+    def _deck_condition(node, deck):
+        key, value = next(iter(node.items()))
+        if key == 'all':
+            return db.and_(*[AchievementCriteria._deck_condition(child, deck) for child in value])
+        if key == 'any':
+            return db.or_(*[AchievementCriteria._deck_condition(child, deck) for child in value])
+        if key == 'not':
+            return db.not_(AchievementCriteria._deck_condition(value, deck))
+
+        if key == 'format':
+            return deck.format.in_(value if isinstance(value, list) else [value])
+
+        if key == 'legal_in':
+            if value is True:
+                # Legal in the deck's own format
+                bit = db.case(*[(deck.format == name, legality_bit(name)) for name in LEGALITY_FORMATS], else_=0)
+                known_format = deck.format.in_(LEGALITY_FORMATS)
+                min_size = db.case(
+                    *[(deck.format == name, AchievementCriteria._min_deck_size(name)) for name in LEGALITY_FORMATS],
+                    else_=1
+                )
+            else:
+                bit = legality_bit(value)
+                known_format = db.true()
+                min_size = AchievementCriteria._min_deck_size(value)
+            deck_card, legality = db.aliased(DeckCard), db.aliased(CardLegality)
+            allowed = db.func.coalesce(legality.legal_mask, 0).op('|')(db.func.coalesce(legality.restricted_mask, 0))
+            illegal_card = db.select(deck_card.id).select_from(
+                db.outerjoin(deck_card, legality, legality.scryfall_id == deck_card.scryfall_id)
+            ).where(
+                deck_card.deck_id == deck.id,
+                deck_card.card_type.in_(DECK_SECTIONS + ('sideboard',)),
+                allowed.op('&')(bit) == 0
+            ).exists()
+            sized_card = db.aliased(DeckCard)
+            deck_size = db.select(db.func.coalesce(db.func.sum(sized_card.quantity), 0)).where(
+                sized_card.deck_id == deck.id,
+                sized_card.card_type.in_(DECK_SECTIONS)
+            ).scalar_subquery()
+            return db.and_(known_format, deck_size >= min_size, ~illegal_card)
+
+        if key == 'contains':
+            aggregate = AchievementCriteria._deck_aggregate(value, deck)
+            return db.and_(*[COMPARISONS[op](aggregate, value[op]) for op in COMPARISONS if op in value])
+
+    @staticmethod
+    def _min_deck_size(format_name):
+        """Minimum mainboard size for a format per DeckValidationService's rules; at least one card"""
+        return (FORMAT_RULES.get(format_name) or {}).get('min_size') or 1
+
+    @staticmethod
+    def _card_condition(node, tables):
+        """SQL condition for a card predicate over the given Card/CollectionCard/CardLegality aliases"""
+        key, value = next(iter(node.items()))
+        if key == 'all':
+            return db.and_(*[AchievementCriteria._card_condition(child, tables) for child in value])
+        if key == 'any':
+            return db.or_(*[AchievementCriteria._card_condition(child, tables) for child in value])
+        if key == 'not':
+            return db.not_(AchievementCriteria._card_condition(value, tables))
+
+        card, legality = tables['card'], tables['legality']
+        values = value if isinstance(value, list) else [value]
+
+        if key == 'name':
+            return card.name.in_(values)
+        if key == 'set':
+            return card.set_code.in_([v.lower() for v in values])
+        if key == 'rarity':
+            return card.rarity.in_(values)
+        if key == 'type':
+            padded = db.func.lower(db.literal(' ') + db.func.coalesce(card.type_line, '') + db.literal(' '))
+            return db.or_(*[padded.like(f'% {v.lower()} %') for v in values])
+        if key == 'type_line':
+            return db.func.lower(db.func.coalesce(card.type_line, '')).like(f'%{value.lower()}%')
+        if key == 'subtype':
+            subtype = db.aliased(CardSubtype)
+            return db.select(subtype.scryfall_id).where(
+                subtype.scryfall_id == card.scryfall_id,
+                subtype.subtype.in_([CardSubtype.normalize(v) for v in values])
+            ).exists()
+        if key == 'keyword':
+            keyword = db.aliased(CardKeyword)
+            return db.select(keyword.scryfall_id).where(
+                keyword.scryfall_id == card.scryfall_id,
+                keyword.keyword.in_([CardCacheService.normalize_keyword(v) for v in values])
+            ).exists()
+        if key == 'cmc':
+            if isinstance(value, dict):
+                return db.and_(*[COMPARISONS[op](card.cmc, bound) for op, bound in value.items()])
+            return card.cmc == value
+        if key == 'colors':
+            color_count = db.func.coalesce(db.func.json_array_length(card.colors), 0)
+            if value == 'mono':
+                return color_count == 1
+            if value == 'multicolor':
+                return color_count > 1
+            if value == 'colorless':
+                return color_count == 0
+            colors_text = db.cast(card.colors, db.String)
+            return db.and_(*[colors_text.like(f'%"{color}"%') for color in value])
+        if key == 'banned':
+            if value is True:
+                return db.func.coalesce(legality.banned_mask, 0) != 0
+            return db.func.coalesce(legality.banned_mask, 0).op('&')(legality_bit(value)) != 0
+        if key == 'legal':
+            return db.func.coalesce(legality.legal_mask, 0).op('&')(legality_bit(value)) != 0
+        if key == 'foil':
+            return tables['collection'].is_foil == value
+        if key == 'condition':
+            return tables['collection'].condition.in_(values)
+
+    @staticmethod
+    def _distinct_column(field, card):
+        return {
+            'name': card.name,
+            'set': card.set_code,
+            'rarity': card.rarity,
+            'cmc': card.cmc,
+            'printing': card.scryfall_id
+        }[field]
+
+    @staticmethod
+    def _distinct_values(field, card):
+        """(column, join arguments) for distinct counts over the subtype/keyword index tables"""
+        if field == 'subtype':
+            subtype = db.aliased(CardSubtype)
+            return subtype.subtype, (subtype, subtype.scryfall_id == card.scryfall_id)
+        keyword = db.aliased(CardKeyword)
+        return keyword.keyword, (keyword, keyword.scryfall_id == card.scryfall_id)
+
+    # In-memory evaluation
+
+    @staticmethod
+    def compile_counter(criteria):
+        """How much a mutation event moves `current`, or None if it can't be maintained incrementally.
+
+        Events are dicts with 'card' (attributes of the card and of the collection
+        row's foil/condition, see AchievementService.apply_events), 'quantity' and
+        'rows' for collection changes, and 'decks' for deck changes. Distinct counts
+        and deck predicates need their column recomputed instead.
+        """
+        if criteria['type'] == 'decks':
+            if 'where' in criteria or criteria.get('count', 'decks') != 'decks':
+                return None
+            return lambda event: event.get('decks', 0)
+
+        count = criteria.get('count', 'entries')
+        if count not in ('entries', 'copies'):
+            return None
+        delta_key = 'rows' if count == 'entries' else 'quantity'
+
+        if 'where' not in criteria:
+            return lambda event: event.get(delta_key, 0)
+
+        matches = AchievementCriteria.card_predicate(criteria['where'])
+        return lambda event: event.get(delta_key, 0) if event.get('card') and matches(event['card']) else 0
+
+    @staticmethod
+    def card_predicate(node):
+        """Python predicate over a card attribute dict (with the collection row's foil and condition), equivalent to _card_condition"""
+        key, value = next(iter(node.items()))
+        if key in ('all', 'any'):
+            children = [AchievementCriteria.card_predicate(child) for child in value]
+            combine = all if key == 'all' else any
+            return lambda card: combine(child(card) for child in children)
+        if key == 'not':
+            child = AchievementCriteria.card_predicate(value)
+            return lambda card: not child(card)
+
+        values = value if isinstance(value, list) else [value]
+
+        if key == 'name':
+            names = set(values)
+            return lambda card: card['name'] in names
+        if key == 'set':
+            sets = {v.lower() for v in values}
+            return lambda card: card['set_code'] in sets
+        if key == 'rarity':
+            rarities = set(values)
+            return lambda card: card['rarity'] in rarities
+        if key == 'type':
+            # Same padded substring match as the SQL, so multi-word values agree
+            types = [f' {v.lower()} ' for v in values]
+            return lambda card: any(t in f" {card['type_line'].lower()} " for t in types)
+        if key == 'type_line':
+            fragment = value.lower()
+            return lambda card: fragment in card['type_line'].lower()
+        if key == 'subtype':
+            subtypes = {CardSubtype.normalize(v) for v in values}
+            return lambda card: bool(subtypes & CardSubtype.subtypes_from_type_line(card['type_line']))
+        if key == 'keyword':
+            keywords = {CardCacheService.normalize_keyword(v) for v in values}
+            return lambda card: bool(keywords & CardCacheService._keyword_set(card['keywords']))
+        if key == 'cmc':
+            if isinstance(value, dict):
+                return lambda card: card['cmc'] is not None and all(
+                    COMPARISONS[op](card['cmc'], bound) for op, bound in value.items()
+                )
+            return lambda card: card['cmc'] == value
+        if key == 'colors':
+            if value == 'mono':
+                return lambda card: len(card['colors']) == 1
+            if value == 'multicolor':
+                return lambda card: len(card['colors']) > 1
+            if value == 'colorless':
+                return lambda card: not card['colors']
+            required = set(value)
+            return lambda card: required <= set(card['colors'])
+        if key == 'banned':
+            bit = -1 if value is True else legality_bit(value)
+            return lambda card: bool(card['banned_mask'] & bit)
+        if key == 'legal':
+            bit = legality_bit(value)
+            return lambda card: bool(card['legal_mask'] & bit)
+        if key == 'foil':
+            return lambda card: card['foil'] == value
+        if key == 'condition':
+            conditions = set(values)
+            return lambda card: card['condition'] in conditions
@@ -0,0 +1,187 @@
+from flask import current_app
+from src.models.user import db
+from src.models.achievement import AchievementJob
+from src.services.achievement_service import AchievementService
+from datetime import datetime, timedelta
+import threading
+
+class AchievementJobService:
+    """Durable queue that moves achievement evaluation off the request path.
+
+    Mutations are stored as AchievementJob rows in the request's own database, so a
+    restart loses nothing. Background workers claim all pending jobs of one user at
+    a time, merge their events and apply them in a single evaluation; a user never
+    has two jobs running at once, so their progress is updated serially.
+
+    Set ACHIEVEMENT_EVALUATION=sync to evaluate inline instead (tests, scripts).
+    """
+
+    POLL_INTERVAL_SECONDS = 1.0
+    MAX_ATTEMPTS = 3
+    # Running jobs not finished after this long belonged to a worker that died
+    STALE_AFTER_SECONDS = 300
+    # Jobs whose events are not yet reflected in stored progress
+    UNAPPLIED_STATUSES = ('pending', 'running')
+
+    _workers = []
+    _workers_lock = threading.Lock()
+    _wakeup = threading.Event()
+
+    @staticmethod
+    def enqueue(user_id, event, trigger_type):
+        """Queue one mutation event for a user, committing it with the pending mutation.
+
+        Returns newly completed achievements in sync mode; in async mode returns []
+        and completions are delivered as AchievementNotification rows.
+        """
+        if current_app.config.get('ACHIEVEMENT_EVALUATION') == 'sync':
+            return AchievementService.apply_events(user_id, [event], trigger_type)
+
+        # Coalesce into the user's waiting job rather than queueing one per mutation
+        job = AchievementJob.query.filter_by(
+            user_id=user_id, status='pending'
+        ).order_by(AchievementJob.id).with_for_update().first()
+        if job:
+            job.events = job.events + [event]
+            if job.trigger_type != trigger_type:
+                job.trigger_type = 'retroactive'
+        else:
+            db.session.add(AchievementJob(user_id=user_id, trigger_type=trigger_type, events=[event]))
+        db.session.commit()
+
+        AchievementJobService.start_workers(current_app._get_current_object())
+        AchievementJobService._wakeup.set()
+        return []
+
+    @staticmethod
+    def claim_next():
+        """Claim every pending job of the user with the oldest one, or None if idle.
+
+        Users with a job already running are skipped so their events stay ordered.
+        """
+        running_users = db.select(AchievementJob.user_id).where(AchievementJob.status == 'running')
+        first = AchievementJob.query.filter(
+            AchievementJob.status == 'pending',
+            AchievementJob.user_id.not_in(running_users)
+        ).order_by(AchievementJob.id).with_for_update(skip_locked=True).first()
+        if not first:
+            db.session.rollback()
+            return None
+
+        # Compare-and-set so two workers can never both claim a user, even without row locks (SQLite)
+        running_jobs = db.aliased(AchievementJob, name='running_jobs')
+        claimed = db.session.execute(
+            db.update(AchievementJob).where(
+                AchievementJob.user_id == first.user_id,
+                AchievementJob.status == 'pending',
+                ~db.select(running_jobs.id).where(
+                    running_jobs.user_id == first.user_id,
+                    running_jobs.status == 'running'
+                ).exists()
+            ).values(
+                status='running',
+                attempts=AchievementJob.attempts + 1,
+                updated_at=datetime.utcnow()
+            ).returning(AchievementJob.id).execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.session.commit()
+        if not claimed:
+            return None
+        return AchievementJob.query.filter(AchievementJob.id.in_(claimed)).order_by(AchievementJob.id).all()
+
+    @staticmethod
+    def process(jobs):
+        """Apply a user's claimed jobs as one evaluation; failed jobs are retried up to MAX_ATTEMPTS"""
+        user_id = jobs[0].user_id
+        job_ids = [job.id for job in jobs]
+        trigger_types = {job.trigger_type for job in jobs}
+        trigger_type = trigger_types.pop() if len(trigger_types) == 1 else 'retroactive'
+        events = [event for job in jobs for event in job.events]
+
+        try:
+            # Dequeue in the same transaction that records the progress
+            dequeued = AchievementJob.query.filter(
+                AchievementJob.id.in_(job_ids)
+            ).delete(synchronize_session=False)
+            if dequeued < len(job_ids):
+                # A full recompute took these jobs after they were claimed and
+                # already counts their events
+                db.session.commit()
+                return []
+            completed = AchievementService.apply_events(user_id, events, trigger_type)
+            db.session.commit()
+            return completed
+        except Exception as e:
+            db.session.rollback()
+            for job in AchievementJob.query.filter(AchievementJob.id.in_(job_ids)):
+                job.status = 'failed' if job.attempts >= AchievementJobService.MAX_ATTEMPTS else 'pending'
+                job.error = str(e)
+            db.session.commit()
+            print(f"Error evaluating achievements for user {user_id}: {e}")
+            return []
+
+    @staticmethod
+    def _discard_pending(user_id):
+        """Drop a user's unapplied events ahead of a full recompute, which already counts them.
+
+        Jobs a worker has claimed but not finished are dropped too; process() notices
+        and skips them rather than applying their events a second time. Returns the
+        number of jobs dropped.
+        """
+        return AchievementJob.query.filter(
+            AchievementJob.user_id == user_id,
+            AchievementJob.status.in_(AchievementJobService.UNAPPLIED_STATUSES)
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def requeue_stale():
+        """Return jobs left running by a dead worker to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=AchievementJobService.STALE_AFTER_SECONDS)
+        count = AchievementJob.query.filter(
+            AchievementJob.status == 'running',
+            AchievementJob.updated_at < cutoff
+        ).update({'status': 'pending'}, synchronize_session=False)
+        db.session.commit()
+        return count
+
+    @staticmethod
+    def run_worker(app, stop_when_idle=False):
+        """Claim and process jobs until stopped (or until the queue is empty)"""
+        with app.app_context():
+            processed = 0
+            AchievementJobService.requeue_stale()
+            while True:
+                try:
+                    jobs = AchievementJobService.claim_next()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Error claiming achievement jobs: {e}")
+                    jobs = None
+
+                if jobs:
+                    AchievementJobService.process(jobs)
+                    processed += len(jobs)
+                    db.session.remove()
+                    continue
+
+                db.session.remove()
+                if stop_when_idle:
+                    return processed
+                AchievementJobService._wakeup.wait(AchievementJobService.POLL_INTERVAL_SECONDS)
+                AchievementJobService._wakeup.clear()
+
+    @staticmethod
+    def start_workers(app):
+        """Start the in-process worker threads once (ACHIEVEMENT_WORKERS, 0 disables)"""
+        cls = AchievementJobService
+        if cls._workers:
+            return
+        with cls._workers_lock:
+            if cls._workers:
+                return
+            for i in range(app.config.get('ACHIEVEMENT_WORKERS', 2)):
+                worker = threading.Thread(
+                    target=cls.run_worker, args=(app,), name=f'achievement-worker-{i}', daemon=True
+                )
+                worker.start()
+                cls._workers.append(worker)
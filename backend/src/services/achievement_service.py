@@ -1,26 +1,130 @@
 from src.models.user import db
-from src.models.achievement import Achievement, UserAchievement, AchievementNotification
-from src.models.card import Card, CollectionCard, Deck, DeckCard
+from src.models.achievement import Achievement, AchievementCatalog, AchievementJob, UserAchievement, AchievementNotification
+from src.models.card import Card, CardLegality, CollectionCard
+from src.services.achievement_criteria import AchievementCriteria
+from src.services.notification_broker import NotificationBroker
+from src.services.leaderboard_service import LeaderboardService
 from datetime import datetime
+import json
 import requests
+import threading
 
 class AchievementService:
     
+    # Compiled evaluation query for the current catalog version (see _compiled_catalog)
+    _compiled = None
+    _compiled_lock = threading.Lock()
+    
     @staticmethod
     def check_and_update_achievements(user_id, trigger_type='collection_update'):
-        """Check all achievements for a user and update progress"""
-        achievements = Achievement.query.filter_by(is_active=True).all()
-        newly_completed = []
+        """Check all achievements for a user and update progress.
         
-        for achievement in achievements:
-            if AchievementService._should_check_achievement(achievement, trigger_type):
-                progress = AchievementService._calculate_progress(user_id, achievement)
-                newly_completed.extend(
-                    AchievementService._update_user_progress(user_id, achievement, progress)
-                )
+        Progress for every active achievement comes from one compiled aggregate query.
+        The user's queued achievement jobs are dropped in the same transaction, since
+        the recompute already counts every committed mutation. Their events may belong
+        to any category, so dropping any widens the recompute to every category.
+        """
+        from src.services.achievement_job_service import AchievementJobService
+        if AchievementJobService._discard_pending(user_id):
+            trigger_type = 'retroactive'
         
+        compiled, values = AchievementService._evaluate(user_id)
+        progress_by_achievement = AchievementService._progress_from_values(
+            compiled, values, lambda entry: AchievementService._should_check_achievement(entry, trigger_type)
+        )
+        newly_completed = AchievementService._save_progress(user_id, progress_by_achievement)
+        
+        # One commit, so a recompute lands atomically with any queue bookkeeping
+        db.session.commit()
+        if newly_completed:
+            NotificationBroker.publish(user_id)
         return newly_completed
     
+    @staticmethod
+    def backfill_users(user_ids, achievement_ids=None):
+        """Recompute progress for a batch of users, optionally limited to some achievements.
+        
+        Used by the backfill CLI after the catalog changes; the caller commits.
+        Users with queued achievement jobs have those dropped, as the recompute counts
+        them, and every achievement recomputed, since their events move all counters.
+        Returns the number of achievements newly completed across the batch.
+        """
+        from src.services.achievement_job_service import AchievementJobService
+        queued_users = {
+            user_id for (user_id,) in db.session.query(AchievementJob.user_id).filter(
+                AchievementJob.user_id.in_(user_ids),
+                AchievementJob.status.in_(AchievementJobService.UNAPPLIED_STATUSES)
+            ).distinct()
+        }
+        
+        completed = 0
+        for user_id in user_ids:
+            recompute_all = achievement_ids is None or user_id in queued_users
+            if user_id in queued_users:
+                AchievementJobService._discard_pending(user_id)
+            
+            compiled, values = AchievementService._evaluate(user_id)
+            progress_by_achievement = AchievementService._progress_from_values(
+                compiled, values, lambda entry: recompute_all or entry['id'] in achievement_ids
+            )
+            completed += len(AchievementService._save_progress(user_id, progress_by_achievement, load_completed=False))
+        return completed
+    
+    @staticmethod
+    def _progress_from_values(compiled, values, include):
+        """Progress dicts from one evaluation row, for the catalog entries include() accepts"""
+        progress_by_achievement = {}
+        for entry in compiled['achievements']:
+            if include(entry):
+                current = int(getattr(values, f"c{entry['column']}") or 0)
+                progress_by_achievement[entry['id']] = {
+                    'current': current,
+                    'target': entry['target'],
+                    'completed': current >= entry['target']
+                }
+        return progress_by_achievement
+    
+    @staticmethod
+    def list_for_user(user_id):
+        """Every achievement with the user's progress.
+        
+        Achievement rows come from the cached catalog; the only query is the user's
+        progress rows, with the catalog version alongside to detect a stale cache.
+        """
+        version = db.select(AchievementService._catalog_version_column()).subquery()
+        rows = db.session.query(
+            version.c.catalog_version,
+            UserAchievement.achievement_id,
+            UserAchievement.progress,
+            UserAchievement.is_completed,
+            UserAchievement.completed_at
+        ).select_from(version).outerjoin(
+            UserAchievement, UserAchievement.user_id == user_id
+        ).all()
+        
+        compiled = AchievementService._compiled_catalog(expected_version=rows[0].catalog_version)
+        progress = {row.achievement_id: row for row in rows if row.achievement_id is not None}
+        
+        result = []
+        for achievement in compiled['listing']:
+            achievement_data = dict(achievement)
+            user_progress = progress.get(achievement['id'])
+            if user_progress:
+                achievement_data.update({
+                    'user_progress': user_progress.progress,
+                    'is_completed': user_progress.is_completed,
+                    'completed_at': user_progress.completed_at.isoformat() if user_progress.completed_at else None
+                })
+            else:
+                achievement_data.update({
+                    'user_progress': {'current': 0, 'target': achievement['criteria'].get('target', 1), 'completed': False},
+                    'is_completed': False,
+                    'completed_at': None
+                })
+            result.append(achievement_data)
+        
+        return result
+    
     @staticmethod
     def _should_check_achievement(achievement, trigger_type):
         """Determine if achievement should be checked based on trigger"""
@@ -29,155 +133,336 @@ class AchievementService:
             'deck_update': ['deck', 'mastery'],
             'retroactive': ['collection', 'deck', 'discovery', 'mastery']
         }
-        return achievement.category in trigger_map.get(trigger_type, [])
-    
-    @staticmethod
-    def _calculate_progress(user_id, achievement):
-        """Calculate current progress for an achievement"""
-        criteria = achievement.criteria
-        achievement_type = criteria.get('type')
-        
-        if achievement_type == 'collection_count':
-            return AchievementService._check_collection_count(user_id, criteria)
-        elif achievement_type == 'deck_count':
-            return AchievementService._check_deck_count(user_id, criteria)
-        elif achievement_type == 'card_criteria':
-            return AchievementService._check_card_criteria(user_id, criteria)
-        elif achievement_type == 'deck_criteria':
-            return AchievementService._check_deck_criteria(user_id, criteria)
-        elif achievement_type == 'banned_cards':
-            return AchievementService._check_banned_cards(user_id, criteria)
-        
-        return {'current': 0, 'target': criteria.get('target', 1), 'completed': False}
-    
-    @staticmethod
-    def _check_collection_count(user_id, criteria):
-        """Check collection size achievements"""
-        target = criteria.get('target', 1)
-        
-        if criteria.get('unique', False):
-            # Count unique cards
-            current = CollectionCard.query.filter_by(user_id=user_id).count()
-        else:
-            # Count total cards including quantities
-            result = db.session.query(db.func.sum(CollectionCard.quantity)).filter_by(user_id=user_id).scalar()
-            current = result or 0
-        
-        return {
-            'current': current,
-            'target': target,
-            'completed': current >= target
-        }
+        return achievement['category'] in trigger_map.get(trigger_type, [])
     
     @staticmethod
-    def _check_deck_count(user_id, criteria):
-        """Check deck count achievements"""
-        target = criteria.get('target', 1)
-        current = Deck.query.filter_by(user_id=user_id).count()
+    def bump_catalog_version():
+        """Mark the achievement catalog as changed so compiled queries are rebuilt; the caller commits.
         
-        return {
-            'current': current,
-            'target': target,
-            'completed': current >= target
-        }
+        Required after editing existing achievements; inserts and deletes are noticed anyway.
+        """
+        catalog = db.session.get(AchievementCatalog, 1)
+        if not catalog:
+            catalog = AchievementCatalog(id=1, version=0)
+            db.session.add(catalog)
+        catalog.version += 1
     
     @staticmethod
-    def _check_card_criteria(user_id, criteria):
-        """Check achievements based on card properties"""
-        target = criteria.get('target', 1)
-        card_filter = criteria.get('filter', {})
-        
-        # Build query based on filter criteria
-        query = db.session.query(CollectionCard).join(Card).filter(CollectionCard.user_id == user_id)
-        
-        if 'rarity' in card_filter:
-            query = query.filter(Card.rarity == card_filter['rarity'])
-        if 'colors' in card_filter:
-            # Handle color filtering logic
-            colors = card_filter['colors']
-            if colors == 'mono':
-                query = query.filter(db.func.json_array_length(Card.colors) == 1)
-            elif isinstance(colors, list):
-                query = query.filter(Card.colors.contains(colors))
-        if 'type_line' in card_filter:
-            query = query.filter(Card.type_line.like(f"%{card_filter['type_line']}%"))
-        
-        current = query.count()
-        
-        return {
-            'current': current,
-            'target': target,
-            'completed': current >= target
-        }
+    def _catalog_version_column():
+        """The catalog version as one string column.
+        
+        Combines the AchievementCatalog counter with the achievements table's row
+        count, highest id and active count, so rows added, removed or (de)activated
+        without a bump (seed scripts, admin edits) still invalidate the cache.
+        """
+        parts = [
+            db.select(db.func.coalesce(db.func.max(AchievementCatalog.version), 0)),
+            db.select(db.func.count(Achievement.id)),
+            db.select(db.func.coalesce(db.func.max(Achievement.id), 0)),
+            db.select(db.func.count(Achievement.id)).where(Achievement.is_active == True)
+        ]
+        version = db.cast(parts[0].scalar_subquery(), db.String)
+        for part in parts[1:]:
+            version = version + '-' + db.cast(part.scalar_subquery(), db.String)
+        return version.label('catalog_version')
     
     @staticmethod
-    def _check_deck_criteria(user_id, criteria):
-        """Check deck-specific achievements"""
-        target = criteria.get('target', 1)
-        deck_filter = criteria.get('filter', {})
+    def _evaluate(user_id):
+        """Run the compiled query for a user: (compiled catalog, result row).
         
-        # Example: Check for standard legal decks, creature type diversity, etc.
-        if deck_filter.get('type') == 'creature_types':
-            return AchievementService._check_creature_type_diversity(user_id, criteria)
-        elif deck_filter.get('type') == 'format_legal':
-            return AchievementService._check_format_legal_decks(user_id, criteria)
+        The catalog version rides along as an extra column, so a stale compilation is
+        noticed (and the query recompiled and re-run) without a separate round trip.
+        """
+        compiled = AchievementService._compiled_catalog()
+        values = db.session.execute(compiled['statement'], {'user_id': user_id}).one()
         
-        return {'current': 0, 'target': target, 'completed': False}
+        if values.catalog_version != compiled['version']:
+            compiled = AchievementService._compiled_catalog(expected_version=values.catalog_version)
+            values = db.session.execute(compiled['statement'], {'user_id': user_id}).one()
+        
+        return compiled, values
     
     @staticmethod
-    def _check_banned_cards(user_id, criteria):
-        """Check for banned cards achievement"""
-        target = criteria.get('target', 1)
+    def _compiled_catalog(expected_version=None):
+        """Compile every active achievement into one SELECT of conditional aggregates.
         
-        # This would require a banned cards database or API call
-        # For now, implement as a placeholder
-        banned_cards_in_collection = 0  # TODO: Implement banned card checking
+        Achievements with the same criteria (apart from target) share a column.
+        Also holds the serialized catalog for listings. Cached in memory until the
+        catalog version changes.
+        """
+        cls = AchievementService
+        if cls._compiled is not None and expected_version in (None, cls._compiled['version']):
+            return cls._compiled
         
-        return {
-            'current': banned_cards_in_collection,
-            'target': target,
-            'completed': banned_cards_in_collection >= target
+        with cls._compiled_lock:
+            if cls._compiled is not None and (expected_version is None or cls._compiled['version'] == expected_version):
+                return cls._compiled
+            
+            version = db.session.query(AchievementService._catalog_version_column()).scalar()
+            achievements = db.session.query(
+                Achievement.id, Achievement.category, Achievement.criteria
+            ).filter(Achievement.is_active == True).order_by(Achievement.id).all()
+            
+            user_id = db.bindparam('user_id')
+            columns = []
+            column_keys = {}
+            entries = []
+            for achievement_id, category, criteria in achievements:
+                try:
+                    criteria = AchievementCriteria.validate(criteria)
+                except ValueError as e:
+                    # One bad row must not break evaluation of the rest
+                    print(f"Skipping achievement {achievement_id} with invalid criteria: {e}")
+                    continue
+                key = json.dumps({k: v for k, v in criteria.items() if k != 'target'}, sort_keys=True)
+                if key not in column_keys:
+                    column_keys[key] = len(columns)
+                    columns.append(AchievementCriteria.compile_sql(criteria, user_id).label(f'c{len(columns)}'))
+                entries.append({
+                    'id': achievement_id,
+                    'category': category,
+                    'scope': criteria['type'],
+                    'target': criteria['target'],
+                    'column': column_keys[key],
+                    'counter': AchievementCriteria.compile_counter(criteria)
+                })
+            
+            cls._compiled = {
+                'version': version,
+                'columns': columns,
+                'user_id': user_id,
+                'partial_statements': {},
+                'statement': AchievementService._evaluation_statement(columns, user_id),
+                'achievements': entries,
+                'listing': [achievement.to_dict() for achievement in Achievement.query.order_by(Achievement.id)]
+            }
+        
+        return cls._compiled
+    
+    @staticmethod
+    def _evaluation_statement(columns, user_id):
+        """One row of the given criteria columns over a user's collection.
+        
+        The row count aggregate keeps it a single row even if every column is a
+        scalar subquery.
+        """
+        return db.select(
+            *columns,
+            db.func.count(CollectionCard.id).label('collection_rows'),
+            AchievementService._catalog_version_column()
+        ).select_from(
+            db.outerjoin(CollectionCard, Card, Card.scryfall_id == CollectionCard.scryfall_id).outerjoin(
+                CardLegality, CardLegality.scryfall_id == CollectionCard.scryfall_id
+            )
+        ).where(CollectionCard.user_id == user_id)
+    
+    @staticmethod
+    def _evaluate_columns(compiled, column_indexes, user_id):
+        """Run only some of the compiled columns for a user (cached per column set)"""
+        key = tuple(sorted(set(column_indexes)))
+        statement = compiled['partial_statements'].get(key)
+        if statement is None:
+            statement = AchievementService._evaluation_statement(
+                [compiled['columns'][i] for i in key], compiled['user_id']
+            )
+            compiled['partial_statements'][key] = statement
+        return db.session.execute(statement, {'user_id': user_id}).one()
+    
+    @staticmethod
+    def record_collection_change(user_id, scryfall_id, quantity_delta, rows_delta=0,
+                                 is_foil=False, condition='near_mint'):
+        """Queue a collection mutation for achievement evaluation.
+        
+        Call before committing the mutation: the event is committed together with it,
+        so a worker never sees the change without its event or the reverse.
+        quantity_delta is the change in copies, rows_delta the change in collection
+        entries (+1 for a new entry, -1 for a removed one); is_foil and condition
+        describe the collection entry, for foil and condition filters. Returns newly
+        completed achievements in synchronous mode, otherwise [] (they arrive as
+        notifications).
+        """
+        from src.services.achievement_job_service import AchievementJobService
+        event = {
+            'scryfall_id': scryfall_id,
+            'quantity': quantity_delta,
+            'rows': rows_delta,
+            'is_foil': bool(is_foil),
+            'condition': condition
         }
+        return AchievementJobService.enqueue(user_id, event, 'collection_update')
     
     @staticmethod
-    def _update_user_progress(user_id, achievement, progress):
-        """Update or create user achievement progress"""
-        user_achievement = UserAchievement.query.filter_by(
-            user_id=user_id, 
-            achievement_id=achievement.id
-        ).first()
+    def record_deck_change(user_id, decks_delta):
+        """Queue a deck created (+1), deleted (-1) or edited (0) for achievement evaluation"""
+        from src.services.achievement_job_service import AchievementJobService
+        return AchievementJobService.enqueue(user_id, {'decks': decks_delta}, 'deck_update')
+    
+    @staticmethod
+    def apply_events(user_id, events, trigger_type):
+        """Update only the progress a batch of events moves, completing achievements that reach their target.
         
-        newly_completed = []
+        Goals with an incremental counter get the events' deltas. Goals without one
+        (distinct counts, deck predicates) in the events' scope have just their own
+        columns recomputed. Counters need a stored baseline: if any affected
+        achievement has no progress row yet (new user, new achievement) or the
+        catalog changed, this falls back to a full recompute, which is also the
+        repair path for drifted counters.
+        """
+        scryfall_ids = {event['scryfall_id'] for event in events if event.get('scryfall_id')}
+        cards = {
+            card.scryfall_id: {
+                'name': card.name,
+                'set_code': card.set_code,
+                'rarity': card.rarity,
+                'cmc': card.cmc,
+                'colors': card.colors or [],
+                'keywords': card.keywords or [],
+                'type_line': card.type_line or '',
+                'banned_mask': card.banned_mask or 0,
+                'legal_mask': card.legal_mask or 0
+            }
+            for card in db.session.query(
+                Card.scryfall_id, Card.name, Card.set_code, Card.rarity, Card.cmc, Card.colors,
+                Card.keywords, Card.type_line, CardLegality.banned_mask, CardLegality.legal_mask
+            ).outerjoin(
+                CardLegality, CardLegality.scryfall_id == Card.scryfall_id
+            ).filter(Card.scryfall_id.in_(scryfall_ids))
+        } if scryfall_ids else {}
+        
+        compiled = AchievementService._compiled_catalog()
+        
+        scopes = {'cards' if event.get('scryfall_id') else 'decks' for event in events}
+        recomputed = [
+            entry for entry in compiled['achievements']
+            if entry['counter'] is None and entry['scope'] in scopes
+        ]
+        
+        deltas = {}
+        for event in events:
+            card = cards.get(event.get('scryfall_id'))
+            if card:
+                # Events queued before foil/condition were recorded count as the default printing
+                card = {**card, 'foil': event.get('is_foil', False), 'condition': event.get('condition', 'near_mint')}
+            event = {**event, 'card': card}
+            for entry in compiled['achievements']:
+                if entry['counter'] is not None:
+                    delta = entry['counter'](event)
+                    if delta:
+                        previous = deltas.get(entry['id'], (entry, 0))[1]
+                        deltas[entry['id']] = (entry, previous + delta)
+        
+        deltas = {achievement_id: value for achievement_id, value in deltas.items() if value[1]}
+        if not deltas and not recomputed:
+            return []
         
-        if not user_achievement:
-            user_achievement = UserAchievement(
-                user_id=user_id,
-                achievement_id=achievement.id,
-                progress=progress
+        rows = db.session.query(
+            UserAchievement, AchievementService._catalog_version_column()
+        ).filter(
+            UserAchievement.user_id == user_id,
+            UserAchievement.achievement_id.in_(list(deltas))
+        ).all() if deltas else []
+        
+        stale = any(version != compiled['version'] for _, version in rows)
+        baselines = {row.achievement_id: row for row, _ in rows if row.progress and 'current' in row.progress}
+        if stale or len(baselines) < len(deltas):
+            return AchievementService.check_and_update_achievements(user_id, trigger_type)
+        
+        newly_completed = []
+        if recomputed:
+            values = AchievementService._evaluate_columns(
+                compiled, [entry['column'] for entry in recomputed], user_id
             )
-            db.session.add(user_achievement)
-        else:
-            user_achievement.progress = progress
-            user_achievement.updated_at = datetime.utcnow()
-        
-        # Check if newly completed
-        if progress['completed'] and not user_achievement.is_completed:
-            user_achievement.is_completed = True
-            user_achievement.completed_at = datetime.utcnow()
-            
-            # Create notification
-            notification = AchievementNotification(
-                user_id=user_id,
-                achievement_id=achievement.id
+            if values.catalog_version != compiled['version']:
+                return AchievementService.check_and_update_achievements(user_id, trigger_type)
+            recomputed_ids = {entry['id'] for entry in recomputed}
+            newly_completed = AchievementService._save_progress(
+                user_id,
+                AchievementService._progress_from_values(compiled, values, lambda entry: entry['id'] in recomputed_ids)
             )
-            db.session.add(notification)
+        
+        now = datetime.utcnow()
+        completed_by_counter = []
+        for achievement_id, (entry, delta) in deltas.items():
+            user_achievement = baselines[achievement_id]
+            current = max(user_achievement.progress['current'] + delta, 0)
+            user_achievement.progress = {
+                'current': current,
+                'target': entry['target'],
+                'completed': current >= entry['target']
+            }
+            user_achievement.updated_at = now
             
-            newly_completed.append(achievement)
+            # Counter crossed its target
+            if current >= entry['target'] and not user_achievement.is_completed:
+                user_achievement.is_completed = True
+                user_achievement.completed_at = now
+                db.session.add(AchievementNotification(user_id=user_id, achievement_id=achievement_id))
+                completed_by_counter.append(user_achievement.achievement)
         
+        LeaderboardService.record_completions(user_id, [achievement.id for achievement in completed_by_counter])
+        newly_completed = list(newly_completed) + completed_by_counter
         db.session.commit()
+        if newly_completed:
+            NotificationBroker.publish(user_id)
         return newly_completed
     
+    @staticmethod
+    def _save_progress(user_id, progress_by_achievement, load_completed=True):
+        """Write a user's achievement progress in bulk; the caller commits.
+        
+        Existing rows are loaded in one query and compared in memory; only rows whose
+        progress changed are written (one bulk insert, one bulk update by id).
+        Returns the newly completed achievements (their ids if not load_completed).
+        """
+        existing = {
+            row.achievement_id: row
+            for row in db.session.query(
+                UserAchievement.id, UserAchievement.achievement_id,
+                UserAchievement.progress, UserAchievement.is_completed
+            ).filter(UserAchievement.user_id == user_id)
+        }
+        
+        now = datetime.utcnow()
+        inserts, updates, completed_ids = [], [], []
+        for achievement_id, progress in progress_by_achievement.items():
+            row = existing.get(achievement_id)
+            newly_completed = progress['completed'] and not (row and row.is_completed)
+            if row and row.progress == progress and not newly_completed:
+                continue
+            
+            values = {'progress': progress, 'updated_at': now}
+            if newly_completed:
+                values.update(is_completed=True, completed_at=now)
+                completed_ids.append(achievement_id)
+            
+            if row:
+                updates.append({'id': row.id, **values})
+            else:
+                inserts.append({
+                    'user_id': user_id,
+                    'achievement_id': achievement_id,
+                    'is_completed': False,
+                    'completed_at': None,
+                    'created_at': now,
+                    **values
+                })
+        
+        if inserts:
+            # render_nulls keeps rows with and without completed_at in one batch
+            db.session.execute(db.insert(UserAchievement).execution_options(render_nulls=True), inserts)
+        if updates:
+            db.session.execute(db.update(UserAchievement), updates)
+        if completed_ids:
+            db.session.execute(db.insert(AchievementNotification), [
+                {'user_id': user_id, 'achievement_id': achievement_id} for achievement_id in completed_ids
+            ])
+            LeaderboardService.record_completions(user_id, completed_ids)
+        
+        if not completed_ids or not load_completed:
+            return completed_ids
+        return Achievement.query.filter(Achievement.id.in_(completed_ids)).order_by(Achievement.id).all()
+    
     @staticmethod
     def run_retroactive_check(user_id):
-        """Run complete achievement check for existing data"""
+        """Recompute every achievement from scratch; repairs any drift in the incremental counters"""
         return AchievementService.check_and_update_achievements(user_id, 'retroactive')
\ No newline at end of file
@@ -0,0 +1,139 @@
+from src.models.user import db
+from src.models.card import Card, CardKeyword, CardLegality, CardManaCost, CardSubtype
+
+class CardCacheService:
+
+    @staticmethod
+    def normalize_keyword(keyword):
+        """Normalize a keyword to Scryfall's casing ('first STRIKE' -> 'First strike')"""
+        return keyword.strip().capitalize()
+
+    @staticmethod
+    def extract_image_uri(card_data):
+        """Pick the image URL to cache - prioritize art_crop, fallback to small, then normal"""
+        image_uris = card_data.get('image_uris', {})
+        if not image_uris:
+            return None
+
+        # Prefer art_crop for compact display
+        return image_uris.get('art_crop') or image_uris.get('small') or image_uris.get('normal')
+
+    @staticmethod
+    def cache_card(card_data):
+        """Create a cards_cache entry and its derived index rows from Scryfall card data.
+
+        The caller owns the transaction; nothing is committed here.
+        """
+        scryfall_id = card_data.get('scryfall_id') or card_data.get('id')
+
+        card = Card(
+            scryfall_id=scryfall_id,
+            name=card_data['name'],
+            mana_cost=card_data.get('mana_cost', ''),
+            cmc=card_data.get('cmc', 0),
+            type_line=card_data.get('type_line', ''),
+            oracle_text=card_data.get('oracle_text', ''),
+            colors=card_data.get('colors', []),
+            keywords=card_data.get('keywords', []),
+            image_uri=CardCacheService.extract_image_uri(card_data),
+            power=card_data.get('power'),
+            toughness=card_data.get('toughness'),
+            rarity=card_data.get('rarity', ''),
+            set_code=card_data.get('set', ''),
+            set_name=card_data.get('set_name', '')
+        )
+        db.session.add(card)
+
+        for keyword in CardCacheService._keyword_set(card.keywords):
+            db.session.add(CardKeyword(scryfall_id=scryfall_id, keyword=keyword))
+
+        for subtype in CardSubtype.subtypes_from_type_line(card.type_line):
+            db.session.add(CardSubtype(scryfall_id=scryfall_id, subtype=subtype))
+
+        db.session.add(CardManaCost(
+            scryfall_id=scryfall_id,
+            **CardManaCost.counts_from_mana_cost(card.mana_cost)
+        ))
+
+        if card_data.get('legalities'):
+            db.session.add(CardLegality(
+                scryfall_id=scryfall_id,
+                **CardLegality.masks_from_scryfall(card_data['legalities'])
+            ))
+
+        return card
+
+    @staticmethod
+    def _keyword_set(keywords):
+        """Distinct normalized keywords for a card"""
+        return {CardCacheService.normalize_keyword(k) for k in (keywords or []) if k and k.strip()}
+
+    @staticmethod
+    def backfill_keyword_index():
+        """Index keywords for cached cards that were stored before card_keywords existed"""
+        indexed = db.select(CardKeyword.scryfall_id).where(
+            CardKeyword.scryfall_id == Card.scryfall_id
+        ).exists()
+
+        # Most cards have no keywords; matching only non-empty arrays keeps the
+        # startup check from rescanning them every time
+        missing = db.session.query(Card.scryfall_id, Card.keywords).filter(
+            Card.keywords.isnot(None),
+            db.func.json_array_length(Card.keywords) > 0,
+            ~indexed
+        ).all()
+
+        rows = [
+            {'scryfall_id': scryfall_id, 'keyword': keyword}
+            for scryfall_id, keywords in missing
+            for keyword in CardCacheService._keyword_set(keywords)
+        ]
+
+        if rows:
+            db.session.execute(db.insert(CardKeyword), rows)
+        db.session.commit()
+
+        return len(rows)
+
+    @staticmethod
+    def backfill_subtype_index():
+        """Index subtypes for cached cards that were stored before card_subtypes existed"""
+        indexed = db.select(CardSubtype.scryfall_id).where(
+            CardSubtype.scryfall_id == Card.scryfall_id
+        ).exists()
+
+        missing = db.session.query(Card.scryfall_id, Card.type_line).filter(
+            Card.type_line.like('%—%'),
+            ~indexed
+        ).all()
+
+        rows = [
+            {'scryfall_id': scryfall_id, 'subtype': subtype}
+            for scryfall_id, type_line in missing
+            for subtype in CardSubtype.subtypes_from_type_line(type_line)
+        ]
+
+        if rows:
+            db.session.execute(db.insert(CardSubtype), rows)
+        db.session.commit()
+
+        return len(rows)
+
+    @staticmethod
+    def backfill_mana_costs():
+        """Parse mana costs for cached cards that were stored before card_mana_costs existed"""
+        parsed = db.select(CardManaCost.scryfall_id).where(
+            CardManaCost.scryfall_id == Card.scryfall_id
+        ).exists()
+
+        missing = db.session.query(Card.scryfall_id, Card.mana_cost).filter(~parsed).all()
+
+        rows = [
+            {'scryfall_id': scryfall_id, **CardManaCost.counts_from_mana_cost(mana_cost)}
+            for scryfall_id, mana_cost in missing
+        ]
+        if rows:
+            db.session.execute(db.insert(CardManaCost), rows)
+        db.session.commit()
+
+        return len(rows)
@@ -0,0 +1,273 @@
+from src.models.user import db
+from src.models.card import Card, CardKeyword, CollectionCard, DeckCard
+import numpy as np
+
+COLOR_BITS = {'W': 1, 'U': 2, 'B': 4, 'R': 8, 'G': 16}
+BASIC_LANDS = {'W': 'Plains', 'U': 'Island', 'B': 'Swamp', 'R': 'Mountain', 'G': 'Forest'}
+CARD_TYPES = ['creature', 'instant', 'sorcery', 'artifact', 'enchantment', 'planeswalker']
+
+class DeckBuilderService:
+
+    MAX_COPIES = 4
+    # Share of nonland slots per mana value bucket: <=1, 2, 3, 4, 5, 6+
+    TARGET_CURVE = np.array([0.16, 0.25, 0.22, 0.17, 0.11, 0.09])
+    # Score weights for the feature matrix columns built in _score_candidates
+    FEATURE_WEIGHTS = np.array([
+        3.0,   # colors shared with the focus card
+        1.0,   # colorless (fits any deck)
+        2.0,   # keywords shared with the focus card
+        4.0,   # subtypes shared with the focus card (tribal)
+        1.0,   # shares a card type with the focus card
+        0.5,   # cheap (mana value <= 3)
+    ])
+    # Nonbasic lands can take at most this share of the land slots; basics fill the rest
+    MAX_NONBASIC_LAND_SHARE = 0.5
+
+    @staticmethod
+    def build_around(deck, focus_card, focus_copies, deck_size=60, land_count=24):
+        """Fill a new deck with the best cards from the owner's collection for a focus card.
+
+        All candidates are scored in one vectorized pass over a feature matrix. Then the
+        top cards are taken per mana value bucket to fit the target curve, lands are
+        added, and every DeckCard row is inserted in one bulk statement. The caller
+        owns the transaction.
+        """
+        candidates = DeckBuilderService._load_candidates(deck.user_id, focus_card)
+
+        rows = [{
+            'deck_id': deck.id,
+            'scryfall_id': focus_card.scryfall_id,
+            'quantity': focus_copies,
+            'card_type': 'mainboard'
+        }]
+
+        spell_slots = max(deck_size - land_count - focus_copies, 0)
+        deck_mask = DeckBuilderService._deck_color_mask(focus_card, candidates)
+
+        if candidates['count']:
+            scores = DeckBuilderService._score_candidates(focus_card, candidates, deck_mask)
+            spell_taken = DeckBuilderService._pick_spells(candidates, scores, spell_slots)
+            land_taken = DeckBuilderService._pick_lands(candidates, deck_mask, land_count)
+            taken = spell_taken + land_taken
+
+            for i in np.flatnonzero(taken):
+                rows.append({
+                    'deck_id': deck.id,
+                    'scryfall_id': candidates['scryfall_ids'][i],
+                    'quantity': int(taken[i]),
+                    'card_type': 'mainboard'
+                })
+            lands_added = int(land_taken.sum())
+            spell_colors = candidates['color_masks'][spell_taken > 0]
+            spell_copies = spell_taken[spell_taken > 0]
+        else:
+            lands_added = 0
+            spell_colors = np.zeros(0, dtype=np.int64)
+            spell_copies = np.zeros(0, dtype=np.int64)
+
+        rows.extend(DeckBuilderService._basic_land_rows(
+            deck.id, deck_mask, land_count - lands_added, focus_card, spell_colors, spell_copies
+        ))
+
+        db.session.execute(db.insert(DeckCard), rows)
+
+        return sum(row['quantity'] for row in rows)
+
+    @staticmethod
+    def _load_candidates(user_id, focus_card):
+        """Load the owner's collection as column arrays, one entry per card name"""
+        collection = db.session.query(
+            CollectionCard.scryfall_id,
+            CollectionCard.quantity,
+            Card.name,
+            Card.cmc,
+            Card.colors,
+            Card.type_line,
+            Card.oracle_text
+        ).join(Card).filter(
+            CollectionCard.user_id == user_id,
+            Card.name != focus_card.name
+        ).all()
+
+        if not collection:
+            return {'count': 0}
+
+        scryfall_ids, quantities, names, cmcs, colors, type_lines, oracle_texts = zip(*collection)
+
+        # Several printings of one card are still one card for deck building purposes
+        names, first_index, inverse = np.unique(np.array(names, dtype=object), return_index=True, return_inverse=True)
+        owned = np.bincount(inverse, weights=np.array(quantities)).astype(np.int64)
+
+        def pick(values):
+            return [values[i] for i in first_index]
+
+        scryfall_ids = pick(scryfall_ids)
+        type_lines = np.char.lower(np.array([t or '' for t in pick(type_lines)], dtype=str))
+
+        keyword_matches = np.zeros(len(names), dtype=np.int64)
+        if focus_card.keywords:
+            # Shared keyword counts come straight from the card_keywords index
+            shared = dict(db.session.query(
+                CardKeyword.scryfall_id,
+                db.func.count(CardKeyword.keyword)
+            ).join(
+                CollectionCard, CollectionCard.scryfall_id == CardKeyword.scryfall_id
+            ).filter(
+                CollectionCard.user_id == user_id,
+                CardKeyword.keyword.in_(db.select(CardKeyword.keyword).where(
+                    CardKeyword.scryfall_id == focus_card.scryfall_id
+                ))
+            ).group_by(CardKeyword.scryfall_id).all())
+            keyword_matches = np.array([shared.get(sid, 0) for sid in scryfall_ids], dtype=np.int64)
+
+        return {
+            'count': len(names),
+            'scryfall_ids': scryfall_ids,
+            'copies': np.minimum(owned, DeckBuilderService.MAX_COPIES),
+            'cmc': np.array([c or 0 for c in pick(cmcs)], dtype=np.int64),
+            'color_masks': np.array(
+                [sum(COLOR_BITS.get(c, 0) for c in (cs or [])) for cs in pick(colors)], dtype=np.int64
+            ),
+            'type_lines': type_lines,
+            'oracle_texts': np.array([o or '' for o in pick(oracle_texts)], dtype=str),
+            'keyword_matches': keyword_matches
+        }
+
+    @staticmethod
+    def _deck_color_mask(focus_card, candidates):
+        """Deck colors are the focus card's colors, or the two most collected colors for colorless cards"""
+        focus_mask = sum(COLOR_BITS.get(c, 0) for c in (focus_card.colors or []))
+        if focus_mask or not candidates['count']:
+            return focus_mask
+
+        bits = np.array(list(COLOR_BITS.values()))
+        per_color = ((candidates['color_masks'][:, None] & bits) != 0).T @ candidates['copies']
+        return int(bits[np.argsort(-per_color, kind='stable')[:2]].sum())
+
+    @staticmethod
+    def _score_candidates(focus_card, candidates, deck_mask):
+        """Score every candidate in one pass; off-color cards and lands score -inf"""
+        masks = candidates['color_masks']
+        type_lines = candidates['type_lines']
+        focus_type_line = (focus_card.type_line or '').lower()
+
+        shared_colors = np.zeros(candidates['count'])
+        for bit in COLOR_BITS.values():
+            shared_colors += ((masks & bit) != 0) & bool(deck_mask & bit)
+
+        focus_subtypes = focus_type_line.split('—')[1].split() if '—' in focus_type_line else []
+        subtype_parts = np.char.add(np.char.add(' ', np.char.partition(type_lines, '—')[:, 2]), ' ')
+        shared_subtypes = np.zeros(candidates['count'])
+        for subtype in focus_subtypes:
+            shared_subtypes += np.char.find(subtype_parts, f' {subtype} ') >= 0
+
+        shared_type = np.zeros(candidates['count'], dtype=bool)
+        for card_type in CARD_TYPES:
+            if card_type in focus_type_line:
+                shared_type |= np.char.find(type_lines, card_type) >= 0
+
+        features = np.column_stack([
+            shared_colors,
+            masks == 0,
+            candidates['keyword_matches'],
+            shared_subtypes,
+            shared_type,
+            candidates['cmc'] <= 3
+        ]).astype(np.float64)
+
+        scores = features @ DeckBuilderService.FEATURE_WEIGHTS
+
+        is_land = np.char.find(type_lines, 'land') >= 0
+        off_color = (masks & ~deck_mask) != 0
+        scores[is_land | off_color] = -np.inf
+        return scores
+
+    @staticmethod
+    def _take_in_order(order, copies, limit):
+        """Copies to take per candidate when walking `order` until `limit` copies are taken"""
+        ordered = copies[order]
+        before = np.cumsum(ordered) - ordered
+        taken = np.zeros_like(copies)
+        taken[order] = np.clip(limit - before, 0, ordered)
+        return taken
+
+    @staticmethod
+    def _pick_spells(candidates, scores, spell_slots):
+        """Take the best spells per mana value bucket, then top up from the best leftovers"""
+        eligible = np.isfinite(scores)
+        copies = np.where(eligible, candidates['copies'], 0)
+        buckets = np.clip(candidates['cmc'], 1, 6) - 1
+        quotas = np.floor(DeckBuilderService.TARGET_CURVE * spell_slots).astype(np.int64)
+
+        # Sort by bucket, then score; the running copy count within a bucket decides what fits
+        order = np.lexsort((-scores, buckets))
+        ordered_copies = copies[order]
+        ordered_buckets = buckets[order]
+        running = np.cumsum(ordered_copies)
+        bucket_start = np.concatenate(([0], running))[np.searchsorted(ordered_buckets, ordered_buckets)]
+        before = running - ordered_copies - bucket_start
+        taken = np.zeros_like(copies)
+        taken[order] = np.clip(quotas[ordered_buckets] - before, 0, ordered_copies)
+
+        # Thin buckets leave slots open; fill them with the best remaining cards at any mana value
+        open_slots = spell_slots - taken.sum()
+        if open_slots > 0:
+            remaining = copies - taken
+            order = np.argsort(-np.where(remaining > 0, scores, -np.inf), kind='stable')
+            taken += DeckBuilderService._take_in_order(order, remaining, open_slots)
+
+        return taken
+
+    @staticmethod
+    def _pick_lands(candidates, deck_mask, land_count):
+        """Take owned nonbasic lands that make the deck's colors"""
+        type_lines = candidates['type_lines']
+        is_nonbasic_land = (np.char.find(type_lines, 'land') >= 0) & (np.char.find(type_lines, 'basic') < 0)
+
+        makes_deck_color = np.zeros(candidates['count'])
+        makes_other_color = np.zeros(candidates['count'])
+        for color, bit in COLOR_BITS.items():
+            makes_color = (np.char.find(candidates['oracle_texts'], f'{{{color}}}') >= 0) | \
+                          (np.char.find(type_lines, BASIC_LANDS[color].lower()) >= 0)
+            if deck_mask & bit:
+                makes_deck_color += makes_color
+            else:
+                makes_other_color += makes_color
+
+        scores = np.where(is_nonbasic_land & (makes_deck_color > 0), makes_deck_color - makes_other_color, -np.inf)
+        copies = np.where(np.isfinite(scores), candidates['copies'], 0)
+        limit = int(land_count * DeckBuilderService.MAX_NONBASIC_LAND_SHARE)
+
+        return DeckBuilderService._take_in_order(np.argsort(-scores, kind='stable'), copies, limit)
+
+    @staticmethod
+    def _basic_land_rows(deck_id, deck_mask, count, focus_card, spell_colors, spell_copies):
+        """Split the remaining land slots across cached basic lands by the spells' color weight"""
+        colors = [color for color, bit in COLOR_BITS.items() if deck_mask & bit]
+        if count <= 0 or not colors:
+            return []
+
+        basics = dict(db.session.query(Card.name, db.func.min(Card.scryfall_id)).filter(
+            Card.name.in_([BASIC_LANDS[color] for color in colors]),
+            Card.type_line.like('Basic Land%')
+        ).group_by(Card.name).all())
+        colors = [color for color in colors if BASIC_LANDS[color] in basics]
+        if not colors:
+            return []
+
+        focus_mask = sum(COLOR_BITS.get(c, 0) for c in (focus_card.colors or []))
+        all_masks = np.append(spell_colors, focus_mask)
+        all_copies = np.append(spell_copies, 1)
+        weights = np.array([((all_masks & COLOR_BITS[c]) != 0) @ all_copies for c in colors], dtype=np.float64) + 1
+
+        # Largest remainder split so the basics add up to exactly `count`
+        shares = weights / weights.sum() * count
+        quantities = np.floor(shares).astype(np.int64)
+        quantities[np.argsort(-(shares - quantities))[:count - quantities.sum()]] += 1
+
+        return [{
+            'deck_id': deck_id,
+            'scryfall_id': basics[BASIC_LANDS[color]],
+            'quantity': int(quantity),
+            'card_type': 'mainboard'
+        } for color, quantity in zip(colors, quantities) if quantity > 0]
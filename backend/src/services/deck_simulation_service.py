@@ -0,0 +1,314 @@
+from src.models.user import db
+from src.models.card import Card, DeckCard
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from math import comb, sqrt
+import multiprocessing
+import numpy as np
+import os
+import threading
+import time
+
+HAND_SIZE = 7
+Z_95 = 1.96
+# Games per batch; the time budget is checked between batches
+BATCH_SIZE = 2000
+
+def _wilson_interval(successes, trials):
+    """95% Wilson score interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + Z_95 ** 2 / trials
+    center = (p + Z_95 ** 2 / (2 * trials)) / denominator
+    margin = Z_95 * sqrt(p * (1 - p) / trials + Z_95 ** 2 / (4 * trials ** 2)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+def _simulate_chunk(is_land, card_index, queries, settings, iterations, seed):
+    """Run `iterations` games and count successes per query.
+
+    Module level (and DB free) so it can run in a worker process. Every game is
+    simulated in parallel as rows of NumPy arrays.
+    """
+    rng = np.random.default_rng(seed)
+    deck_size = len(is_land)
+    attempts = settings['max_mulligans'] + 1 if settings['mulligan'] == 'london' else 1
+
+    # One shuffle per game per mulligan attempt: (games, attempts, deck)
+    order = np.argsort(rng.random((iterations, attempts, deck_size)), axis=2)
+    lands_in_seven = is_land[order[:, :, :HAND_SIZE]].sum(axis=2)
+
+    # London mulligan: take the first attempt whose 7 has an acceptable land count
+    keepable = (lands_in_seven >= settings['min_lands_to_keep']) & (lands_in_seven <= settings['max_lands_to_keep'])
+    keepable[:, -1] = True
+    mulligans = keepable.argmax(axis=1)
+    games = np.arange(iterations)
+    order = order[games, mulligans]
+    lands_in_seven = lands_in_seven[games, mulligans]
+
+    # Bottom one card per mulligan: excess lands above 3 first, then spells, then lands
+    spells_in_seven = HAND_SIZE - lands_in_seven
+    lands_bottomed = np.minimum(np.clip(lands_in_seven - 3, 0, None), mulligans)
+    spells_bottomed = np.minimum(mulligans - lands_bottomed, spells_in_seven)
+    lands_bottomed += mulligans - lands_bottomed - spells_bottomed
+    lands_in_hand = lands_in_seven - lands_bottomed
+
+    max_turn = max(q['turn'] for q in queries)
+    max_draws = max_turn - (1 if settings['on_the_play'] else 0)
+    draws = order[:, HAND_SIZE:HAND_SIZE + max(max_draws, 0)]
+    lands_drawn = np.concatenate(
+        [np.zeros((iterations, 1), dtype=np.int64), np.cumsum(is_land[draws], axis=1)], axis=1
+    )
+
+    successes = []
+    for query in queries:
+        draws_by_turn = min(max(query['turn'] - (1 if settings['on_the_play'] else 0), 0), draws.shape[1])
+        lands_seen = lands_in_hand + lands_drawn[:, draws_by_turn]
+        # One land drop per turn
+        lands_in_play = np.minimum(lands_seen, query['turn'])
+
+        if query['type'] == 'lands_by_turn':
+            success = lands_in_play >= query['lands']
+        else:
+            # The queried card is never the one bottomed to a mulligan
+            positions = np.where(card_index[order] == query['card_index'], np.arange(deck_size), deck_size)
+            first_copy = positions.min(axis=1)
+            success = (first_copy < HAND_SIZE + draws_by_turn) & (lands_in_play >= query['cmc'])
+
+        successes.append(int(success.sum()))
+
+    return successes
+
+def _simulate_until(is_land, card_index, queries, settings, iterations, seed, deadline):
+    """Run up to `iterations` games in batches, stopping once `deadline` (time.time()) passes.
+
+    The first batch always runs. Returns (successes per query, games run).
+    """
+    batch_sizes = [BATCH_SIZE] * (iterations // BATCH_SIZE)
+    if iterations % BATCH_SIZE:
+        batch_sizes.append(iterations % BATCH_SIZE)
+
+    successes = [0] * len(queries)
+    games_run = 0
+    for size, batch_seed in zip(batch_sizes, seed.spawn(len(batch_sizes))):
+        if games_run and time.time() >= deadline:
+            break
+        batch = _simulate_chunk(is_land, card_index, queries, settings, size, batch_seed)
+        successes = [a + b for a, b in zip(successes, batch)]
+        games_run += size
+
+    return successes, games_run
+
+class DeckSimulationService:
+
+    DEFAULT_ITERATIONS = 10000
+    MAX_ITERATIONS = 1000000
+    # Runs above this size are split into chunks of this many games across the process pool
+    CHUNK_SIZE = 20000
+    DEFAULT_TIME_BUDGET_MS = 2000
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def start_pool():
+        """Start the process pool shared by all simulation requests in this server.
+
+        Call once at startup, before the server or any background threads start:
+        the workers are forked immediately, so they never inherit another thread's
+        locks. Without a pool, simulations run inline.
+        """
+        cls = DeckSimulationService
+        with cls._executor_lock:
+            if cls._executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=os.cpu_count() or 2,
+                    mp_context=multiprocessing.get_context('fork')
+                )
+                # The first submit forks every worker
+                executor.submit(os.getpid).result()
+                cls._executor = executor
+        return cls._executor
+
+    @staticmethod
+    def executor():
+        """The pool started by start_pool, or None to run inline"""
+        return DeckSimulationService._executor
+
+    @staticmethod
+    def load_deck(deck_id):
+        """Mainboard of a deck as parallel arrays, one entry per physical card"""
+        rows = db.session.query(
+            DeckCard.scryfall_id, DeckCard.quantity, Card.name, Card.cmc, Card.type_line
+        ).join(Card).filter(
+            DeckCard.deck_id == deck_id,
+            DeckCard.card_type.in_(['mainboard', 'commander'])
+        ).all()
+
+        cards = [{
+            'scryfall_id': scryfall_id,
+            'name': name,
+            'copies': quantity,
+            'cmc': cmc or 0,
+            'is_land': 'land' in (type_line or '').lower()
+        } for scryfall_id, quantity, name, cmc, type_line in rows]
+
+        card_index = np.repeat(np.arange(len(cards)), [c['copies'] for c in cards])
+        is_land = np.array([c['is_land'] for c in cards], dtype=bool)[card_index] if cards else np.zeros(0, dtype=bool)
+        return cards, is_land.astype(np.int64), card_index
+
+    @staticmethod
+    def resolve_queries(raw_queries, cards):
+        """Validate queries and attach the deck index / mana value of queried cards"""
+        by_id = {c['scryfall_id']: i for i, c in enumerate(cards)}
+        queries = []
+
+        for raw in raw_queries:
+            query_type = raw.get('type')
+            if query_type == 'lands_by_turn':
+                queries.append({
+                    'type': query_type,
+                    'lands': DeckSimulationService._int_field(raw, 'lands', 3),
+                    'turn': max(DeckSimulationService._int_field(raw, 'turn', raw.get('lands', 3)), 1)
+                })
+            elif query_type == 'cast_on_curve':
+                index = by_id.get(raw.get('scryfall_id'))
+                if index is None:
+                    raise ValueError(f"Card {raw.get('scryfall_id')} is not in the mainboard")
+                card = cards[index]
+                queries.append({
+                    'type': query_type,
+                    'scryfall_id': card['scryfall_id'],
+                    'name': card['name'],
+                    'card_index': index,
+                    'cmc': card['cmc'],
+                    'turn': max(DeckSimulationService._int_field(raw, 'turn', card['cmc']), 1)
+                })
+            else:
+                raise ValueError(f'Unknown query type: {query_type}')
+
+        return queries
+
+    @staticmethod
+    def _int_field(raw, key, default):
+        """Integer query field, raising ValueError for anything else"""
+        try:
+            return int(raw.get(key, default))
+        except (TypeError, ValueError):
+            raise ValueError(f'Query field {key} must be an integer')
+
+    @staticmethod
+    def exact_probability(query, cards, is_land, on_the_play):
+        """Closed-form hypergeometric probability, valid without mulligans"""
+        deck_size = len(is_land)
+        lands = int(is_land.sum())
+        seen = min(HAND_SIZE + max(query['turn'] - (1 if on_the_play else 0), 0), deck_size)
+        total = comb(deck_size, seen)
+
+        if query['type'] == 'lands_by_turn':
+            if query['lands'] > query['turn']:
+                return 0.0
+            return sum(
+                comb(lands, l) * comb(deck_size - lands, seen - l)
+                for l in range(query['lands'], min(lands, seen) + 1)
+            ) / total
+
+        # At least one copy of the card and enough lands among the cards seen
+        card = cards[query['card_index']]
+        if card['is_land'] or query['cmc'] > query['turn']:
+            return None
+        copies = card['copies']
+        others = deck_size - copies - lands
+        return sum(
+            comb(copies, c) * comb(lands, l) * comb(others, seen - c - l)
+            for c in range(1, min(copies, seen) + 1)
+            for l in range(query['cmc'], min(lands, seen - c) + 1)
+        ) / total
+
+    @staticmethod
+    def simulate(cards, is_land, card_index, queries, settings, iterations, time_budget_ms, seed=None):
+        """Answer queries exactly when possible, otherwise by Monte Carlo within a time budget"""
+        results = [None] * len(queries)
+
+        if settings['mulligan'] == 'none':
+            for i, query in enumerate(queries):
+                probability = DeckSimulationService.exact_probability(query, cards, is_land, settings['on_the_play'])
+                if probability is not None:
+                    results[i] = {
+                        **DeckSimulationService._describe(query),
+                        'probability': probability,
+                        'ci_low': probability,
+                        'ci_high': probability,
+                        'method': 'exact'
+                    }
+
+        pending = [i for i, result in enumerate(results) if result is None]
+        games_run = 0
+        if pending:
+            pending_queries = [queries[i] for i in pending]
+            successes, games_run = DeckSimulationService._run_monte_carlo(
+                is_land, card_index, pending_queries, settings, iterations, time_budget_ms, seed
+            )
+            for i, success_count in zip(pending, successes):
+                ci_low, ci_high = _wilson_interval(success_count, games_run)
+                results[i] = {
+                    **DeckSimulationService._describe(queries[i]),
+                    'probability': success_count / games_run if games_run else None,
+                    'ci_low': ci_low,
+                    'ci_high': ci_high,
+                    'method': 'monte_carlo'
+                }
+
+        return results, games_run
+
+    @staticmethod
+    def _run_monte_carlo(is_land, card_index, queries, settings, iterations, time_budget_ms, seed):
+        """Run games inline for small runs, or in chunks across the process pool.
+
+        Both paths stop at the time budget and report the games that completed.
+        Chunks still queued at the deadline are cancelled, and running chunks stop
+        themselves after their current batch.
+        """
+        deadline = time.time() + time_budget_ms / 1000
+        seeds = np.random.SeedSequence(seed)
+        executor = DeckSimulationService.executor()
+
+        if iterations <= DeckSimulationService.CHUNK_SIZE or executor is None:
+            return _simulate_until(is_land, card_index, queries, settings, iterations, seeds, deadline)
+
+        chunk_sizes = [DeckSimulationService.CHUNK_SIZE] * (iterations // DeckSimulationService.CHUNK_SIZE)
+        if iterations % DeckSimulationService.CHUNK_SIZE:
+            chunk_sizes.append(iterations % DeckSimulationService.CHUNK_SIZE)
+
+        try:
+            futures = {
+                executor.submit(
+                    _simulate_until, is_land, card_index, queries, settings, size, chunk_seed, deadline
+                ): size
+                for size, chunk_seed in zip(chunk_sizes, seeds.spawn(len(chunk_sizes)))
+            }
+        except BrokenProcessPool:
+            return _simulate_until(is_land, card_index, queries, settings, iterations, seeds, deadline)
+
+        successes = [0] * len(queries)
+        games_run = 0
+        not_done = set(futures)
+        while not_done:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            done, not_done = wait(not_done, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_successes, chunk_games = future.result()
+                successes = [a + b for a, b in zip(successes, chunk_successes)]
+                games_run += chunk_games
+
+        for future in not_done:
+            future.cancel()
+
+        return successes, games_run
+
+    @staticmethod
+    def _describe(query):
+        """Query fields echoed back in results"""
+        return {key: value for key, value in query.items() if key != 'card_index'}
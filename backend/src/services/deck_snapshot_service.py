@@ -0,0 +1,67 @@
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+# Snapshot ids are the leading hex digits of the content hash
+SNAPSHOT_ID_LENGTH = 20
+SNAPSHOT_ID_PATTERN = re.compile(r'^[0-9a-f]{%d}$' % SNAPSHOT_ID_LENGTH)
+
+class DeckSnapshotService:
+
+    SNAPSHOT_DIR = os.environ.get(
+        'DECK_SNAPSHOT_DIR',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'snapshots')
+    )
+
+    @staticmethod
+    def publish(content):
+        """Write rendered deck content to an immutable, content-addressed snapshot file.
+
+        The id is a hash of the content, so publishing an unchanged deck returns the
+        existing snapshot and any edit produces a new id. Files are never rewritten.
+        """
+        body = json.dumps(content, sort_keys=True, separators=(',', ':'))
+        snapshot_id = hashlib.sha256(body.encode('utf-8')).hexdigest()[:SNAPSHOT_ID_LENGTH]
+        path = DeckSnapshotService._path(snapshot_id)
+
+        if not os.path.exists(path):
+            os.makedirs(DeckSnapshotService.SNAPSHOT_DIR, exist_ok=True)
+            document = json.dumps({
+                'snapshot_id': snapshot_id,
+                'published_at': datetime.utcnow().isoformat(),
+                **content
+            }, sort_keys=True, separators=(',', ':'))
+
+            # Write then rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=DeckSnapshotService.SNAPSHOT_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(document)
+            os.replace(tmp_path, path)
+
+        return snapshot_id
+
+    @staticmethod
+    def load(snapshot_id):
+        """Snapshot document bytes, or None if there is no such snapshot"""
+        if not SNAPSHOT_ID_PATTERN.match(snapshot_id):
+            return None
+        try:
+            return DeckSnapshotService._read(snapshot_id)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _read(snapshot_id):
+        """Cached file read; safe to keep forever because snapshots never change.
+        Misses raise, so they are not cached."""
+        with open(DeckSnapshotService._path(snapshot_id), 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def _path(snapshot_id):
+        return os.path.join(DeckSnapshotService.SNAPSHOT_DIR, f'{snapshot_id}.json')
@@ -0,0 +1,107 @@
+from src.models.user import db
+from src.models.card import Card, CardManaCost, Deck, DeckCard, DeckStats
+from datetime import datetime
+
+# Same precedence as the collection type analysis: the first match wins
+TYPE_CATEGORIES = [
+    ('creature', 'creatures'),
+    ('instant', 'instants'),
+    ('sorcery', 'sorceries'),
+    ('artifact', 'artifacts'),
+    ('enchantment', 'enchantments'),
+    ('planeswalker', 'planeswalkers'),
+    ('land', 'lands')
+]
+
+class DeckStatsService:
+
+    @staticmethod
+    def type_category(type_line):
+        """Categorize a type line (e.g. 'Artifact Creature — Golem' -> 'creatures')"""
+        type_line_lower = (type_line or '').lower()
+        for card_type, category in TYPE_CATEGORIES:
+            if card_type in type_line_lower:
+                return category
+        return 'other'
+
+    @staticmethod
+    def refresh(deck_id):
+        """Recompute and store a deck's statistics; the caller commits.
+
+        Also bumps the deck's updated_at so deck listings can tell it changed.
+        """
+        db.session.flush()
+
+        deck_cards = db.session.query(
+            DeckCard.quantity,
+            DeckCard.card_type,
+            Card.cmc,
+            Card.colors,
+            Card.type_line
+        ).join(Card).filter(DeckCard.deck_id == deck_id).all()
+
+        mainboard_cards = 0
+        sideboard_cards = 0
+        mana_curve = {}
+        color_distribution = {}
+        type_breakdown = {}
+        nonland_cmc_total = 0
+        nonland_cards = 0
+
+        for quantity, card_type, cmc, colors, type_line in deck_cards:
+            if card_type == 'sideboard':
+                sideboard_cards += quantity
+                continue
+
+            mainboard_cards += quantity
+            cmc = cmc or 0
+            mana_curve[str(cmc)] = mana_curve.get(str(cmc), 0) + quantity
+
+            # Count colors
+            for color in colors or []:
+                color_distribution[color] = color_distribution.get(color, 0) + quantity
+
+            category = DeckStatsService.type_category(type_line)
+            type_breakdown[category] = type_breakdown.get(category, 0) + quantity
+
+            # Lands don't count towards average mana value
+            if category != 'lands':
+                nonland_cmc_total += cmc * quantity
+                nonland_cards += quantity
+
+        stats = db.session.get(DeckStats, deck_id)
+        if not stats:
+            stats = DeckStats(deck_id=deck_id)
+            db.session.add(stats)
+
+        stats.total_cards = sum(quantity for quantity, *_ in deck_cards)
+        stats.mainboard_cards = mainboard_cards
+        stats.sideboard_cards = sideboard_cards
+        stats.mana_curve = mana_curve
+        stats.color_distribution = color_distribution
+        stats.type_breakdown = type_breakdown
+        stats.average_cmc = round(nonland_cmc_total / nonland_cards, 2) if nonland_cards else 0
+        stats.mana_symbols = DeckStatsService.mana_symbols(deck_id)
+        stats.updated_at = datetime.utcnow()
+
+        db.session.query(Deck).filter(Deck.id == deck_id).update(
+            {Deck.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+
+        return stats
+
+    @staticmethod
+    def mana_symbols(deck_id):
+        """Devotion and pip totals for a deck's mainboard and command zone, as one SQL sum.
+
+        Stored in DeckStats by refresh, so deck views don't run it.
+        """
+        totals = db.session.query(
+            *CardManaCost.sum_columns(DeckCard.quantity)
+        ).select_from(DeckCard).join(
+            CardManaCost, CardManaCost.scryfall_id == DeckCard.scryfall_id
+        ).filter(
+            DeckCard.deck_id == deck_id,
+            DeckCard.card_type != 'sideboard'
+        ).one()
+        return CardManaCost.totals_to_dict(totals)
@@ -0,0 +1,202 @@
+from src.models.user import db
+from src.models.card import Card, CardLegality, Deck, DeckCard, LEGALITY_FORMATS, legality_bit
+from itertools import groupby
+import threading
+import time
+
+# Deck construction rules per format. None means "no limit".
+FORMAT_RULES = {
+    'standard': {'min_size': 60, 'max_size': None, 'max_copies': 4, 'sideboard_max': 15, 'commander': False},
+    'modern': {'min_size': 60, 'max_size': None, 'max_copies': 4, 'sideboard_max': 15, 'commander': False},
+    'legacy': {'min_size': 60, 'max_size': None, 'max_copies': 4, 'sideboard_max': 15, 'commander': False},
+    'pauper': {'min_size': 60, 'max_size': None, 'max_copies': 4, 'sideboard_max': 15, 'commander': False},
+    'commander': {'min_size': 100, 'max_size': 100, 'max_copies': 1, 'sideboard_max': 0, 'commander': True},
+    'casual': {'min_size': None, 'max_size': None, 'max_copies': None, 'sideboard_max': None, 'commander': False},
+}
+
+# Cards whose oracle text lifts the copy limit (Relentless Rats, Persistent Petitioners, ...)
+ANY_NUMBER_TEXT = 'a deck can have any number of cards named'
+
+# Columns needed to validate one deck card
+VALIDATION_COLUMNS = [
+    DeckCard.deck_id, DeckCard.quantity, DeckCard.card_type,
+    Card.name, Card.type_line, Card.colors, Card.oracle_text,
+    CardLegality.legal_mask, CardLegality.restricted_mask
+]
+
+class DeckValidationService:
+
+    # Ban lists are rebuilt from card_legalities at most this often
+    BAN_LIST_TTL_SECONDS = 3600
+
+    _ban_lists = None
+    _ban_lists_loaded_at = 0
+    _ban_lists_lock = threading.Lock()
+
+    @staticmethod
+    def ban_lists():
+        """Banned/restricted card names per format, loaded once into memory.
+
+        Keyed by name so every printing of a banned card is caught, even printings
+        that have no legality row yet.
+        """
+        cls = DeckValidationService
+        if cls._ban_lists is not None and time.time() - cls._ban_lists_loaded_at < cls.BAN_LIST_TTL_SECONDS:
+            return cls._ban_lists
+
+        with cls._ban_lists_lock:
+            if cls._ban_lists is None or time.time() - cls._ban_lists_loaded_at >= cls.BAN_LIST_TTL_SECONDS:
+                rows = db.session.query(
+                    Card.name, CardLegality.banned_mask, CardLegality.restricted_mask
+                ).join(CardLegality, CardLegality.scryfall_id == Card.scryfall_id).filter(
+                    (CardLegality.banned_mask != 0) | (CardLegality.restricted_mask != 0)
+                ).all()
+
+                ban_lists = {name: {'banned': set(), 'restricted': set()} for name in LEGALITY_FORMATS}
+                for card_name, banned_mask, restricted_mask in rows:
+                    for format_name in LEGALITY_FORMATS:
+                        bit = legality_bit(format_name)
+                        if banned_mask & bit:
+                            ban_lists[format_name]['banned'].add(card_name)
+                        if restricted_mask & bit:
+                            ban_lists[format_name]['restricted'].add(card_name)
+
+                cls._ban_lists = ban_lists
+                cls._ban_lists_loaded_at = time.time()
+
+        return cls._ban_lists
+
+    @staticmethod
+    def validate_deck(deck, format_name=None):
+        """Validate one deck against its own format (or `format_name`)"""
+        cards = db.session.query(*VALIDATION_COLUMNS).join(
+            Card, Card.scryfall_id == DeckCard.scryfall_id
+        ).outerjoin(
+            CardLegality, CardLegality.scryfall_id == DeckCard.scryfall_id
+        ).filter(DeckCard.deck_id == deck.id).all()
+
+        result = DeckValidationService.validate(format_name or deck.format, cards)
+        result['deck_id'] = deck.id
+        return result
+
+    @staticmethod
+    def iter_all_deck_results(batch_size=1000):
+        """Validate every deck of every user in one streamed pass over deck_cards"""
+        formats = dict(db.session.query(Deck.id, Deck.format).all())
+
+        rows = db.session.query(*VALIDATION_COLUMNS).join(
+            Card, Card.scryfall_id == DeckCard.scryfall_id
+        ).outerjoin(
+            CardLegality, CardLegality.scryfall_id == DeckCard.scryfall_id
+        ).order_by(DeckCard.deck_id).yield_per(batch_size)
+
+        seen = set()
+        for deck_id, cards in groupby(rows, key=lambda row: row.deck_id):
+            seen.add(deck_id)
+            result = DeckValidationService.validate(formats.get(deck_id), list(cards))
+            result['deck_id'] = deck_id
+            yield result
+
+        # Empty decks never show up in deck_cards
+        for deck_id, deck_format in formats.items():
+            if deck_id not in seen:
+                result = DeckValidationService.validate(deck_format, [])
+                result['deck_id'] = deck_id
+                yield result
+
+    @staticmethod
+    def validate(format_name, cards):
+        """Check deck cards (VALIDATION_COLUMNS rows) against a format's rules"""
+        format_name = (format_name or 'casual').lower()
+        errors = []
+        warnings = []
+
+        def error(rule, message, card=None):
+            errors.append({'rule': rule, 'message': message, 'card': card})
+
+        rules = FORMAT_RULES.get(format_name)
+        if rules is None:
+            return {
+                'format': format_name,
+                'is_valid': False,
+                'errors': [{'rule': 'format', 'message': f'Unknown format: {format_name}', 'card': None}],
+                'warnings': []
+            }
+
+        commanders = [c for c in cards if c.card_type == 'commander']
+        mainboard = [c for c in cards if c.card_type not in ('sideboard', 'commander')]
+        sideboard = [c for c in cards if c.card_type == 'sideboard']
+
+        # Deck size (the commander counts towards the 100)
+        deck_size = sum(c.quantity for c in mainboard) + sum(c.quantity for c in commanders)
+        if rules['min_size'] is not None and deck_size < rules['min_size']:
+            error('min_size', f'Deck has {deck_size} cards, needs at least {rules["min_size"]}')
+        if rules['max_size'] is not None and deck_size > rules['max_size']:
+            error('max_size', f'Deck has {deck_size} cards, allows at most {rules["max_size"]}')
+
+        sideboard_size = sum(c.quantity for c in sideboard)
+        if rules['sideboard_max'] is not None and sideboard_size > rules['sideboard_max']:
+            error('sideboard_size', f'Sideboard has {sideboard_size} cards, allows at most {rules["sideboard_max"]}')
+
+        # Copy limits across mainboard + sideboard + command zone, by card name
+        copies = {}
+        details = {}
+        for card in cards:
+            copies[card.name] = copies.get(card.name, 0) + card.quantity
+            details[card.name] = card
+
+        ban_list = DeckValidationService.ban_lists().get(format_name) if format_name in LEGALITY_FORMATS else None
+        format_bit = legality_bit(format_name) if format_name in LEGALITY_FORMATS else None
+
+        for name, count in copies.items():
+            card = details[name]
+            type_line = card.type_line or ''
+            unlimited = 'Basic Land' in type_line or ANY_NUMBER_TEXT in (card.oracle_text or '').lower()
+
+            if ban_list and name in ban_list['restricted'] and count > 1:
+                error('restricted', f'{name} is restricted to 1 copy in {format_name}', name)
+            elif rules['max_copies'] is not None and not unlimited and count > rules['max_copies']:
+                rule = 'singleton' if rules['max_copies'] == 1 else 'max_copies'
+                error(rule, f'{count} copies of {name}, allows at most {rules["max_copies"]}', name)
+
+            if format_bit is None:
+                continue
+            if ban_list and name in ban_list['banned']:
+                error('banned', f'{name} is banned in {format_name}', name)
+            elif card.legal_mask is None:
+                warnings.append({'rule': 'legality_unknown', 'message': f'No legality data for {name}', 'card': name})
+            elif not (card.legal_mask | (card.restricted_mask or 0)) & format_bit:
+                error('not_legal', f'{name} is not legal in {format_name}', name)
+
+        if rules['commander']:
+            DeckValidationService._check_commander(commanders, mainboard, error)
+
+        return {
+            'format': format_name,
+            'is_valid': not errors,
+            'errors': errors,
+            'warnings': warnings
+        }
+
+    @staticmethod
+    def _check_commander(commanders, mainboard, error):
+        """Commander must be designated and legendary; every card must fit its color identity"""
+        if not commanders:
+            error('commander', 'No commander designated (add a card with card_type "commander")')
+            return
+        if len(commanders) > 2:
+            error('commander', 'A deck can have at most two commanders (partners)')
+
+        identity = set()
+        for commander in commanders:
+            type_line = commander.type_line or ''
+            can_command = 'can be your commander' in (commander.oracle_text or '').lower()
+            if not (('Legendary' in type_line and 'Creature' in type_line) or can_command):
+                error('commander', f'{commander.name} is not a legendary creature', commander.name)
+            identity.update(commander.colors or [])
+
+        # Identity is approximated by card colors; mana symbols in rules text are not tracked
+        for card in mainboard:
+            outside = set(card.colors or []) - identity
+            if outside:
+                error('color_identity', f'{card.name} is outside the commander color identity', card.name)
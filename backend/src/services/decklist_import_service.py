@@ -0,0 +1,241 @@
+from src.models.user import db
+from src.models.card import Card, DeckCard
+from src.services.card_cache_service import CardCacheService
+import re
+import requests
+import time
+
+SCRYFALL_API_BASE = 'https://api.scryfall.com'
+
+# "4x Lightning Bolt (M10) 146", "4 Lightning Bolt", "Lightning Bolt", "SB: 2 Duress"
+LINE_PATTERN = re.compile(
+    r'^(?:(?P<sideboard>SB:)\s*)?(?:(?P<quantity>\d+)x?\s+)?(?P<name>.+?)'
+    r'(?:\s+\((?P<set_code>[A-Za-z0-9]{2,6})\)(?:\s+(?P<collector_number>\S+))?)?\s*$',
+    re.IGNORECASE
+)
+
+# Section headers used by Arena, MTGO and most deck sites
+SECTION_HEADERS = {
+    'deck': 'mainboard',
+    'main': 'mainboard',
+    'mainboard': 'mainboard',
+    'maindeck': 'mainboard',
+    'sideboard': 'sideboard',
+    'side': 'sideboard',
+    'commander': 'commander',
+    'companion': 'sideboard',
+}
+
+class DecklistImportService:
+
+    # Scryfall's /cards/collection accepts at most 75 identifiers per request
+    COLLECTION_BATCH_SIZE = 75
+    # Scryfall asks clients to wait 50-100ms between requests
+    REQUEST_DELAY_SECONDS = 0.1
+
+    @staticmethod
+    def parse(text):
+        """Parse decklist text into entries, merging repeated lines per section.
+
+        Returns (entries, errors). Without section headers, a blank line after the
+        first cards starts the sideboard (MTGO / Arena export layout).
+        """
+        entries = {}
+        errors = []
+        section = 'mainboard'
+        has_headers = any(
+            line.strip().rstrip(':').lower() in SECTION_HEADERS for line in text.splitlines()
+        )
+        seen_cards = False
+
+        for line_number, raw_line in enumerate(text.splitlines(), start=1):
+            line = raw_line.strip()
+            if not line:
+                if seen_cards and not has_headers and section == 'mainboard':
+                    section = 'sideboard'
+                continue
+            if line.startswith('//') or line.startswith('#'):
+                continue
+
+            header = line.rstrip(':').lower()
+            if header in SECTION_HEADERS:
+                section = SECTION_HEADERS[header]
+                continue
+
+            match = LINE_PATTERN.match(line)
+            if not match:
+                errors.append({'line': line_number, 'text': raw_line, 'error': 'Could not parse line'})
+                continue
+
+            quantity = int(match.group('quantity') or 1)
+            if quantity < 1:
+                errors.append({'line': line_number, 'text': raw_line, 'error': 'Quantity must be at least 1'})
+                continue
+
+            card_type = 'sideboard' if match.group('sideboard') else section
+            name = match.group('name').strip()
+            key = (name.lower(), card_type)
+            if key in entries:
+                entries[key]['quantity'] += quantity
+            else:
+                entries[key] = {
+                    'name': name,
+                    'quantity': quantity,
+                    'card_type': card_type,
+                    'set_code': (match.group('set_code') or '').lower() or None,
+                    'collector_number': match.group('collector_number'),
+                    'line': line_number
+                }
+            seen_cards = True
+
+        return list(entries.values()), errors
+
+    @staticmethod
+    def resolve(entries):
+        """Map each entry to a scryfall_id: one cache query, then batched Scryfall lookups.
+
+        Returns ({(name.lower(), set_code): scryfall_id}, [unresolved entries]). The
+        caller owns the transaction; newly fetched cards are added to cards_cache.
+        """
+        wanted = {(e['name'].lower(), e['set_code']) for e in entries}
+        names = {name for name, _ in wanted}
+
+        # One indexed query for every name in the list (idx_cards_cache_name_lower)
+        cached = db.session.query(
+            Card.scryfall_id, Card.name, Card.set_code
+        ).filter(db.func.lower(Card.name).in_(names)).order_by(Card.scryfall_id).all()
+
+        by_name = {}
+        by_name_and_set = {}
+        for scryfall_id, name, set_code in cached:
+            by_name.setdefault(name.lower(), scryfall_id)
+            by_name_and_set.setdefault((name.lower(), (set_code or '').lower()), scryfall_id)
+
+        resolved = {}
+        missing = []
+        for name, set_code in wanted:
+            scryfall_id = by_name_and_set.get((name, set_code)) if set_code else by_name.get(name)
+            if scryfall_id:
+                resolved[(name, set_code)] = scryfall_id
+            else:
+                missing.append((name, set_code))
+
+        if missing:
+            resolved.update(DecklistImportService._fetch_missing(missing, by_name))
+
+        unresolved = [e for e in entries if (e['name'].lower(), e['set_code']) not in resolved]
+        return resolved, unresolved
+
+    @staticmethod
+    def _fetch_missing(missing, cached_by_name):
+        """Look up uncached names on Scryfall, 75 identifiers per /cards/collection call.
+
+        A printing from an unknown set falls back to any cached printing of the name,
+        or to Scryfall's default printing.
+        """
+        resolved = {}
+        fetched = {}
+        by_set = {key: [] for key in missing}
+
+        def lookup(identifiers):
+            for start in range(0, len(identifiers), DecklistImportService.COLLECTION_BATCH_SIZE):
+                if start:
+                    time.sleep(DecklistImportService.REQUEST_DELAY_SECONDS)
+                batch = identifiers[start:start + DecklistImportService.COLLECTION_BATCH_SIZE]
+                response = requests.post(
+                    f'{SCRYFALL_API_BASE}/cards/collection',
+                    json={'identifiers': batch},
+                    timeout=30
+                )
+                response.raise_for_status()
+                for card_data in response.json().get('data', []):
+                    if card_data['id'] not in fetched:
+                        fetched[card_data['id']] = card_data
+                    # Arena lists name double-faced cards by their front face only
+                    full_name = card_data['name'].lower()
+                    for name in {full_name, full_name.split(' // ')[0]}:
+                        for key in by_set:
+                            if key[0] == name and (key[1] is None or key[1] == card_data.get('set')):
+                                by_set[key].append(card_data['id'])
+
+        lookup([{'name': name, 'set': set_code} if set_code else {'name': name} for name, set_code in missing])
+
+        # Unknown set codes: use a cached printing if there is one, otherwise ask by name
+        retry = []
+        for name, set_code in missing:
+            if by_set[(name, set_code)]:
+                continue
+            if set_code and name in cached_by_name:
+                resolved[(name, set_code)] = cached_by_name[name]
+            elif set_code:
+                retry.append(name)
+        if retry:
+            for name in retry:
+                by_set[(name, None)] = by_set.get((name, None), [])
+            time.sleep(DecklistImportService.REQUEST_DELAY_SECONDS)
+            lookup([{'name': name} for name in sorted(set(retry))])
+            for name, set_code in missing:
+                if set_code and name in retry and by_set[(name, None)]:
+                    by_set[(name, set_code)] = by_set[(name, None)]
+
+        # Cache fetched printings that aren't cached yet (one query for the whole batch)
+        already_cached = {
+            scryfall_id for (scryfall_id,) in db.session.query(Card.scryfall_id).filter(
+                Card.scryfall_id.in_(list(fetched))
+            ).all()
+        } if fetched else set()
+        for scryfall_id, card_data in fetched.items():
+            if scryfall_id not in already_cached:
+                CardCacheService.cache_card(card_data)
+
+        for key in missing:
+            if by_set[key]:
+                resolved[key] = by_set[key][0]
+
+        return resolved
+
+    @staticmethod
+    def upsert_deck_cards(deck_id, entries, resolved, replace=False):
+        """Write resolved entries into deck_cards with one bulk insert and one bulk update.
+
+        With `replace` the deck's current cards are removed first; otherwise quantities
+        are added to existing rows. The caller owns the transaction.
+        """
+        quantities = {}
+        for entry in entries:
+            scryfall_id = resolved.get((entry['name'].lower(), entry['set_code']))
+            if scryfall_id:
+                key = (scryfall_id, entry['card_type'])
+                quantities[key] = quantities.get(key, 0) + entry['quantity']
+
+        if replace:
+            DeckCard.query.filter_by(deck_id=deck_id).delete(synchronize_session=False)
+            existing = {}
+        else:
+            existing = {
+                (scryfall_id, card_type): (deck_card_id, quantity)
+                for deck_card_id, scryfall_id, card_type, quantity in db.session.query(
+                    DeckCard.id, DeckCard.scryfall_id, DeckCard.card_type, DeckCard.quantity
+                ).filter(DeckCard.deck_id == deck_id).all()
+            }
+
+        inserts = []
+        updates = []
+        for (scryfall_id, card_type), quantity in quantities.items():
+            if (scryfall_id, card_type) in existing:
+                deck_card_id, current = existing[(scryfall_id, card_type)]
+                updates.append({'id': deck_card_id, 'quantity': current + quantity})
+            else:
+                inserts.append({
+                    'deck_id': deck_id,
+                    'scryfall_id': scryfall_id,
+                    'quantity': quantity,
+                    'card_type': card_type
+                })
+
+        if inserts:
+            db.session.execute(db.insert(DeckCard), inserts)
+        if updates:
+            db.session.execute(db.update(DeckCard), updates)
+
+        return {'added': len(inserts), 'updated': len(updates), 'cards': sum(quantities.values())}
@@ -0,0 +1,158 @@
+from src.models.user import db
+from src.models.achievement import Achievement, UserAchievement, UserPoints
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import threading
+import time
+
+class LeaderboardService:
+    """Achievement points leaderboard.
+
+    Each user's points total lives in UserPoints and is bumped in the same
+    transaction that completes their achievements. Ranks are precomputed from
+    those totals by one window-function UPDATE, run at most every
+    RANK_REFRESH_SECONDS when the leaderboard is read, so every read is a
+    primary-key or (rank, user_id) index lookup whatever the number of users.
+    """
+
+    RANK_REFRESH_SECONDS = 30
+    MAX_LIMIT = 100
+    MAX_AROUND = 25
+
+    _ranked_at = 0.0
+    _refresh_lock = threading.Lock()
+
+    @staticmethod
+    def record_completions(user_id, achievement_ids):
+        """Add newly completed achievements to a user's points total; the caller commits"""
+        if not achievement_ids:
+            return
+        points = db.session.query(
+            db.func.coalesce(db.func.sum(Achievement.points), 0)
+        ).filter(Achievement.id.in_(achievement_ids)).scalar()
+
+        increment = db.update(UserPoints).where(UserPoints.user_id == user_id).values(
+            points=UserPoints.points + points,
+            achievements_completed=UserPoints.achievements_completed + len(achievement_ids),
+            updated_at=datetime.utcnow()
+        ).execution_options(synchronize_session=False)
+
+        if db.session.execute(increment).rowcount:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.add(UserPoints(
+                    user_id=user_id, points=points, achievements_completed=len(achievement_ids)
+                ))
+        except IntegrityError:
+            # Another transaction created the row first
+            db.session.execute(increment)
+
+    @staticmethod
+    def rebuild():
+        """Recompute every points total from completed achievements, then re-rank.
+
+        Repairs totals after achievement points are edited. Commits; returns the
+        number of users with points.
+        """
+        totals = db.select(
+            UserAchievement.user_id,
+            db.func.coalesce(db.func.sum(Achievement.points), 0),
+            db.func.count(UserAchievement.id),
+            db.literal(datetime.utcnow())
+        ).join(
+            Achievement, Achievement.id == UserAchievement.achievement_id
+        ).where(
+            UserAchievement.is_completed.is_(True)
+        ).group_by(UserAchievement.user_id)
+
+        UserPoints.query.delete()
+        result = db.session.execute(db.insert(UserPoints).from_select(
+            ['user_id', 'points', 'achievements_completed', 'updated_at'], totals
+        ))
+        LeaderboardService.refresh_ranks()
+        return result.rowcount
+
+    @staticmethod
+    def backfill_points():
+        """Build the points table on first start for users who completed achievements before it existed"""
+        if db.session.query(UserPoints.user_id).first():
+            return 0
+        if not db.session.query(UserAchievement.id).filter(UserAchievement.is_completed.is_(True)).first():
+            return 0
+        return LeaderboardService.rebuild()
+
+    @staticmethod
+    def refresh_ranks():
+        """Recompute every rank in one statement; only rows whose rank moved are written"""
+        ranked = db.select(
+            UserPoints.user_id,
+            db.func.rank().over(order_by=UserPoints.points.desc()).label('new_rank')
+        ).subquery()
+        changed = db.session.execute(
+            db.update(UserPoints).where(
+                UserPoints.user_id == ranked.c.user_id,
+                UserPoints.rank.is_distinct_from(ranked.c.new_rank)
+            ).values(rank=ranked.c.new_rank).execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        LeaderboardService._ranked_at = time.monotonic()
+        return changed
+
+    @staticmethod
+    def _ensure_ranked():
+        """Refresh ranks if they are older than RANK_REFRESH_SECONDS (one thread at a time)"""
+        cls = LeaderboardService
+        if time.monotonic() - cls._ranked_at < cls.RANK_REFRESH_SECONDS:
+            return
+        # Readers don't wait on a refresh in progress; they serve the current ranks
+        if not cls._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - cls._ranked_at >= cls.RANK_REFRESH_SECONDS:
+                cls.refresh_ranks()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error refreshing leaderboard ranks: {e}")
+        finally:
+            cls._refresh_lock.release()
+
+    @staticmethod
+    def _ranked_query():
+        return UserPoints.query.join(UserPoints.user).options(
+            db.contains_eager(UserPoints.user)
+        ).filter(UserPoints.rank.isnot(None))
+
+    @staticmethod
+    def get_leaderboard(user_id, limit=10, around=3):
+        """Top entries, the user's own entry and their neighbors by rank.
+
+        Users with no completed achievements are unranked.
+        """
+        cls = LeaderboardService
+        limit = min(max(limit, 1), cls.MAX_LIMIT)
+        around = min(max(around, 0), cls.MAX_AROUND)
+        cls._ensure_ranked()
+
+        top = cls._ranked_query().filter(
+            UserPoints.rank <= limit
+        ).order_by(UserPoints.rank, UserPoints.user_id).limit(limit).all()
+
+        me = db.session.get(UserPoints, user_id)
+        above, below = [], []
+        if me and me.rank is not None and around:
+            position = db.tuple_(UserPoints.rank, UserPoints.user_id)
+            above = cls._ranked_query().filter(
+                position < (me.rank, me.user_id)
+            ).order_by(UserPoints.rank.desc(), UserPoints.user_id.desc()).limit(around).all()
+            below = cls._ranked_query().filter(
+                position > (me.rank, me.user_id)
+            ).order_by(UserPoints.rank, UserPoints.user_id).limit(around).all()
+
+        return {
+            'top': [entry.to_dict() for entry in top],
+            'me': me.to_dict() if me else {
+                'user_id': user_id, 'username': None, 'points': 0, 'achievements_completed': 0, 'rank': None
+            },
+            'neighbors': [entry.to_dict() for entry in reversed(above)] + [entry.to_dict() for entry in below]
+        }
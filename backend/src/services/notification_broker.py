@@ -0,0 +1,128 @@
+from flask import current_app
+from src.models.user import db
+from src.models.achievement import AchievementNotification
+import json
+import threading
+import time
+
+class NotificationBroker:
+    """Pushes new achievement notifications to Server-Sent Events streams.
+
+    Streams block on a per-subscriber Event and hold no database connection while
+    idle. Notifications committed in this process wake their user's streams
+    directly; rows written by other processes (other web workers, the achievement
+    worker, backfills) are found by one shared poll of the notifications table
+    rather than a poll per stream.
+    """
+
+    HEARTBEAT_SECONDS = 15
+    FALLBACK_POLL_SECONDS = 2.0
+    RETRY_MILLISECONDS = 3000
+    BATCH_SIZE = 100
+
+    _subscribers = {}
+    _lock = threading.Lock()
+    _poller = None
+
+    @staticmethod
+    def subscribe(user_id):
+        """Register a stream for a user; returns the Event that is set on new notifications"""
+        cls = NotificationBroker
+        event = threading.Event()
+        with cls._lock:
+            cls._subscribers.setdefault(user_id, set()).add(event)
+            if cls._poller is None:
+                cls._poller = threading.Thread(
+                    target=cls._poll, args=(current_app._get_current_object(),),
+                    name='notification-poller', daemon=True
+                )
+                cls._poller.start()
+        return event
+
+    @staticmethod
+    def unsubscribe(user_id, event):
+        cls = NotificationBroker
+        with cls._lock:
+            events = cls._subscribers.get(user_id)
+            if events:
+                events.discard(event)
+                if not events:
+                    del cls._subscribers[user_id]
+
+    @staticmethod
+    def publish(user_id):
+        """Wake a user's streams after their notifications are committed"""
+        with NotificationBroker._lock:
+            events = list(NotificationBroker._subscribers.get(user_id, ()))
+        for event in events:
+            event.set()
+
+    @staticmethod
+    def _poll(app):
+        """Shared fallback: one query per interval finds new rows for every subscribed user"""
+        cls = NotificationBroker
+        watermark = None
+        with app.app_context():
+            while True:
+                time.sleep(cls.FALLBACK_POLL_SECONDS)
+                with cls._lock:
+                    subscribed = bool(cls._subscribers)
+                if not subscribed:
+                    watermark = None
+                    continue
+
+                try:
+                    if watermark is None:
+                        watermark = db.session.query(db.func.max(AchievementNotification.id)).scalar() or 0
+                    else:
+                        rows = db.session.query(
+                            AchievementNotification.user_id, db.func.max(AchievementNotification.id)
+                        ).filter(
+                            AchievementNotification.id > watermark
+                        ).group_by(AchievementNotification.user_id).all()
+                        for user_id, max_id in rows:
+                            cls.publish(user_id)
+                            watermark = max(watermark, max_id)
+                except Exception as e:
+                    print(f"Error polling achievement notifications: {e}")
+                finally:
+                    db.session.remove()
+
+    @staticmethod
+    def stream(user_id, last_event_id=None):
+        """SSE event stream for a user, starting after last_event_id (or from now)"""
+        cls = NotificationBroker
+        event = cls.subscribe(user_id)
+        try:
+            if last_event_id is None:
+                last_event_id = db.session.query(
+                    db.func.max(AchievementNotification.id)
+                ).filter(AchievementNotification.user_id == user_id).scalar() or 0
+                db.session.remove()
+            yield f'retry: {cls.RETRY_MILLISECONDS}\n\n'
+
+            while True:
+                notifications = AchievementNotification.query.filter(
+                    AchievementNotification.user_id == user_id,
+                    AchievementNotification.id > last_event_id
+                ).order_by(AchievementNotification.id).limit(cls.BATCH_SIZE).all()
+                messages = [
+                    f'id: {notification.id}\nevent: achievement\ndata: {json.dumps(notification.to_dict())}\n\n'
+                    for notification in notifications
+                ]
+                if notifications:
+                    last_event_id = notifications[-1].id
+                # Don't hold a pooled connection while idle
+                db.session.remove()
+
+                if messages:
+                    yield ''.join(messages)
+                    if len(notifications) == cls.BATCH_SIZE:
+                        continue
+
+                if event.wait(cls.HEARTBEAT_SECONDS):
+                    event.clear()
+                else:
+                    yield ': heartbeat\n\n'
+        finally:
+            cls.unsubscribe(user_id, event)
@@ -0,0 +1,101 @@
+from src.models.user import db
+from src.models.achievement import AchievementNotification
+from datetime import datetime, timedelta
+
+class NotificationInboxService:
+    """Paged achievement notification inbox, bulk read marking and retention.
+
+    Pages are keyset scans on (created_at, id), newest first, served by the
+    (user_id, is_viewed, created_at, id) index. The cursor is the position of the
+    last row returned, so pages stay stable while new notifications arrive.
+    """
+
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 100
+    PRUNE_BATCH_SIZE = 1000
+
+    @staticmethod
+    def encode_cursor(notification):
+        return f'{notification.created_at.isoformat()}_{notification.id}'
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """(created_at, id) from a cursor; raises ValueError if it is malformed"""
+        created_at, _, notification_id = cursor.rpartition('_')
+        return datetime.fromisoformat(created_at), int(notification_id)
+
+    @staticmethod
+    def get_page(user_id, limit=DEFAULT_LIMIT, cursor=None, include_viewed=False):
+        """One page of a user's notifications and the cursor of the next page (None on the last)"""
+        limit = min(max(limit, 1), NotificationInboxService.MAX_LIMIT)
+        query = AchievementNotification.query.options(
+            db.joinedload(AchievementNotification.achievement)
+        ).filter(AchievementNotification.user_id == user_id)
+        if not include_viewed:
+            query = query.filter(AchievementNotification.is_viewed.is_(False))
+        if cursor:
+            query = query.filter(
+                db.tuple_(AchievementNotification.created_at, AchievementNotification.id) <
+                NotificationInboxService.decode_cursor(cursor)
+            )
+
+        # One extra row tells whether there is a next page
+        notifications = query.order_by(
+            AchievementNotification.created_at.desc(), AchievementNotification.id.desc()
+        ).limit(limit + 1).all()
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = NotificationInboxService.encode_cursor(notifications[-1])
+        return notifications, next_cursor
+
+    @staticmethod
+    def unviewed_count(user_id):
+        return db.session.query(db.func.count(AchievementNotification.id)).filter(
+            AchievementNotification.user_id == user_id,
+            AchievementNotification.is_viewed.is_(False)
+        ).scalar()
+
+    @staticmethod
+    def mark_viewed(user_id, up_to_id=None):
+        """Mark a user's unviewed notifications up to and including up_to_id (all if None) in one
+        statement; the caller commits. Returns the number marked.
+        """
+        query = AchievementNotification.query.filter(
+            AchievementNotification.user_id == user_id,
+            AchievementNotification.is_viewed.is_(False)
+        )
+        if up_to_id is not None:
+            query = query.filter(AchievementNotification.id <= up_to_id)
+        return query.update({'is_viewed': True}, synchronize_session=False)
+
+    @staticmethod
+    def prune(older_than_days, batch_size=PRUNE_BATCH_SIZE, on_batch=None):
+        """Delete viewed notifications created more than older_than_days ago, committing per batch.
+
+        on_batch(notifications) runs before each batch is deleted (e.g. to archive it).
+        Returns the number deleted.
+        """
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+        # Keyset pages along the primary key; the inbox index leads with user_id and
+        # can't serve a created_at range across all users
+        deleted = 0
+        last_id = 0
+        while True:
+            batch = AchievementNotification.query.filter(
+                AchievementNotification.id > last_id,
+                AchievementNotification.is_viewed.is_(True),
+                AchievementNotification.created_at < cutoff
+            ).order_by(AchievementNotification.id).limit(batch_size).all()
+            if not batch:
+                return deleted
+
+            if on_batch:
+                on_batch(batch)
+            last_id = batch[-1].id
+            AchievementNotification.query.filter(
+                AchievementNotification.id.in_([notification.id for notification in batch])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            deleted += len(batch)
@@ -0,0 +1,224 @@
+from src.models.user import db
+from src.models.card import Card, CardPrice, CollectionCard, ReferenceDeck, ReferenceDeckCard
+from src.services.decklist_import_service import DecklistImportService
+from datetime import datetime
+import numpy as np
+import threading
+
+# Basic lands are assumed to be available in any quantity
+BASIC_LAND_NAMES = {
+    'plains', 'island', 'swamp', 'mountain', 'forest', 'wastes',
+    'snow-covered plains', 'snow-covered island', 'snow-covered swamp',
+    'snow-covered mountain', 'snow-covered forest', 'snow-covered wastes'
+}
+
+class ReferenceDeckService:
+
+    # Which reference deck sections count towards completion
+    MATCHED_CARD_TYPES = ('mainboard', 'commander')
+
+    _index = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def import_decklist(name, text, format_name=None, source=None):
+        """Store (or replace, by source) one reference decklist. The caller commits."""
+        entries, errors = DecklistImportService.parse(text)
+        if not entries:
+            return None, errors
+
+        # Use the cached spelling of each name where the card is known
+        names = {e['name'].lower() for e in entries}
+        canonical = {
+            card_name.lower(): card_name
+            for (card_name,) in db.session.query(Card.name).filter(db.func.lower(Card.name).in_(names)).distinct()
+        }
+
+        deck = ReferenceDeck.query.filter_by(source=source).first() if source else None
+        if deck:
+            ReferenceDeckCard.query.filter_by(reference_deck_id=deck.id).delete(synchronize_session=False)
+            deck.name = name
+            deck.format = format_name
+            # Only the cards may have changed, which wouldn't touch the row; bump
+            # updated_at so library_version (and the cached index) moves
+            deck.updated_at = datetime.utcnow()
+        else:
+            deck = ReferenceDeck(name=name, format=format_name, source=source)
+            db.session.add(deck)
+            db.session.flush()
+
+        rows = {}
+        for entry in entries:
+            card_name = canonical.get(entry['name'].lower(), entry['name'])
+            key = (card_name, entry['card_type'])
+            rows[key] = rows.get(key, 0) + entry['quantity']
+
+        db.session.execute(db.insert(ReferenceDeckCard), [
+            {'reference_deck_id': deck.id, 'card_name': card_name, 'card_type': card_type, 'quantity': quantity}
+            for (card_name, card_type), quantity in rows.items()
+        ])
+        deck.card_count = sum(
+            quantity for (_, card_type), quantity in rows.items()
+            if card_type in ReferenceDeckService.MATCHED_CARD_TYPES
+        )
+
+        return deck, errors
+
+    @staticmethod
+    def library_version():
+        """Cheap version of the reference library; changes on any import"""
+        deck_count, last_modified = db.session.query(
+            db.func.count(ReferenceDeck.id),
+            db.func.max(ReferenceDeck.updated_at)
+        ).one()
+        price_date = db.session.query(db.func.max(CardPrice.snapshot_date)).scalar()
+        return (deck_count, last_modified, price_date)
+
+    @staticmethod
+    def index():
+        """Sparse count-vector index of every reference deck, rebuilt when the library changes.
+
+        Decks are stored as sparse (deck row, card column, quantity) entries over a
+        vocabulary of lowercased card names, so matching a collection is a gather plus
+        a bincount over the nonzero entries only.
+        """
+        cls = ReferenceDeckService
+        version = cls.library_version()
+        if cls._index is not None and cls._index['version'] == version:
+            return cls._index
+
+        with cls._index_lock:
+            if cls._index is not None and cls._index['version'] == version:
+                return cls._index
+
+            decks = db.session.query(
+                ReferenceDeck.id, ReferenceDeck.name, ReferenceDeck.format, ReferenceDeck.card_count
+            ).order_by(ReferenceDeck.id).all()
+            entries = db.session.query(
+                ReferenceDeckCard.reference_deck_id,
+                ReferenceDeckCard.card_name,
+                db.func.sum(ReferenceDeckCard.quantity)
+            ).filter(
+                ReferenceDeckCard.card_type.in_(cls.MATCHED_CARD_TYPES)
+            ).group_by(ReferenceDeckCard.reference_deck_id, ReferenceDeckCard.card_name).all()
+
+            deck_rows = {deck.id: i for i, deck in enumerate(decks)}
+            vocabulary = {}
+            display_names = []
+            rows, columns, quantities = [], [], []
+            for deck_id, card_name, quantity in entries:
+                key = card_name.lower()
+                if key not in vocabulary:
+                    vocabulary[key] = len(vocabulary)
+                    display_names.append(card_name)
+                rows.append(deck_rows[deck_id])
+                columns.append(vocabulary[key])
+                quantities.append(int(quantity))
+
+            # Cheapest current USD price per card name
+            prices = np.zeros(len(vocabulary), dtype=np.int64)
+            has_price = np.zeros(len(vocabulary), dtype=bool)
+            if version[2] is not None and vocabulary:
+                for card_name, cents in db.session.query(
+                    db.func.lower(Card.name),
+                    db.func.min(CardPrice.usd_cents)
+                ).join(CardPrice, CardPrice.scryfall_id == Card.scryfall_id).filter(
+                    CardPrice.snapshot_date == version[2],
+                    CardPrice.usd_cents.isnot(None),
+                    db.func.lower(Card.name).in_(list(vocabulary))
+                ).group_by(db.func.lower(Card.name)):
+                    prices[vocabulary[card_name]] = cents
+                    has_price[vocabulary[card_name]] = True
+
+            # Entries sorted by deck so each deck's cards are one slice (CSR row pointers)
+            rows = np.array(rows, dtype=np.int64)
+            order = np.argsort(rows, kind='stable')
+            rows = rows[order]
+
+            cls._index = {
+                'version': version,
+                'decks': decks,
+                'vocabulary': vocabulary,
+                'names': display_names,
+                'rows': rows,
+                'row_starts': np.searchsorted(rows, np.arange(len(decks) + 1)),
+                'columns': np.array(columns, dtype=np.int64)[order],
+                'quantities': np.array(quantities, dtype=np.int64)[order],
+                'prices': prices,
+                'has_price': has_price,
+                'is_basic': np.array([name in BASIC_LAND_NAMES for name in vocabulary], dtype=bool)
+            }
+
+        return cls._index
+
+    @staticmethod
+    def collection_vector(user_id, index):
+        """The user's collection as owned copies per index column (any printing counts)"""
+        owned = np.zeros(len(index['vocabulary']), dtype=np.int64)
+        rows = db.session.query(
+            db.func.lower(Card.name),
+            db.func.sum(CollectionCard.quantity)
+        ).join(CollectionCard).filter(
+            CollectionCard.user_id == user_id
+        ).group_by(db.func.lower(Card.name)).all()
+
+        for card_name, quantity in rows:
+            column = index['vocabulary'].get(card_name)
+            if column is not None:
+                owned[column] = quantity
+        return owned
+
+    @staticmethod
+    def match(user_id, format_name=None, limit=50, missing_per_deck=10):
+        """Rank reference decks by how much of each the user's collection already covers"""
+        index = ReferenceDeckService.index()
+        decks = index['decks']
+        if not decks:
+            return []
+
+        owned = ReferenceDeckService.collection_vector(user_id, index)
+        owned[index['is_basic']] = np.iinfo(np.int64).max // 2
+
+        rows, columns, needed = index['rows'], index['columns'], index['quantities']
+        have = np.minimum(needed, owned[columns])
+        missing = needed - have
+
+        deck_count = len(decks)
+        total = np.bincount(rows, weights=needed, minlength=deck_count)
+        covered = np.bincount(rows, weights=have, minlength=deck_count)
+        missing_cost = np.bincount(rows, weights=missing * index['prices'][columns], minlength=deck_count)
+        unpriced = np.bincount(rows, weights=(missing > 0) & ~index['has_price'][columns], minlength=deck_count)
+        completion = np.divide(covered, total, out=np.zeros(deck_count), where=total > 0)
+
+        candidates = np.arange(deck_count)
+        if format_name:
+            candidates = np.array([i for i in candidates if (decks[i].format or '').lower() == format_name.lower()],
+                                  dtype=np.int64)
+        # Most complete first, then cheapest to finish
+        order = candidates[np.lexsort((missing_cost[candidates], -completion[candidates]))][:limit]
+
+        results = []
+        for i in order:
+            start, end = index['row_starts'][i], index['row_starts'][i + 1]
+            deck_entries = start + np.flatnonzero(missing[start:end] > 0)
+            deck_entries = deck_entries[np.argsort(-missing[deck_entries] * index['prices'][columns[deck_entries]],
+                                                   kind='stable')]
+            results.append({
+                'reference_deck_id': decks[i].id,
+                'name': decks[i].name,
+                'format': decks[i].format,
+                'total_cards': int(total[i]),
+                'owned_cards': int(covered[i]),
+                'completion': round(float(completion[i]) * 100, 1),
+                'missing_cards': int(total[i] - covered[i]),
+                'missing_cost_usd': round(float(missing_cost[i]) / 100, 2),
+                'unpriced_missing': int(unpriced[i]),
+                'missing': [{
+                    'name': index['names'][columns[e]],
+                    'quantity': int(missing[e]),
+                    'unit_price_usd': round(int(index['prices'][columns[e]]) / 100, 2)
+                    if index['has_price'][columns[e]] else None
+                } for e in deck_entries[:missing_per_deck]]
+            })
+
+        return results
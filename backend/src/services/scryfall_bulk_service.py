@@ -0,0 +1,162 @@
+from src.models.user import db
+from src.models.card import Card, CardLegality, CardPrice, CardSet
+from datetime import date
+from decimal import Decimal, InvalidOperation
+import gzip
+import json
+
+class ScryfallBulkService:
+
+    BATCH_SIZE = 5000
+
+    @staticmethod
+    def iter_objects(path):
+        """Stream objects from a local Scryfall bulk data file (.json or .json.gz).
+
+        Scryfall writes bulk files as a JSON array with one card object per line, so
+        the file is read line by line instead of loading the whole array into memory.
+        Files in any other layout (such as a saved /sets API response) fall back to
+        a full json.load.
+        """
+        opener = gzip.open if path.endswith('.gz') else open
+
+        with opener(path, 'rt', encoding='utf-8') as f:
+            first_line = f.readline().strip()
+            second_line = f.readline().strip()
+            line_per_card = first_line == '[' and second_line.startswith('{') and second_line.rstrip(',').endswith('}')
+
+            if not line_per_card:
+                f.seek(0)
+                data = json.load(f)
+                yield from (data.get('data', []) if isinstance(data, dict) else data)
+                return
+
+            for line in [second_line] + [l.strip() for l in f]:
+                line = line.rstrip(',')
+                if not line or line == ']':
+                    continue
+                yield json.loads(line)
+
+    @staticmethod
+    def to_cents(value):
+        """Convert a Scryfall price string ('1.23') to integer cents"""
+        if value in (None, ''):
+            return None
+        try:
+            return int((Decimal(value) * 100).to_integral_value())
+        except (InvalidOperation, ValueError):
+            return None
+
+    @staticmethod
+    def load_prices(path, snapshot_date):
+        """Load one price snapshot for every cached card found in the bulk file.
+
+        Only cards already in cards_cache are stored, which keeps the table limited to
+        cards users can actually own. Re-loading the same date replaces that snapshot.
+        """
+        cached_ids = {scryfall_id for (scryfall_id,) in db.session.query(Card.scryfall_id).all()}
+
+        db.session.query(CardPrice).filter(CardPrice.snapshot_date == snapshot_date).delete()
+
+        batch = []
+        loaded = 0
+        for card_data in ScryfallBulkService.iter_objects(path):
+            if card_data.get('id') not in cached_ids:
+                continue
+
+            prices = card_data.get('prices') or {}
+            row = {
+                'scryfall_id': card_data['id'],
+                'snapshot_date': snapshot_date,
+                'usd_cents': ScryfallBulkService.to_cents(prices.get('usd')),
+                'usd_foil_cents': ScryfallBulkService.to_cents(prices.get('usd_foil')),
+                'eur_cents': ScryfallBulkService.to_cents(prices.get('eur'))
+            }
+            if row['usd_cents'] is None and row['usd_foil_cents'] is None and row['eur_cents'] is None:
+                continue
+
+            batch.append(row)
+            cached_ids.discard(card_data['id'])  # Bulk files can repeat ids across languages
+
+            if len(batch) >= ScryfallBulkService.BATCH_SIZE:
+                db.session.execute(db.insert(CardPrice), batch)
+                loaded += len(batch)
+                batch = []
+
+        if batch:
+            db.session.execute(db.insert(CardPrice), batch)
+            loaded += len(batch)
+
+        db.session.commit()
+        return loaded
+
+    @staticmethod
+    def load_legalities(path):
+        """Store (or refresh) legality bitmasks for every cached card found in the bulk file"""
+        cached_ids = {scryfall_id for (scryfall_id,) in db.session.query(Card.scryfall_id).all()}
+
+        def flush(batch):
+            db.session.query(CardLegality).filter(
+                CardLegality.scryfall_id.in_([row['scryfall_id'] for row in batch])
+            ).delete(synchronize_session=False)
+            db.session.execute(db.insert(CardLegality), batch)
+
+        batch = []
+        loaded = 0
+        for card_data in ScryfallBulkService.iter_objects(path):
+            if card_data.get('id') not in cached_ids or not card_data.get('legalities'):
+                continue
+
+            batch.append({
+                'scryfall_id': card_data['id'],
+                **CardLegality.masks_from_scryfall(card_data['legalities'])
+            })
+            cached_ids.discard(card_data['id'])
+
+            if len(batch) >= ScryfallBulkService.BATCH_SIZE:
+                flush(batch)
+                loaded += len(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+            loaded += len(batch)
+
+        db.session.commit()
+        return loaded
+
+    @staticmethod
+    def load_sets(path):
+        """Replace the set catalog from a Scryfall sets dump or a bulk card file.
+
+        A sets dump (saved /sets response) is used as-is. For a bulk card file the
+        catalog is derived by counting printings per set.
+        """
+        sets = {}
+        for obj in ScryfallBulkService.iter_objects(path):
+            if obj.get('object') == 'set':
+                sets[obj['code']] = {
+                    'code': obj['code'],
+                    'name': obj.get('name', obj['code']),
+                    'set_type': obj.get('set_type'),
+                    'card_count': obj.get('card_count', 0),
+                    'released_at': date.fromisoformat(obj['released_at']) if obj.get('released_at') else None,
+                    'icon_svg_uri': obj.get('icon_svg_uri')
+                }
+            elif obj.get('object') == 'card' and obj.get('set'):
+                entry = sets.setdefault(obj['set'], {
+                    'code': obj['set'],
+                    'name': obj.get('set_name', obj['set']),
+                    'set_type': obj.get('set_type'),
+                    'card_count': 0,
+                    'released_at': date.fromisoformat(obj['released_at']) if obj.get('released_at') else None,
+                    'icon_svg_uri': None
+                })
+                entry['card_count'] += 1
+
+        if sets:
+            db.session.query(CardSet).delete()
+            db.session.execute(db.insert(CardSet), list(sets.values()))
+        db.session.commit()
+
+        return len(sets)
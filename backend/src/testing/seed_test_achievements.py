@@ -1,3 +1,7 @@
+from src.models.user import db
+from src.models.achievement import Achievement
+from src.services.achievement_service import AchievementService
+
 # Create a simple script to add test achievements
 def seed_test_achievements():
     achievements = [
@@ -23,4 +27,5 @@ def seed_test_achievements():
         ach = Achievement(**ach_data)
         db.session.add(ach)
     
+    AchievementService.bump_catalog_version()
     db.session.commit()
\ No newline at end of file
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Deck Validation Report
+Validate every deck of every user against its format in one streamed pass.
+Intended for the nightly report job.
+
+Usage:
+    python validate_decks.py                          # Print a summary
+    python validate_decks.py --output report.jsonl    # Also write one JSON result per deck
+    python validate_decks.py --invalid-only --output invalid.jsonl
+"""
+
+import sys
+import os
+import argparse
+import json
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.services.deck_validation_service import DeckValidationService
+from src.main import app
+
+def run_report(output_path=None, invalid_only=False):
+    """Validate all decks and write/print the results"""
+    print("🔍 Validating all decks...")
+    started = time.time()
+
+    total = 0
+    invalid = 0
+    by_rule = {}
+    output = open(output_path, 'w', encoding='utf-8') if output_path else None
+
+    try:
+        for result in DeckValidationService.iter_all_deck_results():
+            total += 1
+            if not result['is_valid']:
+                invalid += 1
+                for error in result['errors']:
+                    by_rule[error['rule']] = by_rule.get(error['rule'], 0) + 1
+
+            if output and (not invalid_only or not result['is_valid']):
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if output:
+            output.close()
+
+    elapsed = time.time() - started
+    print(f"✅ Validated {total} decks in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} decks/s)")
+    print(f"❌ {invalid} invalid decks")
+    for rule, count in sorted(by_rule.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {rule}: {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate all decks against their format rules')
+    parser.add_argument('--output', metavar='FILE', help='Write one JSON result per deck (JSON lines)')
+    parser.add_argument('--invalid-only', action='store_true', help='Only write invalid decks to the output file')
+
+    args = parser.parse_args()
+
+    with app.app_context():
+        run_report(args.output, args.invalid_only)
+
+if __name__ == "__main__":
+    main()
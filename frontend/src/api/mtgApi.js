@@ -268,29 +268,25 @@ export const buildDeckAroundCard = async (userId, scryfallId) => {
   });
 };
 
-// Basic lands function - adds basic land to deck by searching for it first
+// Import pasted decklist text ("4x Name (SET) 123", Deck/Sideboard sections) in one request
+export const importDecklist = (deckId, text, replace = false) => {
+  return makeAuthenticatedRequest(`${API_BASE_URL}/decks/${deckId}/import`, {
+    method: 'POST',
+    body: JSON.stringify({ text, replace }),
+  });
+};
+
+// Basic lands function - adds one basic land, resolved by name on the server
 export const addBasicLandToDeck = async (deckId, landName) => {
   try {
-    // First, search for the basic land to get its scryfall_id
-    const searchResponse = await searchScryfallCards(landName);
-    
-    if (!searchResponse.cards || searchResponse.cards.length === 0) {
-      throw new Error(`${landName} not found`);
-    }
-    
-    // Find the basic land (usually the first result for basic lands)
-    const basicLand = searchResponse.cards.find(card => 
-      card.type_line && card.type_line.includes('Basic Land') && 
-      card.name === landName
-    ) || searchResponse.cards[0];
-    
-    if (!basicLand) {
+    const result = await importDecklist(deckId, `1 ${landName}`);
+
+    if (result.unresolved && result.unresolved.length > 0) {
       throw new Error(`Basic ${landName} not found`);
     }
-    
-    // Add the basic land to the deck
-    return await addCardToDeck(deckId, basicLand.scryfall_id);
-    
+
+    return result;
+
   } catch (error) {
     console.error('Error adding basic land to deck:', error);
     throw error;
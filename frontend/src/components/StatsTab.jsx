@@ -402,7 +402,7 @@ const TribalTypesCard = ({ tribalStats, expanded, onToggle }) => {
 
 const FormatLegalityCard = ({ formatStats }) => {
   const formatEmojis = {
-    'standard': '🆕', 'modern': '🔄', 'legacy': '📜', 'extended': '📏'
+    'standard': '🆕', 'modern': '🔄', 'legacy': '📜', 'banned': '🚫'
   };
 
   return (
@@ -424,7 +424,7 @@ const FormatLegalityCard = ({ formatStats }) => {
             </div>
           ))}
           <div className="text-xs text-muted-foreground mt-2">
-            * Format legality requires Scryfall integration
+            * Counts cards with Scryfall legality data
           </div>
         </div>
       </CardContent>
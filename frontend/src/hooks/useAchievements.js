@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { getApiBaseUrl } from '../lib/utils.js';
 import { supabase } from '../lib/supabase';
 
@@ -80,6 +80,20 @@ export const useAchievements = (userId, onAchievementUnlocked) => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
+  // Achievements already announced, so a check response and the pushed
+  // notification for the same unlock don't both fire the callback
+  const announcedRef = useRef(new Set());
+  const onUnlockedRef = useRef(onAchievementUnlocked);
+  onUnlockedRef.current = onAchievementUnlocked;
+
+  const announceUnlock = useCallback((achievement) => {
+    if (!achievement || announcedRef.current.has(achievement.id)) return;
+    announcedRef.current.add(achievement.id);
+    if (onUnlockedRef.current) {
+      onUnlockedRef.current(achievement);
+    }
+  }, []);
+
   // Fetch user achievements
   const fetchAchievements = useCallback(async () => {
     if (!userId) return;
@@ -179,11 +193,7 @@ export const useAchievements = (userId, onAchievementUnlocked) => {
         console.log('New achievements earned:', response.newly_completed);
         
         // NEW: Trigger callback for each new achievement
-        response.newly_completed.forEach(achievement => {
-          if (onAchievementUnlocked) {
-            onAchievementUnlocked(achievement);
-          }
-        });
+        response.newly_completed.forEach(announceUnlock);
       }
       
       return response;
@@ -191,7 +201,7 @@ export const useAchievements = (userId, onAchievementUnlocked) => {
       console.error('Error checking achievements after card add:', err);
       return { newly_completed: [] };
     }
-  }, [userId, triggerAchievementCheck, onAchievementUnlocked]);
+  }, [userId, triggerAchievementCheck, announceUnlock]);
 
   // Load achievements on mount and when userId changes
   useEffect(() => {
@@ -199,6 +209,32 @@ export const useAchievements = (userId, onAchievementUnlocked) => {
     fetchNotifications();
   }, [fetchAchievements, fetchNotifications]);
 
+  // Receive new notifications as they are created (Server-Sent Events);
+  // EventSource reconnects and resumes from the last event id by itself
+  useEffect(() => {
+    if (!userId || typeof EventSource === 'undefined') return;
+
+    const source = new EventSource(
+      `${API_BASE_URL}/achievements/notifications/stream?user_id=${userId}`
+    );
+    source.addEventListener('achievement', (event) => {
+      const notification = JSON.parse(event.data);
+      setNotifications(prev =>
+        prev.some(notif => notif.id === notification.id) ? prev : [notification, ...prev]
+      );
+      setAchievements(prev =>
+        prev.map(achievement =>
+          achievement.id === notification.achievement.id
+            ? { ...achievement, is_completed: true }
+            : achievement
+        )
+      );
+      announceUnlock(notification.achievement);
+    });
+
+    return () => source.close();
+  }, [userId, announceUnlock]);
+
   // Computed values
   const completedAchievements = achievements.filter(achievement => achievement.is_completed);
   const totalPoints = completedAchievements.reduce((sum, achievement) => sum + achievement.points, 0);